@@ -0,0 +1,45 @@
+# backend/config/log_handlers.py
+"""
+Handler logging non-blocking.
+
+`QueueStreamHandler` di thread pemanggil hanya menggabungkan pesan (msg % args)
+dan memasukkan salinan record ke antrean; format baris (waktu, level, logger),
+format traceback, dan penulisan ke stream (stderr) dilakukan oleh satu thread
+QueueListener, sehingga request tidak menunggu format maupun I/O konsol.
+Listener dihentikan (dan antrean dikosongkan) saat proses keluar.
+"""
+import atexit
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueStreamHandler(QueueHandler):
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self._stop_listener)
+
+    def prepare(self, record):
+        # QueueHandler.prepare() bawaan memanggil self.format() di thread pemanggil.
+        # Di sini hanya msg % args yang digabung (argumen bisa berubah setelah pemanggil
+        # lanjut); exc_info dibiarkan agar traceback diformat target di thread listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def setFormatter(self, fmt):
+        # Formatter dipasang di target: dipakai oleh thread listener, bukan oleh prepare()
+        self.target.setFormatter(fmt)
+
+    def _stop_listener(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._stop_listener()
+        super().close()
@@ -62,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Anggaran query per request / deteksi N+1 (lihat inventory/query_budget.py)
+    'inventory.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -128,6 +130,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# File unggahan (kuitansi, stock opname, job import)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -150,7 +156,8 @@ AUTH_USER_MODEL = 'users.CustomUser'
 # Blok Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication dengan cache token -> snapshot user (lihat users/authentication.py)
+        'users.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -159,4 +166,84 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
-}
\ No newline at end of file
+}
+
+# Logging: logger bernama per modul (inventory.*, users.*), ditulis ke stderr lewat
+# antrean (QueueStreamHandler) agar request tidak menunggu I/O konsol.
+# LOG_LEVEL=DEBUG menampilkan diagnostik rinci (alur submit request, import kode barang, dsb.)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {
+            'format': '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s',
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'config.log_handlers.QueueStreamHandler',
+            'formatter': 'standard',
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO').upper(),
+            'propagate': False,
+        },
+        'inventory': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'users': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Cache: Redis bersama (REDIS_URL, butuh paket `redis`) agar invalidasi cache (mis. token
+# autentikasi) berlaku di semua proses/worker. Tanpa REDIS_URL dipakai LocMemCache, yang
+# hanya berlaku per proses.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Lama (detik) snapshot user untuk sebuah token disimpan di cache autentikasi.
+# Dengan LocMemCache, logout/ganti password/perubahan role hanya menghapus cache di proses
+# yang menanganinya; proses lain baru melihatnya setelah timeout, jadi default-nya dibuat singkat.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', '60' if REDIS_URL else '5'))
+
+# Anggaran query SQL per request; request yang melampaui (atau punya query yang sama
+# berulang >= threshold kali) dicatat di logger inventory.query_budget
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '50'))
+QUERY_BUDGET_REPEAT_THRESHOLD = int(os.getenv('QUERY_BUDGET_REPEAT_THRESHOLD', '5'))
+
+# Rekonsiliasi stok (`manage.py reconcile_stock`): Transaction yang lebih muda dari jeda ini
+# belum dimasukkan ke checkpoint, karena transaksi lain dengan id lebih kecil mungkin belum commit
+RECONCILIATION_CHECKPOINT_LAG_SECONDS = int(os.getenv('RECONCILIATION_CHECKPOINT_LAG_SECONDS', '300'))
+
+# Job import kuitansi asinkron
+# Set RECEIPT_IMPORT_RUN_IN_PROCESS=False untuk memproses job lewat `manage.py process_import_jobs`
+RECEIPT_IMPORT_RUN_IN_PROCESS = os.getenv('RECEIPT_IMPORT_RUN_IN_PROCESS', 'True') == 'True'
+RECEIPT_IMPORT_WORKERS = int(os.getenv('RECEIPT_IMPORT_WORKERS', '1'))
+RECEIPT_IMPORT_CHUNK_SIZE = int(os.getenv('RECEIPT_IMPORT_CHUNK_SIZE', '1000'))
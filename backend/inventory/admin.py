@@ -4,7 +4,8 @@ from .models import (
     # Model hierarki kode baru
     ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok, ItemCodeBarang,
     # Model utama yg dimodifikasi/digunakan
-    ProductVariant, InventoryItem, Stock, Receipt,
+    ProductVariant, InventoryItem, Stock, Receipt, ReceiptImportJob, NumberSequence, DailyConsumption, StockSnapshot,
+    LedgerBalance, ReconciliationCheckpoint,
     # Model lain (request, spmb, log, transaksi, opname)
     Request, RequestItem, SPMB, RequestLog, Transaction,
     StockOpnameSession, StockOpnameItem
@@ -49,6 +50,13 @@ class StockAdmin(admin.ModelAdmin):
      fields = ('variant', 'total_quantity', 'low_stock_threshold', 'last_updated')
      raw_id_fields = ('variant',)
 
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('full_code', 'variant_name', 'total_quantity', 'low_stock_threshold', 'is_low_stock', 'is_out_of_stock', 'last_updated')
+    list_filter = ('is_low_stock', 'is_out_of_stock', 'golongan_code')
+    search_fields = ('full_code', 'type_name', 'variant_name', 'account_code')
+    readonly_fields = [field.name for field in StockSnapshot._meta.fields]
+
 
 # --- Pendaftaran Model Baru (Awalnya Default) ---
 # Anda bisa menambahkan kustomisasi (list_display, dll.) nanti jika diperlukan
@@ -104,6 +112,37 @@ class ReceiptAdmin(admin.ModelAdmin):
             obj.uploaded_by = request.user
         super().save_model(request, obj, form, change)
 
+@admin.register(ReceiptImportJob)
+class ReceiptImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'original_filename', 'status', 'processed_rows', 'total_rows', 'error_count', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('original_filename', 'created_by__email')
+    readonly_fields = ('status', 'total_rows', 'processed_rows', 'created_variants', 'last_committed_row', 'error_count', 'errors', 'message', 'created_by', 'created_at', 'started_at', 'finished_at')
+
+@admin.register(NumberSequence)
+class NumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'last_value')
+    list_filter = ('scope',)
+    search_fields = ('key',)
+
+@admin.register(DailyConsumption)
+class DailyConsumptionAdmin(admin.ModelAdmin):
+    list_display = ('day', 'department_code', 'variant', 'quantity_out')
+    list_filter = ('day', 'department_code')
+    search_fields = ('variant__full_code', 'variant__name')
+    raw_id_fields = ('variant',)
+
+@admin.register(LedgerBalance)
+class LedgerBalanceAdmin(admin.ModelAdmin):
+    list_display = ('variant', 'net_quantity')
+    search_fields = ('variant__full_code', 'variant__name')
+    readonly_fields = ('variant', 'net_quantity') # diisi oleh reconcile_stock
+
+@admin.register(ReconciliationCheckpoint)
+class ReconciliationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_transaction_id', 'updated_at')
+    readonly_fields = ('updated_at',)
+
 
 # --- Pendaftaran Model Lain (Asumsi tidak berubah signifikan) ---
 admin.site.register(Request)
@@ -0,0 +1,235 @@
+# backend/inventory/code_import.py
+"""
+Import set-based daftar kode barang (Golongan -> Bidang -> Kelompok -> SubKelompok -> Barang).
+
+CSV dibaca sekali ke memori, lalu tiap level ditulis berurutan dengan `bulk_create`:
+- Golongan/Bidang/Kelompok/SubKelompok: hanya kode yang belum ada yang dibuat
+  (uraian yang sudah ada tidak ditimpa, sama seperti get_or_create sebelumnya).
+- Barang: upsert pada (sub_kelompok, code) lewat tabel staging (lihat staging.py);
+  `full_base_code` dihitung di Python dari kode yang sudah ada di memori.
+Setelah setiap level, peta id dibaca ulang dengan satu query `values_list`, sehingga
+jumlah query sebanding jumlah batch, bukan jumlah baris.
+
+Mode delta: setiap baris ter-normalisasi di-hash (`row_fingerprint`) dan dibandingkan
+dengan `ItemCodeBarang.import_fingerprint` per `full_base_code`; hanya kode baru atau
+berubah yang diteruskan ke upsert. Kode yang tidak ada lagi di CSV hanya dilaporkan.
+"""
+import csv
+import hashlib
+from collections import namedtuple
+
+from .code_tree import invalidate_code_tree_on_commit
+from .models import (
+    ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok, ItemCodeBarang,
+    ProductVariant
+)
+from .snapshots import refresh_stock_snapshots
+from .staging import merge_item_codes
+
+IMPORT_BATCH_SIZE = 2000
+CSV_DELIMITER = ';'
+
+CodeRow = namedtuple(
+    'CodeRow', 'line kd_gol kdbid kdkel kdskel kd_brg ur_sskel kd_akun ur_akun'
+)
+
+# Panjang maksimum kolom kode sesuai model (divalidasi sebelum menulis ke database)
+_MAX_LENGTHS = {
+    'kd_gol': ItemCodeGolongan._meta.get_field('code').max_length,
+    'kdbid': ItemCodeBidang._meta.get_field('code').max_length,
+    'kdkel': ItemCodeKelompok._meta.get_field('code').max_length,
+    'kdskel': ItemCodeSubKelompok._meta.get_field('code').max_length,
+    'kd_brg': ItemCodeBarang._meta.get_field('code').max_length,
+    'kd_akun': ItemCodeBarang._meta.get_field('account_code').max_length,
+    'ur_akun': ItemCodeBarang._meta.get_field('account_description').max_length,
+}
+
+
+def full_base_code(row):
+    """Kode barang dasar lengkap, sama dengan ItemCodeBarang._generate_full_base_code."""
+    return (
+        f"{row.kd_gol.zfill(1)}{row.kdbid.zfill(2)}{row.kdkel.zfill(2)}"
+        f"{row.kdskel.zfill(2)}{row.kd_brg.zfill(3)}"
+    )
+
+
+def row_fingerprint(row):
+    """SHA-256 dari kolom baris yang diimpor ke ItemCodeBarang (whitespace diringkas)."""
+    normalized = '\x1f'.join(
+        ' '.join((value or '').split())
+        for value in (full_base_code(row), row.ur_sskel, row.kd_akun, row.ur_akun)
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def parse_item_code_csv(csvfile):
+    """
+    Baca CSV kode barang (delimiter ';'). Mengembalikan (rows, errors):
+    rows adalah dict {(kd_gol, kdbid, kdkel, kdskel, kd_brg): CodeRow} (baris terakhir menang),
+    errors adalah daftar pesan untuk baris yang dilewati.
+    """
+    rows, errors = {}, []
+    for line, raw in enumerate(csv.DictReader(csvfile, delimiter=CSV_DELIMITER), start=2):
+        values = {field: (raw.get(field) or '').strip() for field in CodeRow._fields[1:]}
+        row = CodeRow(
+            line=line, **{**values, 'kd_akun': values['kd_akun'] or None, 'ur_akun': values['ur_akun'] or None}
+        )
+        if not all([row.kd_gol, row.kdbid, row.kdkel, row.kdskel, row.kd_brg, row.ur_sskel]):
+            errors.append(f"Skipping row {line}: Missing required code or description data.")
+            continue
+        too_long = [
+            field for field, max_length in _MAX_LENGTHS.items()
+            if getattr(row, field) and len(getattr(row, field)) > max_length
+        ]
+        if too_long:
+            errors.append(f"Skipping row {line}: Value too long for {', '.join(too_long)}.")
+            continue
+        rows[(row.kd_gol, row.kdbid, row.kdkel, row.kdskel, row.kd_brg)] = row
+    return rows, errors
+
+
+def _insert_missing(model, parent_field, keys, build):
+    """
+    Buat baris level yang belum ada. Mengembalikan (peta {(parent_id, code): id} untuk `keys`,
+    True jika ada baris baru).
+    """
+    parent_ids = {parent_id for parent_id, _ in keys}
+    lookup = {f'{parent_field}__in': parent_ids} if parent_field else {}
+    id_field = f'{parent_field}_id' if parent_field else None
+
+    def load():
+        queryset = model.objects.filter(**lookup)
+        if id_field:
+            return {(parent_id, code): pk for pk, parent_id, code in queryset.values_list('pk', id_field, 'code')}
+        return {(None, code): pk for pk, code in queryset.values_list('pk', 'code')}
+
+    existing = load()
+    missing = [key for key in keys if key not in existing]
+    if not missing:
+        return existing, False
+    model.objects.bulk_create(
+        [build(parent_id, code) for parent_id, code in missing],
+        batch_size=IMPORT_BATCH_SIZE, ignore_conflicts=True
+    )
+    return load(), True
+
+
+def _existing_barang(sub_kelompok_ids):
+    existing = {}
+    sub_kelompok_ids = sorted(sub_kelompok_ids)
+    for start in range(0, len(sub_kelompok_ids), IMPORT_BATCH_SIZE):
+        queryset = ItemCodeBarang.objects.filter(
+            sub_kelompok_id__in=sub_kelompok_ids[start:start + IMPORT_BATCH_SIZE]
+        ).values_list('pk', 'sub_kelompok_id', 'code', 'base_description', 'account_code', 'account_description')
+        for pk, sub_id, code, description, account_code, account_description in queryset:
+            existing[(sub_id, code)] = (pk, description, account_code, account_description)
+    return existing
+
+
+def _refresh_variant_snapshots(barang_ids):
+    barang_ids = sorted(barang_ids)
+    for start in range(0, len(barang_ids), IMPORT_BATCH_SIZE):
+        refresh_stock_snapshots(ProductVariant.objects.filter(
+            base_item_code_id__in=barang_ids[start:start + IMPORT_BATCH_SIZE]
+        ).values_list('pk', flat=True))
+
+
+def import_item_code_rows(rows):
+    """
+    Tulis hasil parse_item_code_csv ke lima level hierarki. Harus dipanggil di dalam transaksi.
+    Mengembalikan dict {'created', 'updated', 'errors'}.
+    """
+    rows = list(rows.values()) if isinstance(rows, dict) else list(rows)
+    if not rows:
+        return {'created': 0, 'updated': 0, 'errors': []}
+    golongan, new_golongan = _insert_missing(
+        ItemCodeGolongan, None, {(None, row.kd_gol) for row in rows},
+        lambda _, code: ItemCodeGolongan(code=code)
+    )
+    bidang, new_bidang = _insert_missing(
+        ItemCodeBidang, 'golongan', {(golongan[None, row.kd_gol], row.kdbid) for row in rows},
+        lambda parent_id, code: ItemCodeBidang(golongan_id=parent_id, code=code)
+    )
+    bidang_of = lambda row: bidang[golongan[None, row.kd_gol], row.kdbid]
+    kelompok, new_kelompok = _insert_missing(
+        ItemCodeKelompok, 'bidang', {(bidang_of(row), row.kdkel) for row in rows},
+        lambda parent_id, code: ItemCodeKelompok(bidang_id=parent_id, code=code)
+    )
+    kelompok_of = lambda row: kelompok[bidang_of(row), row.kdkel]
+    # Uraian SubKelompok baru diambil dari baris pertama yang memakainya
+    subkelompok_descriptions = {}
+    for row in rows:
+        subkelompok_descriptions.setdefault((kelompok_of(row), row.kdskel), row.ur_sskel)
+    subkelompok, new_subkelompok = _insert_missing(
+        ItemCodeSubKelompok, 'kelompok', set(subkelompok_descriptions),
+        lambda parent_id, code: ItemCodeSubKelompok(
+            kelompok_id=parent_id, code=code, base_description=subkelompok_descriptions[parent_id, code]
+        )
+    )
+
+    existing = _existing_barang({subkelompok[kelompok_of(row), row.kdskel] for row in rows})
+    new_codes = sorted({full_base_code(row) for row in rows})
+    codes_in_use = {}
+    for start in range(0, len(new_codes), IMPORT_BATCH_SIZE):
+        codes_in_use.update(ItemCodeBarang.objects.filter(
+            full_base_code__in=new_codes[start:start + IMPORT_BATCH_SIZE]
+        ).values_list('full_base_code', 'pk'))
+
+    barang, errors, changed_ids, seen_codes = [], [], [], {}
+    created = updated = 0
+    for row in rows:
+        sub_id = subkelompok[kelompok_of(row), row.kdskel]
+        code = full_base_code(row)
+        current = existing.get((sub_id, row.kd_brg))
+        # Kode berbeda bisa menghasilkan full_base_code sama (mis. '1' dan '01')
+        taken = current is None and code in codes_in_use
+        if taken or seen_codes.setdefault(code, row.line) != row.line:
+            errors.append(f"Error processing row {row.line}: full_base_code {code} sudah dipakai kode barang lain.")
+            continue
+        if current is None:
+            created += 1
+        else:
+            updated += 1
+            if current[1:] != (row.ur_sskel, row.kd_akun, row.ur_akun):
+                changed_ids.append(current[0])
+        barang.append(ItemCodeBarang(
+            sub_kelompok_id=sub_id, code=row.kd_brg, full_base_code=code,
+            base_description=row.ur_sskel, account_code=row.kd_akun, account_description=row.ur_akun,
+            import_fingerprint=row_fingerprint(row)
+        ))
+
+    # Upsert lewat tabel staging; save() tidak dipanggil,
+    # full_base_code sudah diisi di atas
+    merge_item_codes(barang)
+    # Uraian/kode akun varian yang sudah punya stok ikut berubah di snapshot laporan
+    _refresh_variant_snapshots(changed_ids)
+    if new_golongan or new_bidang or new_kelompok or new_subkelompok:
+        # Hanya empat level atas yang di-cache; Barang baru/berubah tidak menaikkan versi
+        invalidate_code_tree_on_commit()
+    return {'created': created, 'updated': updated, 'errors': errors}
+
+
+def diff_item_code_rows(rows):
+    """
+    Bandingkan baris CSV dengan fingerprint tersimpan. Mengembalikan (changed_rows, summary):
+    changed_rows berisi baris baru/berubah (format sama dengan parse_item_code_csv),
+    summary berisi jumlah 'inserted', 'changed', 'unchanged' dan daftar kode 'removed'
+    (ada di database, tidak ada di CSV; tidak dihapus).
+    """
+    stored = dict(ItemCodeBarang.objects.values_list('full_base_code', 'import_fingerprint').iterator())
+    changed_rows, seen = {}, set()
+    summary = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+    for key, row in rows.items():
+        code = full_base_code(row)
+        seen.add(code)
+        fingerprint = stored.get(code)
+        if fingerprint is None:
+            summary['inserted'] += 1
+        elif fingerprint != row_fingerprint(row):
+            summary['changed'] += 1
+        else:
+            summary['unchanged'] += 1
+            continue
+        changed_rows[key] = row
+    summary['removed'] = sorted(code for code in stored if code not in seen)
+    return changed_rows, summary
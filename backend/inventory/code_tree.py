@@ -0,0 +1,138 @@
+# backend/inventory/code_tree.py
+"""
+Cache read-through untuk pohon kode barang (Golongan -> Bidang -> Kelompok ->
+SubKelompok).
+
+Empat level atas (kecil: ratusan baris) dibaca dengan empat query `.values()` lalu
+disimpan di cache Django dengan kunci berversi; tiap proses juga menyimpan hasilnya
+di LRU lokal sehingga lookup prefix kode per id adalah O(1) tanpa query.
+Level Barang (puluhan ribu baris) tidak ikut di-cache: `barang_entries()` mencarinya
+per `full_base_code` dengan satu query IN pada kolom unik ber-index.
+Nomor versi disimpan di database (baris NumberSequence scope CACHE, key 'code_tree'),
+sehingga terlihat oleh semua proses (worker gunicorn, management command) apa pun
+backend cache-nya. Setiap perubahan hierarki (save/delete model, import) menaikkan
+versi setelah transaksi commit; setiap proses membaca versi paling sering sekali per
+VERSION_CHECK_INTERVAL detik dan membangun ulang pohon jika versinya berubah.
+"""
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_SEQUENCE_KEY = 'code_tree'
+TREE_KEY = 'inventory:code_tree:v2:{version}'
+TREE_TIMEOUT = 60 * 60 * 24
+# Versi di database dicek ulang paling cepat tiap N detik per proses
+VERSION_CHECK_INTERVAL = 1.0
+
+BarangEntry = namedtuple(
+    'BarangEntry', 'id sub_kelompok_id code full_base_code base_description account_code'
+)
+
+_version_state = {'version': None, 'checked_at': 0.0}
+# Per thread: True jika ada perubahan hierarki yang versinya belum dinaikkan
+_pending = threading.local()
+
+
+class CodeTree:
+    """Pohon kode dalam memori. Prefix dikembalikan sebagai (bertitik, lengkap), mis. ('1.01.01', '10101')."""
+
+    def __init__(self, data):
+        golongan, bidang, kelompok, subkelompok = data
+        self._bidang = {
+            pk: (f"{golongan[gol_id]}.{code}", f"{str(golongan[gol_id]).zfill(1)}{str(code).zfill(2)}")
+            for pk, (gol_id, code) in bidang.items()
+        }
+        self._kelompok = {
+            pk: self._join(self._bidang[bid_id], code) for pk, (bid_id, code) in kelompok.items()
+        }
+        self._subkelompok = {
+            pk: self._join(self._kelompok[kel_id], code) for pk, (kel_id, code) in subkelompok.items()
+        }
+
+    @staticmethod
+    def _join(parent, code):
+        dotted, full = parent
+        return f"{dotted}.{code}", f"{full}{str(code).zfill(2)}"
+
+    def bidang_prefix(self, bidang_id):
+        return self._bidang.get(bidang_id)
+
+    def kelompok_prefix(self, kelompok_id):
+        return self._kelompok.get(kelompok_id)
+
+    def subkelompok_prefix(self, subkelompok_id):
+        return self._subkelompok.get(subkelompok_id)
+
+
+def _load_tree_data():
+    from .models import ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok
+    golongan = dict(ItemCodeGolongan.objects.values_list('pk', 'code'))
+    bidang = {pk: (gol_id, code) for pk, gol_id, code in ItemCodeBidang.objects.values_list('pk', 'golongan_id', 'code')}
+    kelompok = {pk: (bid_id, code) for pk, bid_id, code in ItemCodeKelompok.objects.values_list('pk', 'bidang_id', 'code')}
+    subkelompok = {
+        pk: (kel_id, code) for pk, kel_id, code in ItemCodeSubKelompok.objects.values_list('pk', 'kelompok_id', 'code')
+    }
+    return golongan, bidang, kelompok, subkelompok
+
+
+@lru_cache(maxsize=2)
+def _tree_for_version(version):
+    key = TREE_KEY.format(version=version)
+    data = cache.get(key)
+    if data is None:
+        data = _load_tree_data()
+        cache.set(key, data, TREE_TIMEOUT)
+    return CodeTree(data)
+
+
+def _current_version():
+    from .models import NumberSequence
+    now = time.monotonic()
+    if _version_state['version'] is None or now - _version_state['checked_at'] >= VERSION_CHECK_INTERVAL:
+        _version_state['version'] = NumberSequence.objects.filter(
+            scope=NumberSequence.Scope.CACHE, key=VERSION_SEQUENCE_KEY
+        ).values_list('last_value', flat=True).first() or 0
+        _version_state['checked_at'] = now
+    return _version_state['version']
+
+
+def get_code_tree():
+    """Pohon kode untuk versi saat ini (dibangun sekali per versi per proses)."""
+    return _tree_for_version(_current_version())
+
+
+def barang_entries(full_base_codes):
+    """{full_base_code: BarangEntry} untuk kode yang ada, dengan satu query IN."""
+    from .models import ItemCodeBarang
+    rows = ItemCodeBarang.objects.filter(full_base_code__in=set(full_base_codes)).values_list(*BarangEntry._fields)
+    return {row[3]: BarangEntry(*row) for row in rows}
+
+
+def invalidate_code_tree():
+    """Naikkan versi pohon kode di database; proses lain membangun ulang pada pengecekan versi berikutnya."""
+    from .models import NumberSequence
+    from .sequences import allocate_number
+    _pending.scheduled = False
+    allocate_number(NumberSequence.Scope.CACHE, VERSION_SEQUENCE_KEY)
+    _version_state['version'] = None
+    _tree_for_version.cache_clear()
+
+
+def _invalidate_if_pending():
+    # Beberapa perubahan dalam satu transaksi: callback pertama menaikkan versi, sisanya no-op
+    if getattr(_pending, 'scheduled', False):
+        invalidate_code_tree()
+
+
+def invalidate_code_tree_on_commit(using=None):
+    """
+    Jadwalkan kenaikan versi setelah commit. Callback tetap didaftarkan setiap kali
+    (callback milik savepoint yang di-rollback dibuang Django), tetapi hanya satu
+    kenaikan versi yang dijalankan per commit.
+    """
+    _pending.scheduled = True
+    transaction.on_commit(_invalidate_if_pending, using=using)
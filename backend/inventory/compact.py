@@ -0,0 +1,113 @@
+# backend/inventory/compact.py
+"""
+Mode representasi ringkas (compact) untuk endpoint list berukuran besar.
+
+Diaktifkan dengan `?view=compact` atau header `Accept: application/json; profile="compact"`.
+Baris dibaca langsung dengan `.values()` dan dikirim apa adanya (field varian datar,
+mis. `variant_full_code`), tanpa membuat instance model maupun serializer bersarang.
+Filter, pencarian, urutan dan pagination tetap sama dengan mode normal.
+"""
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from rest_framework.response import Response
+
+COMPACT_VIEW = 'compact'
+
+# Field varian datar yang menggantikan ProductVariantSerializer bersarang
+VARIANT_COMPACT_FIELDS = {
+    'variant_id': 'variant_id',
+    'variant_full_code': 'variant__full_code',
+    'variant_type_name': 'variant__type_name',
+    'variant_name': 'variant__name',
+    'variant_unit_of_measure': 'variant__unit_of_measure',
+    'base_item_code_id': 'variant__base_item_code_id',
+    'base_item_full_code': 'variant__base_item_code__full_base_code',
+    'base_item_description': 'variant__base_item_code__base_description',
+}
+
+STOCK_COMPACT_FIELDS = {
+    **VARIANT_COMPACT_FIELDS,
+    'total_quantity': 'total_quantity',
+    'low_stock_threshold': 'low_stock_threshold',
+    'last_updated': 'last_updated',
+    'is_low_stock': ExpressionWrapper(
+        Q(low_stock_threshold__isnull=False, total_quantity__lte=F('low_stock_threshold')),
+        output_field=BooleanField()
+    ),
+    'is_out_of_stock': ExpressionWrapper(Q(total_quantity__lte=0), output_field=BooleanField()),
+}
+
+TRANSACTION_COMPACT_FIELDS = {
+    'id': 'id',
+    **VARIANT_COMPACT_FIELDS,
+    'inventory_item': 'inventory_item',
+    'quantity': 'quantity',
+    'transaction_type': 'transaction_type',
+    'timestamp': 'timestamp',
+    'user_id': 'user_id',
+    'user_email': 'user__email',
+    'related_request': 'related_request',
+    'related_spmb': 'related_spmb',
+    'notes': 'notes',
+}
+
+STOCK_OPNAME_ITEM_COMPACT_FIELDS = {
+    'id': 'id',
+    'opname_session': 'opname_session',
+    **VARIANT_COMPACT_FIELDS,
+    'system_quantity': 'system_quantity',
+    'counted_quantity': 'counted_quantity',
+    'difference': 'difference',
+    'confirmation_status': 'confirmation_status',
+    'confirmed_by': 'confirmed_by',
+    'confirmation_notes': 'confirmation_notes',
+    'confirmed_at': 'confirmed_at',
+}
+
+
+def wants_compact(request):
+    if request.query_params.get('view') == COMPACT_VIEW:
+        return True
+    accept = request.META.get('HTTP_ACCEPT', '')
+    return any(
+        param.strip().replace('"', '') == f'profile={COMPACT_VIEW}'
+        for media_range in accept.split(',') for param in media_range.split(';')[1:]
+    )
+
+
+class CompactListMixin:
+    """
+    Mixin ViewSet: `list` mengembalikan baris `.values()` jika mode compact diminta.
+
+    `compact_fields` adalah dict {nama_output: path lookup atau expression}.
+    `compact_choices` (opsional) adalah dict {field: kelas choices}; label-nya
+    ditambahkan sebagai `<field>_display`.
+    """
+    compact_fields = {}
+    compact_choices = {}
+
+    def get_compact_queryset(self, queryset):
+        plain, expressions = [], {}
+        for name, source in self.compact_fields.items():
+            if source == name:
+                plain.append(name)
+            else:
+                expressions[name] = F(source) if isinstance(source, str) else source
+        return queryset.values(*plain, **expressions)
+
+    def _add_choice_labels(self, rows):
+        if not self.compact_choices:
+            return rows
+        labels = {field: dict(choices.choices) for field, choices in self.compact_choices.items()}
+        for row in rows:
+            for field, field_labels in labels.items():
+                row[f'{field}_display'] = field_labels.get(row[field], row[field])
+        return rows
+
+    def list(self, request, *args, **kwargs):
+        if not wants_compact(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.get_compact_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self._add_choice_labels(list(page)))
+        return Response(self._add_choice_labels(list(queryset)))
@@ -0,0 +1,71 @@
+# backend/inventory/exports.py
+"""
+Ekspor CSV streaming untuk action `export-csv` di viewset laporan.
+
+Baris ditulis ke response sedikit demi sedikit (StreamingHttpResponse) sehingga
+download langsung dimulai dan memori tetap konstan meskipun jumlah baris jutaan.
+Queryset sebaiknya dibaca dengan `.iterator(chunk_size=EXPORT_CHUNK_SIZE)` atau
+`.values_list()`. Tambahkan `?compress=gzip` untuk mengunduh file .csv.gz.
+"""
+import csv
+import zlib
+from datetime import date
+
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_DELIMITER = ';'
+# Jumlah baris CSV yang digabung menjadi satu potongan response
+ROWS_PER_WRITE = 500
+
+
+class _Echo:
+    """Objek file semu: csv.writer menulis ke sini dan nilai barisnya dikembalikan."""
+
+    def write(self, value):
+        return value
+
+
+def _iter_csv_text(header, rows, delimiter):
+    writer = csv.writer(_Echo(), delimiter=delimiter)
+    buffer = [writer.writerow(header)]
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def wants_gzip(request):
+    return request.query_params.get('compress') == 'gzip'
+
+
+def export_filename(prefix):
+    """Nama file standar laporan, mis. 'laporan_stok_terkini_20250101.csv'."""
+    return f"{prefix}_{date.today().strftime('%Y%m%d')}.csv"
+
+
+def streaming_csv_response(filename, header, rows, gzip=False, delimiter=CSV_DELIMITER):
+    """
+    Buat StreamingHttpResponse CSV dari `header` dan iterable `rows` (list nilai per baris).
+    Jika `gzip` True, isi dikompresi on-the-fly dan file diberi akhiran .gz.
+    """
+    chunks = _iter_csv_text(header, rows, delimiter)
+    if gzip:
+        response = StreamingHttpResponse(_iter_gzip(chunks), content_type='application/gzip')
+        filename = f"{filename}.gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,147 @@
+# backend/inventory/fieldsets.py
+"""
+Sparse fieldset untuk endpoint baca: `?fields=` dan `?omit=`.
+
+Contoh: `/stock-levels/?fields=total_quantity,variant.full_code,variant.name`
+atau `/transactions/?omit=variant.base_item_code,notes`. Nama bertitik memilih field
+di dalam serializer bersarang. Selain memangkas payload, daftar field yang tersisa
+dipakai untuk `.only()` dan `select_related` pada queryset, sehingga kolom dan join
+yang tidak diminta tidak ikut dibaca dari database.
+"""
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+_DISPLAY_METHOD = re.compile(r'get_(\w+)_display')
+
+
+class _Unresolvable(Exception):
+    """Field serializer tidak bisa dipetakan ke kolom model (mis. property)."""
+
+
+def _parse_tree(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in [part.strip() for part in path.split('.') if part.strip()]:
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _nested(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+def prune_fields(serializer, include, omit):
+    """Buang field yang tidak diminta (`include`) atau dikecualikan (`omit`), rekursif."""
+    fields = serializer.fields
+    if include:
+        for name in list(fields):
+            if name not in include:
+                fields.pop(name)
+    for name in list(fields):
+        child = _nested(fields[name])
+        if name in omit and not omit[name]:
+            fields.pop(name)
+        elif child is not None and (include.get(name) or omit.get(name)):
+            prune_fields(child, include.get(name, {}), omit.get(name, {}))
+
+
+def _collect_columns(serializer, model, prefix, only, related):
+    dependencies = getattr(serializer, 'field_dependencies', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in dependencies:
+            for column in dependencies[name]:
+                parts = column.split('__')
+                for depth in range(1, len(parts)):
+                    relation = prefix + '__'.join(parts[:depth])
+                    only.add(relation)
+                    related.add(relation)
+                only.add(f'{prefix}{column}')
+            continue
+        if field.source == '*' or isinstance(field, serializers.ListSerializer):
+            raise _Unresolvable(name)
+
+        current_model, path = model, prefix
+        attrs = field.source_attrs
+        for index, attr in enumerate(attrs):
+            is_last = index == len(attrs) - 1
+            display = _DISPLAY_METHOD.fullmatch(attr)
+            try:
+                model_field = current_model._meta.get_field(display.group(1) if display else attr)
+            except FieldDoesNotExist:
+                raise _Unresolvable(name)
+            if not model_field.concrete or model_field.many_to_many:
+                raise _Unresolvable(name)
+            only.add(f'{path}{model_field.name}')
+            if not model_field.is_relation:
+                if not is_last:
+                    raise _Unresolvable(name)
+                break
+            if is_last and not isinstance(field, serializers.BaseSerializer):
+                break # PrimaryKeyRelatedField: cukup kolom FK
+            related.add(f'{path}{model_field.name}')
+            current_model, path = model_field.related_model, f'{path}{model_field.name}__'
+            if is_last:
+                _collect_columns(field, current_model, path, only, related)
+
+
+def prune_queryset(queryset, serializer):
+    """
+    Terapkan `.only()` dan `select_related` sesuai field serializer yang tersisa.
+    Jika ada field yang tidak bisa dipetakan ke kolom, queryset dikembalikan apa adanya.
+    """
+    only, related = set(), set()
+    try:
+        _collect_columns(serializer, queryset.model, '', only, related)
+    except _Unresolvable:
+        return queryset
+    return queryset.select_related(None).select_related(*sorted(related)).only(*sorted(only))
+
+
+def _requested_trees(request):
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    include = _parse_tree(request.query_params.get(FIELDS_PARAM))
+    omit = _parse_tree(request.query_params.get(OMIT_PARAM))
+    if not include and not omit:
+        return None
+    return include, omit
+
+
+class SparseFieldsMixin:
+    """
+    Mixin ModelSerializer: hormati `?fields=`/`?omit=` dari request di context.
+    Hanya serializer utama (yang dibuat view dengan context) yang membaca parameter.
+    `field_dependencies` (opsional) memetakan field non-kolom (property) ke kolom model.
+    """
+    field_dependencies = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        trees = _requested_trees(kwargs.get('context', {}).get('request'))
+        if trees is not None:
+            prune_fields(self, *trees)
+
+
+class SparseFieldsViewMixin:
+    """Mixin ViewSet: pangkas kolom/join queryset sesuai `?fields=`/`?omit=`."""
+
+    def filter_queryset(self, queryset):
+        # Dipasang di filter_queryset agar berlaku juga untuk viewset yang meng-override get_queryset
+        queryset = super().filter_queryset(queryset)
+        if _requested_trees(self.request) is None:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        return prune_queryset(queryset, serializer)
@@ -0,0 +1,228 @@
+# backend/inventory/fifo.py
+"""
+Mesin alokasi stok FIFO untuk pengeluaran barang (proses request oleh Operator).
+
+Semua batch InventoryItem untuk varian yang dibutuhkan dikunci sekaligus dengan
+satu select_for_update berurutan (varian, tanggal masuk, id), lalu baris Stock-nya.
+Alokasi dihitung di memori dan dibatasi oleh yang lebih kecil dari sisa batch dan
+stok sistem (selisih/drift ditolak per request, bukan saat flush). Hasilnya ditulis
+kembali dengan bulk_update dan satu UPDATE atomik per varian pada Stock (stock_mutations),
+sehingga jumlah query dan lama lock tidak bergantung pada jumlah batch.
+"""
+from collections import defaultdict
+
+from django.utils import timezone
+from users.models import CustomUser
+
+from .models import InventoryItem, ProductVariant, Request, RequestItem, SPMB, Stock, Transaction
+from .stock_mutations import apply_stock_deltas, NegativeStockError
+from .rollups import add_consumption
+from .valuation import refresh_valuations
+
+
+class InsufficientStockError(Exception):
+    """Stok satu varian tidak cukup untuk memenuhi jumlah yang disetujui."""
+
+    def __init__(self, variant, requested, available):
+        self.variant = variant
+        self.requested = requested
+        self.available = available
+        if available <= 0:
+            message = f"Stok habis untuk barang '{variant.name}'. Proses dibatalkan."
+        else:
+            message = (
+                f"Stok tidak mencukupi untuk '{variant.name}'. Diminta {requested}, "
+                f"tersedia {available}. Proses dibatalkan."
+            )
+        super().__init__(message)
+
+
+class FifoAllocator:
+    """
+    Alokasi FIFO atas batch yang sudah dikunci. Panggil flush() sekali di akhir
+    (masih di dalam transaksi yang sama) untuk menyimpan perubahan ke database.
+    """
+
+    def __init__(self, variant_ids):
+        variant_ids = set(variant_ids)
+        self._batches = defaultdict(list)
+        batches = InventoryItem.objects.select_for_update().filter(
+            variant_id__in=variant_ids, quantity__gt=0
+        ).order_by('variant_id', 'entry_date', 'id')
+        for batch in batches:
+            self._batches[batch.variant_id].append(batch)
+        # Stock dikunci juga agar flush() tidak gagal di tengah batch karena stok sistem berubah
+        self._stock = dict(
+            Stock.objects.select_for_update().filter(variant_id__in=variant_ids)
+            .order_by('variant_id').values_list('variant_id', 'total_quantity')
+        )
+        self._changed = {}
+        self._issued = defaultdict(int)
+
+    def available(self, variant_id):
+        """Sisa yang bisa dikeluarkan: batch tersisa, dibatasi stok sistem jika lebih kecil (drift)."""
+        batches = sum(batch.quantity for batch in self._batches[variant_id])
+        return min(batches, self._stock.get(variant_id, 0) - self._issued[variant_id])
+
+    def allocate(self, lines):
+        """
+        Alokasikan [(variant, jumlah), ...] secara utuh atau tidak sama sekali.
+        Mengembalikan list [(batch, jumlah_diambil), ...] per baris, urutan sama dengan input.
+        Raise InsufficientStockError tanpa mengubah apa pun jika ada varian yang kurang.
+        """
+        needed = defaultdict(int)
+        for variant, quantity in lines:
+            needed[variant.id] += quantity
+        for variant, _ in lines:
+            available = self.available(variant.id)
+            if available < needed[variant.id]:
+                raise InsufficientStockError(variant, needed[variant.id], available)
+
+        allocations = []
+        for variant, quantity in lines:
+            remaining = quantity
+            taken = []
+            for batch in self._batches[variant.id]:
+                if remaining <= 0:
+                    break
+                take_from_batch = min(remaining, batch.quantity)
+                if take_from_batch <= 0:
+                    continue
+                batch.quantity -= take_from_batch
+                remaining -= take_from_batch
+                self._changed[batch.pk] = batch
+                self._issued[variant.id] += take_from_batch
+                taken.append((batch, take_from_batch))
+            allocations.append(taken)
+        return allocations
+
+    def flush(self):
+        """
+        Simpan sisa batch (bulk_update), kurangi Stock (satu UPDATE per varian),
+        dan perbarui nilai FIFO varian yang berubah.
+        """
+        if self._changed:
+            InventoryItem.objects.bulk_update(list(self._changed.values()), ['quantity'])
+        try:
+            apply_stock_deltas({variant_id: -qty for variant_id, qty in self._issued.items()})
+        except NegativeStockError as e:
+            # Tidak terjadi selama Stock terkunci sejak __init__ (drift sudah ditolak di allocate());
+            # tetap dipetakan ke stok kurang untuk berjaga-jaga
+            variant = ProductVariant.objects.get(pk=e.variant_id)
+            raise InsufficientStockError(variant, -e.delta, e.available)
+        refresh_valuations(self._issued)
+        self._changed = {}
+        self._issued = defaultdict(int)
+
+
+def _issue(issued, user):
+    """
+    Tulis hasil alokasi [(req, items, allocations), ...]: request COMPLETED, SPMB
+    (nomor direservasi sekaligus), quantity_issued, Transaction OUT, dan rekap konsumsi harian.
+    Mengembalikan {request_id: SPMB} untuk request yang punya item disetujui.
+    """
+    now = timezone.now()
+    for req, _, _ in issued:
+        req.status = Request.Status.COMPLETED
+        req.operator_processor = user
+        req.operator_processed_at = now
+    Request.objects.bulk_update(
+        [req for req, _, _ in issued], ['status', 'operator_processor', 'operator_processed_at']
+    )
+
+    with_items = [(req, items, allocations) for req, items, allocations in issued if items]
+    if not with_items:
+        return {}
+    numbers = SPMB.reserve_spmb_numbers(len(with_items))
+    spmbs = SPMB.objects.bulk_create([
+        SPMB(request=req, spmb_number=number, issued_by=user, issued_at=now)
+        for (req, _, _), number in zip(with_items, numbers)
+    ])
+
+    departments = dict(
+        CustomUser.objects.filter(pk__in={req.requester_id for req, _, _ in with_items})
+        .values_list('pk', 'department_code')
+    )
+    today = timezone.localdate(now)
+    consumption = defaultdict(int)
+    items_to_update = []
+    transactions_to_create = []
+    for (req, items, allocations), spmb in zip(with_items, spmbs):
+        department_code = departments.get(req.requester_id) or ''
+        for item, taken in zip(items, allocations):
+            item.quantity_issued = sum(qty for _, qty in taken)
+            items_to_update.append(item)
+            if req.requester_id:
+                consumption[(today, department_code, item.variant_id)] += item.quantity_issued
+            for batch, qty in taken:
+                transactions_to_create.append(Transaction(
+                    variant=item.variant, inventory_item=batch, quantity=-qty,
+                    transaction_type=Transaction.Type.OUT, user=user, timestamp=now,
+                    related_request=req, related_spmb=spmb,
+                    notes=f"Pengeluaran untuk Request #{req.id}"
+                ))
+    RequestItem.objects.bulk_update(items_to_update, ['quantity_issued'])
+    Transaction.objects.bulk_create(transactions_to_create)
+    add_consumption(consumption)
+    return {spmb.request_id: spmb for spmb in spmbs}
+
+
+def _items_to_issue(request_ids):
+    items_by_request = defaultdict(list)
+    items = RequestItem.objects.select_related('variant').filter(
+        request_id__in=request_ids, quantity_approved_spv2__gt=0
+    ).order_by('request_id', 'id')
+    for item in items:
+        items_by_request[item.request_id].append(item)
+    return items_by_request
+
+
+def issue_request(req, user):
+    """
+    Keluarkan barang untuk satu request APPROVED_SPV2: alokasi FIFO, terbitkan SPMB,
+    catat Transaction OUT, dan tandai request COMPLETED. Harus dipanggil di dalam
+    transaksi. Request dikunci dan statusnya dicek ulang (seperti issue_requests), sehingga
+    dua proses bersamaan tidak mengeluarkan barang dua kali: Request.DoesNotExist jika
+    request sudah tidak APPROVED_SPV2. Raise InsufficientStockError jika stok kurang
+    (tidak ada yang ditulis). Mengembalikan SPMB (None jika tidak ada item yang disetujui).
+    """
+    req = Request.objects.select_for_update().get(pk=req.pk, status=Request.Status.APPROVED_SPV2)
+    items = _items_to_issue([req.pk])[req.pk]
+    allocator = FifoAllocator(item.variant_id for item in items)
+    allocations = allocator.allocate([(item.variant, item.quantity_approved_spv2) for item in items])
+    spmbs = _issue([(req, items, allocations)], user)
+    allocator.flush()
+    return spmbs.get(req.pk)
+
+
+def issue_requests(request_ids, user):
+    """
+    Proses banyak request APPROVED_SPV2 dalam satu pass: request dikunci dan diproses
+    berurutan (submitted_at, id) atas satu set batch yang dikunci bersama. Request yang
+    stoknya kurang dilewati tanpa perubahan; request lain tetap diproses.
+    Harus dipanggil di dalam transaksi. Mengembalikan list (req, spmb, error) sesuai urutan.
+    """
+    requests = list(
+        Request.objects.select_for_update().filter(
+            pk__in=request_ids, status=Request.Status.APPROVED_SPV2
+        ).order_by('submitted_at', 'id')
+    )
+    items_by_request = _items_to_issue([req.pk for req in requests])
+    allocator = FifoAllocator(
+        item.variant_id for items in items_by_request.values() for item in items
+    )
+
+    issued = []
+    errors = {}
+    for req in requests:
+        items = items_by_request.get(req.pk, [])
+        try:
+            allocations = allocator.allocate([(item.variant, item.quantity_approved_spv2) for item in items])
+        except InsufficientStockError as e:
+            errors[req.pk] = str(e)
+            continue
+        issued.append((req, items, allocations))
+
+    spmbs = _issue(issued, user)
+    allocator.flush()
+    return [(req, spmbs.get(req.pk), errors.get(req.pk)) for req in requests]
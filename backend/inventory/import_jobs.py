@@ -0,0 +1,185 @@
+# backend/inventory/import_jobs.py
+"""
+Pemrosesan job import kuitansi di luar request-thread.
+
+Upload disimpan sebagai ReceiptImportJob lalu diproses oleh worker lokal:
+thread pool in-process (default) atau management command `process_import_jobs`.
+File dibaca streaming dua kali: validasi penuh dulu, kemudian di-ingest per
+chunk dalam transaksi terpisah sehingga progres bisa dipantau lewat endpoint status.
+Nomor baris terakhir yang di-commit disimpan di job (`last_committed_row`) dalam
+transaksi yang sama dengan chunk-nya; job FAILED yang di-retry melanjutkan setelah
+baris itu sehingga baris yang sudah tersimpan tidak di-ingest dua kali.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ReceiptImportJob
+from .receipt_import import iter_receipt_chunks, scan_receipt_file, ingest_receipt_rows, MAX_REPORTED_ERRORS
+from .spreadsheet import DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_ERRORS = MAX_REPORTED_ERRORS
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'RECEIPT_IMPORT_WORKERS', 1),
+            thread_name_prefix='receipt-import'
+        )
+    return _executor
+
+
+def create_receipt_import_job(file, user):
+    """Simpan file upload sebagai job baru dan jadwalkan pemrosesannya."""
+    job = ReceiptImportJob.objects.create(
+        uploaded_file=file,
+        original_filename=getattr(file, 'name', '') or '',
+        created_by=user
+    )
+    _schedule_job(job.pk)
+    return job
+
+
+def retry_receipt_import_job(job_id):
+    """
+    Kembalikan job FAILED ke PENDING dan jadwalkan ulang. Progres (`processed_rows`,
+    `last_committed_row`) dipertahankan sehingga pemrosesan melanjutkan setelah baris
+    terakhir yang tersimpan. Mengembalikan False jika job tidak berstatus FAILED.
+    """
+    retried = ReceiptImportJob.objects.filter(
+        pk=job_id, status=ReceiptImportJob.Status.FAILED
+    ).update(
+        status=ReceiptImportJob.Status.PENDING, message=None, error_count=0, errors=[],
+        started_at=None, finished_at=None
+    ) == 1
+    if retried:
+        _schedule_job(job_id)
+    return retried
+
+
+def _schedule_job(job_id):
+    if getattr(settings, 'RECEIPT_IMPORT_RUN_IN_PROCESS', True):
+        # Jalankan setelah commit agar worker melihat baris job yang sudah tersimpan
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job_id))
+
+
+def _run_in_thread(job_id):
+    try:
+        process_receipt_import_job(job_id)
+    finally:
+        # Thread worker punya koneksi database sendiri; tutup setelah selesai
+        connection.close()
+
+
+def _claim_job(job_id):
+    """Ambil job PENDING secara atomik agar tidak diproses dua worker sekaligus."""
+    return ReceiptImportJob.objects.filter(
+        pk=job_id, status=ReceiptImportJob.Status.PENDING
+    ).update(status=ReceiptImportJob.Status.PROCESSING, started_at=timezone.now()) == 1
+
+
+def _fail_job(job_id, message, errors=None, error_count=None):
+    errors = errors or []
+    ReceiptImportJob.objects.filter(pk=job_id).update(
+        status=ReceiptImportJob.Status.FAILED,
+        message=message,
+        error_count=len(errors) if error_count is None else error_count,
+        errors=errors[:MAX_STORED_ERRORS],
+        finished_at=timezone.now()
+    )
+
+
+def _saved_rows_note(job_id):
+    """Keterangan baris yang sudah tersimpan untuk pesan job FAILED (kosong jika belum ada)."""
+    processed, last_row = ReceiptImportJob.objects.filter(pk=job_id).values_list(
+        'processed_rows', 'last_committed_row'
+    ).get()
+    if not processed:
+        return ""
+    return (
+        f" {processed} baris sampai baris {last_row} sudah tersimpan; retry job ini untuk melanjutkan "
+        f"dari baris berikutnya (jangan upload ulang file agar stok tidak tercatat ganda)."
+    )
+
+
+def process_receipt_import_job(job_id, chunk_size=None):
+    """
+    Proses satu job import. Mengembalikan False jika job sudah diambil worker lain.
+    Setiap chunk di-commit terpisah bersama progres job; baris sampai
+    `last_committed_row` (dari percobaan sebelumnya) dilewati.
+    """
+    if not _claim_job(job_id):
+        return False
+    chunk_size = chunk_size or getattr(settings, 'RECEIPT_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    job = ReceiptImportJob.objects.select_related('created_by').get(pk=job_id)
+
+    try:
+        # Tahap 1: validasi streaming seluruh file (tanpa menulis apa pun)
+        try:
+            with job.uploaded_file.open('rb') as file:
+                scan = scan_receipt_file(file, chunk_size, max_errors=MAX_STORED_ERRORS)
+        except ValueError as e_file:
+            _fail_job(job_id, str(e_file))
+            return True
+        ReceiptImportJob.objects.filter(pk=job_id).update(total_rows=scan['total_rows'])
+        if scan['error_count']:
+            _fail_job(
+                job_id,
+                f"Gagal memproses {scan['error_count']} baris dari file (ditampilkan maksimal {MAX_STORED_ERRORS}).",
+                scan['errors'], error_count=scan['error_count']
+            )
+            return True
+        warning_count = scan['warning_count']
+
+        # Tahap 2: baca ulang secara streaming dan ingest per chunk (commit terpisah),
+        # melewati baris yang sudah di-commit oleh percobaan sebelumnya
+        resume_after = job.last_committed_row
+        processed = job.processed_rows
+        created_variants = job.created_variants
+        with job.uploaded_file.open('rb') as file:
+            for records, _, _ in iter_receipt_chunks(file, chunk_size):
+                records = [r for r in records if r['row_num'] > resume_after]
+                if not records:
+                    continue
+                with transaction.atomic():
+                    result = ingest_receipt_rows(records, job.created_by)
+                    if result["errors"]:
+                        transaction.set_rollback(True)
+                    else:
+                        # Progres ikut transaksi chunk: tersimpan jika dan hanya jika chunk-nya tersimpan
+                        processed += result["processed"]
+                        created_variants += result["created_variants"]
+                        ReceiptImportJob.objects.filter(pk=job_id).update(
+                            processed_rows=processed, created_variants=created_variants,
+                            last_committed_row=records[-1]['row_num']
+                        )
+                if result["errors"]:
+                    _fail_job(
+                        job_id,
+                        f"Gagal memproses chunk mulai baris {records[0]['row_num']}." + _saved_rows_note(job_id),
+                        result["errors"]
+                    )
+                    return True
+
+        ReceiptImportJob.objects.filter(pk=job_id).update(
+            status=ReceiptImportJob.Status.COMPLETED,
+            message=f"Berhasil memproses {processed} item barang dari file."
+                    + (f" Peringatan: {warning_count}." if warning_count else ""),
+            finished_at=timezone.now()
+        )
+    except Exception as e:
+        logger.exception("Receipt import job %s gagal", job_id)
+        _fail_job(
+            job_id,
+            f"Terjadi kesalahan internal saat memproses file: {type(e).__name__}." + _saved_rows_note(job_id)
+        )
+    return True
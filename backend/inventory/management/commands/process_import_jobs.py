@@ -0,0 +1,30 @@
+# backend/inventory/management/commands/process_import_jobs.py
+
+import time
+from django.core.management.base import BaseCommand
+from inventory.models import ReceiptImportJob
+from inventory.import_jobs import process_receipt_import_job
+
+
+class Command(BaseCommand):
+    help = 'Processes pending receipt import jobs (use when RECEIPT_IMPORT_RUN_IN_PROCESS is disabled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per committed chunk')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5.0, help='Polling interval in seconds (with --loop)')
+
+    def handle(self, *args, **options):
+        while True:
+            pending_ids = list(
+                ReceiptImportJob.objects.filter(status=ReceiptImportJob.Status.PENDING)
+                .order_by('created_at').values_list('pk', flat=True)
+            )
+            for job_id in pending_ids:
+                if process_receipt_import_job(job_id, chunk_size=options['chunk_size']):
+                    job = ReceiptImportJob.objects.get(pk=job_id)
+                    style = self.style.SUCCESS if job.status == ReceiptImportJob.Status.COMPLETED else self.style.ERROR
+                    self.stdout.write(style(f"Job #{job_id}: {job.get_status_display()} - {job.message}"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
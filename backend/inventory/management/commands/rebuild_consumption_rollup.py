@@ -0,0 +1,27 @@
+# backend/inventory/management/commands/rebuild_consumption_rollup.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from inventory.rollups import rebuild_consumption
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the DailyConsumption rollup from OUT transactions (whole history or a date range)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, default=None, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, default=None, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ('start', 'end'):
+            value = options[name]
+            dates[name] = parse_date(value) if value else None
+            if value and dates[name] is None:
+                raise CommandError(f"Invalid --{name} date: {value} (expected YYYY-MM-DD)")
+
+        with transaction.atomic():
+            row_count = rebuild_consumption(dates['start'], dates['end'])
+        period = f"{dates['start'] or 'awal'} s/d {dates['end'] or 'akhir'}"
+        self.stdout.write(self.style.SUCCESS(f"Rekap konsumsi harian ({period}) dibangun ulang: {row_count} baris."))
@@ -0,0 +1,14 @@
+# backend/inventory/management/commands/rebuild_stock_snapshot.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.snapshots import rebuild_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the StockSnapshot read model used by the stock reports (e.g. after renaming item code hierarchy entries)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            row_count = rebuild_stock_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Snapshot stok dibangun ulang: {row_count} baris."))
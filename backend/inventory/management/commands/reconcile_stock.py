@@ -0,0 +1,53 @@
+# backend/inventory/management/commands/reconcile_stock.py
+
+from django.core.management.base import BaseCommand
+from inventory.reconciliation import reconcile_stock, repair_mismatch, REPAIR_SOURCES
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares Stock totals with the transaction ledger and open batch quantities per variant; '
+        'incremental from the last checkpoint unless --full is given'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Sum the whole ledger, check every variant and rebuild the ledger balances'
+        )
+        parser.add_argument('--repair', action='store_true', help='Set Stock.total_quantity to the --source total')
+        parser.add_argument(
+            '--source', choices=REPAIR_SOURCES, default='ledger',
+            help='Total used by --repair; "batches" also posts an ADJUST transaction so the ledger matches'
+        )
+        parser.add_argument(
+            '--no-advance', action='store_true',
+            help='Do not move the checkpoint or update the ledger balances (read-only run)'
+        )
+
+    def handle(self, *args, **options):
+        run = reconcile_stock(full=options['full'], advance=not options['no_advance'])
+        mismatch_count = repaired = skipped = 0
+        # Selisih ditulis satu per satu saat ditemukan (stream), tidak dikumpulkan dulu
+        for mismatch in run.mismatches():
+            mismatch_count += 1
+            self.stdout.write(self.style.WARNING(
+                f"{mismatch.full_code or mismatch.variant_id}: stock={mismatch.stock} ledger={mismatch.ledger} "
+                f"batches={mismatch.batches} ({', '.join(mismatch.issues)})"
+            ))
+            if options['repair'] and mismatch.needs_repair(options['source']):
+                result = repair_mismatch(mismatch, source=options['source'])
+                if result is None:
+                    self.stderr.write(self.style.ERROR("  not repaired (see log)"))
+                elif result.skipped:
+                    skipped += 1
+                    self.stdout.write("  skipped: consistent after re-checking with the stock row locked")
+                else:
+                    repaired += 1
+                    self.stdout.write(f"  repaired: stock {result.old_stock} -> {result.new_stock}")
+
+        mode = 'full' if options['full'] else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciliation ({mode}) finished: {run.checked} variants checked, {mismatch_count} mismatches, "
+            f"{repaired} repaired, {skipped} skipped. Checkpoint at transaction #{run.checkpoint_id}."
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 01:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_productvariant_barcode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uploaded_file', models.FileField(upload_to='receipt_imports/%Y/%m/', verbose_name='file unggahan')),
+                ('original_filename', models.CharField(blank=True, max_length=255, verbose_name='nama file asli')),
+                ('status', models.CharField(choices=[('PENDING', 'Menunggu Diproses'), ('PROCESSING', 'Sedang Diproses'), ('COMPLETED', 'Selesai'), ('FAILED', 'Gagal')], db_index=True, default='PENDING', max_length=20, verbose_name='status')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='total baris')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='baris diproses')),
+                ('created_variants', models.PositiveIntegerField(default=0, verbose_name='varian baru')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='jumlah error')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Dibatasi sejumlah entri pertama; total ada di error_count.', verbose_name='error per baris')),
+                ('message', models.TextField(blank=True, null=True, verbose_name='pesan')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='dibuat tanggal')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='mulai diproses')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='selesai diproses')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='receipt_import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='dibuat oleh')),
+            ],
+            options={
+                'verbose_name': 'Job Import Kuitansi',
+                'verbose_name_plural': 'Job Import Kuitansi',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_receiptimportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('REQUEST', 'Nomor Permintaan'), ('SPMB', 'Nomor SPMB'), ('VARIANT', 'Kode Spesifik Varian')], max_length=20, verbose_name='lingkup')),
+                ('key', models.CharField(help_text="Mis. 'WBC.051/2025' untuk permintaan atau ID kode barang dasar untuk varian", max_length=100, verbose_name='kunci')),
+                ('last_value', models.PositiveBigIntegerField(default=0, verbose_name='nomor terakhir')),
+            ],
+            options={
+                'verbose_name': 'Counter Nomor Urut',
+                'verbose_name_plural': 'Counter Nomor Urut',
+                'ordering': ['scope', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='unique_number_sequence_scope_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-17 02:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_stock_valuation(apps, schema_editor):
+    """Isi nilai FIFO awal untuk semua varian yang sudah punya stok."""
+    Stock = apps.get_model('inventory', 'Stock')
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockValuation = apps.get_model('inventory', 'StockValuation')
+
+    batches = defaultdict(list)
+    open_batches = InventoryItem.objects.filter(quantity__gt=0).order_by(
+        'variant_id', 'entry_date', 'id'
+    ).values_list('variant_id', 'quantity', 'purchase_price')
+    for variant_id, quantity, purchase_price in open_batches.iterator():
+        batches[variant_id].append((quantity, purchase_price or Decimal('0.00')))
+
+    valuations = []
+    for variant_id, quantity_on_hand in Stock.objects.values_list('variant_id', 'total_quantity').iterator():
+        total_value = Decimal('0.00')
+        for quantity, purchase_price in batches.get(variant_id, []):
+            if quantity_on_hand <= 0:
+                break
+            taken = min(quantity_on_hand, quantity)
+            total_value += taken * purchase_price
+            quantity_on_hand -= taken
+        valuations.append(StockValuation(variant_id=variant_id, total_value=total_value))
+    StockValuation.objects.bulk_create(valuations, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockValuation',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fifo_valuation', serialize=False, to='inventory.productvariant', verbose_name='varian produk spesifik')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='total nilai FIFO')),
+                ('last_updated', models.DateTimeField(default=django.utils.timezone.now, verbose_name='terakhir diperbarui')),
+            ],
+            options={
+                'verbose_name': 'Nilai Stok FIFO',
+                'verbose_name_plural': 'Nilai Stok FIFO',
+            },
+        ),
+        migrations.RunPython(backfill_stock_valuation, migrations.RunPython.noop),
+    ]
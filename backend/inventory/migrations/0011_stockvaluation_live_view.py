@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Nilai FIFO per varian: running total kuantitas batch (urut entry_date, id) dipotong
+# pada Stock.total_quantity, sehingga hanya batch tertua yang masih tercakup stok yang dihitung.
+CREATE_VIEW_SQL = """
+CREATE VIEW inventory_stockvaluation_live AS
+SELECT
+    s.variant_id AS variant_id,
+    s.total_quantity AS total_quantity,
+    COALESCE(SUM(
+        CASE
+            WHEN b.running_quantity <= s.total_quantity THEN b.quantity
+            WHEN b.running_quantity - b.quantity >= s.total_quantity THEN 0
+            ELSE s.total_quantity - (b.running_quantity - b.quantity)
+        END * b.purchase_price
+    ), 0) AS total_value
+FROM inventory_stock s
+LEFT JOIN (
+    SELECT
+        variant_id,
+        quantity,
+        purchase_price,
+        SUM(quantity) OVER (
+            PARTITION BY variant_id ORDER BY entry_date, id
+            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        ) AS running_quantity
+    FROM inventory_inventoryitem
+    WHERE quantity > 0
+) b ON b.variant_id = s.variant_id
+GROUP BY s.variant_id, s.total_quantity
+"""
+
+DROP_VIEW_SQL = "DROP VIEW IF EXISTS inventory_stockvaluation_live"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stockvaluation'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_VIEW_SQL, DROP_VIEW_SQL),
+        migrations.CreateModel(
+            name='StockValuationLive',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fifo_valuation_live', serialize=False, to='inventory.productvariant', verbose_name='varian produk spesifik')),
+                ('total_quantity', models.IntegerField(verbose_name='total kuantitas')),
+                ('total_value', models.DecimalField(decimal_places=2, max_digits=19, verbose_name='total nilai FIFO')),
+            ],
+            options={
+                'verbose_name': 'Nilai Stok FIFO (Live)',
+                'verbose_name_plural': 'Nilai Stok FIFO (Live)',
+                'db_table': 'inventory_stockvaluation_live',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Abs, TruncDate
+
+
+def backfill_daily_consumption(apps, schema_editor):
+    """Bangun rekap awal dari seluruh Transaction OUT yang terkait request."""
+    Transaction = apps.get_model('inventory', 'Transaction')
+    DailyConsumption = apps.get_model('inventory', 'DailyConsumption')
+
+    totals = {}
+    rows = Transaction.objects.filter(
+        transaction_type='OUT', related_request__isnull=False, related_request__requester__isnull=False
+    ).annotate(day=TruncDate('timestamp')).values(
+        'day', 'related_request__requester__department_code', 'variant_id'
+    ).annotate(quantity=Sum(Abs('quantity'))).order_by()
+    for row in rows.iterator():
+        key = (row['day'], row['related_request__requester__department_code'] or '', row['variant_id'])
+        totals[key] = totals.get(key, 0) + (row['quantity'] or 0)
+    DailyConsumption.objects.bulk_create([
+        DailyConsumption(day=day, department_code=department_code, variant_id=variant_id, quantity_out=quantity)
+        for (day, department_code, variant_id), quantity in totals.items() if quantity
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_transaction_timestamp_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='tanggal')),
+                ('department_code', models.CharField(blank=True, max_length=10, verbose_name='kode bagian/bidang peminta')),
+                ('quantity_out', models.PositiveBigIntegerField(default=0, verbose_name='jumlah keluar')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_consumption', to='inventory.productvariant', verbose_name='varian produk')),
+            ],
+            options={
+                'verbose_name': 'Rekap Konsumsi Harian',
+                'verbose_name_plural': 'Rekap Konsumsi Harian',
+                'ordering': ['-day', 'department_code'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'department_code', 'variant'), name='unique_daily_consumption')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_consumption, migrations.RunPython.noop),
+    ]
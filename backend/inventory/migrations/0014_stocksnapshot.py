@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-17 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_stock_snapshot(apps, schema_editor):
+    """Isi snapshot awal dari seluruh baris Stock yang sudah ada."""
+    Stock = apps.get_model('inventory', 'Stock')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+
+    rows = Stock.objects.values(
+        'variant_id', 'total_quantity', 'low_stock_threshold', 'last_updated',
+        'variant__full_code', 'variant__type_name', 'variant__name', 'variant__unit_of_measure',
+        'variant__base_item_code__base_description', 'variant__base_item_code__account_code',
+        'variant__base_item_code__sub_kelompok__kelompok__bidang__golongan__code',
+        'variant__base_item_code__sub_kelompok__kelompok__bidang__code',
+        'variant__base_item_code__sub_kelompok__kelompok__code',
+        'variant__base_item_code__sub_kelompok__code',
+    )
+    snapshots = []
+    for row in rows.iterator():
+        threshold = row['low_stock_threshold']
+        snapshots.append(StockSnapshot(
+            variant_id=row['variant_id'],
+            full_code=row['variant__full_code'] or '',
+            type_name=row['variant__type_name'],
+            variant_name=row['variant__name'],
+            unit_of_measure=row['variant__unit_of_measure'],
+            base_item_description=row['variant__base_item_code__base_description'] or '',
+            account_code=row['variant__base_item_code__account_code'],
+            golongan_code=row['variant__base_item_code__sub_kelompok__kelompok__bidang__golongan__code'],
+            bidang_code=row['variant__base_item_code__sub_kelompok__kelompok__bidang__code'],
+            kelompok_code=row['variant__base_item_code__sub_kelompok__kelompok__code'],
+            sub_kelompok_code=row['variant__base_item_code__sub_kelompok__code'],
+            total_quantity=row['total_quantity'],
+            low_stock_threshold=threshold,
+            is_low_stock=threshold is not None and row['total_quantity'] <= threshold,
+            is_out_of_stock=row['total_quantity'] <= 0,
+            last_updated=row['last_updated'],
+        ))
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_dailyconsumption'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_snapshot', serialize=False, to='inventory.productvariant', verbose_name='varian produk spesifik')),
+                ('full_code', models.CharField(blank=True, db_index=True, max_length=20, verbose_name='kode lengkap varian')),
+                ('type_name', models.CharField(db_index=True, max_length=100, verbose_name='jenis barang')),
+                ('variant_name', models.CharField(max_length=150, verbose_name='nama spesifik')),
+                ('unit_of_measure', models.CharField(max_length=20, verbose_name='satuan')),
+                ('base_item_description', models.TextField(blank=True, verbose_name='uraian barang (dasar)')),
+                ('account_code', models.CharField(blank=True, db_index=True, max_length=20, null=True, verbose_name='kode akun')),
+                ('golongan_code', models.CharField(db_index=True, max_length=1, verbose_name='kode golongan')),
+                ('bidang_code', models.CharField(db_index=True, max_length=10, verbose_name='kode bidang')),
+                ('kelompok_code', models.CharField(db_index=True, max_length=10, verbose_name='kode kelompok')),
+                ('sub_kelompok_code', models.CharField(db_index=True, max_length=15, verbose_name='kode sub kelompok')),
+                ('total_quantity', models.PositiveIntegerField(default=0, verbose_name='total kuantitas')),
+                ('low_stock_threshold', models.PositiveIntegerField(blank=True, null=True, verbose_name='ambang batas stok rendah')),
+                ('is_low_stock', models.BooleanField(db_index=True, default=False, verbose_name='stok rendah')),
+                ('is_out_of_stock', models.BooleanField(db_index=True, default=False, verbose_name='stok habis')),
+                ('last_updated', models.DateTimeField(blank=True, null=True, verbose_name='terakhir diperbarui')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Stok',
+                'verbose_name_plural': 'Snapshot Stok',
+                'ordering': ['full_code'],
+            },
+        ),
+        migrations.RunPython(backfill_stock_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcodebarang',
+            name='import_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='fingerprint import'),
+        ),
+    ]
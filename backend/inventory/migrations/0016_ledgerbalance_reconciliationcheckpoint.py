@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_itemcodebarang_import_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBalance',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_balance', serialize=False, to='inventory.productvariant', verbose_name='varian produk spesifik')),
+                ('net_quantity', models.BigIntegerField(default=0, verbose_name='saldo bersih ledger')),
+            ],
+            options={
+                'verbose_name': 'Saldo Ledger',
+                'verbose_name_plural': 'Saldo Ledger',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='nama')),
+                ('last_transaction_id', models.BigIntegerField(default=0, verbose_name='id transaksi terakhir')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='terakhir diperbarui')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint Rekonsiliasi',
+                'verbose_name_plural': 'Checkpoint Rekonsiliasi',
+            },
+        ),
+    ]
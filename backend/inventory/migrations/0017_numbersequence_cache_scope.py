@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_ledgerbalance_reconciliationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='numbersequence',
+            name='scope',
+            field=models.CharField(choices=[('REQUEST', 'Nomor Permintaan'), ('SPMB', 'Nomor SPMB'), ('VARIANT', 'Kode Spesifik Varian'), ('CACHE', 'Versi Cache')], max_length=20, verbose_name='lingkup'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_numbersequence_cache_scope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptimportjob',
+            name='last_committed_row',
+            field=models.PositiveIntegerField(default=0, help_text='Nomor baris file terakhir yang sudah di-commit; retry melanjutkan setelah baris ini.', verbose_name='baris terakhir tersimpan'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_receiptimportjob_last_committed_row'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='numbersequence',
+            name='key',
+            field=models.CharField(help_text="'<kode bagian>/<tahun>' untuk permintaan (mis. 'WBC.051/2025'), 'WBC.05/<tahun>' untuk SPMB, ID kode barang dasar untuk varian, atau nama cache (mis. 'code_tree')", max_length=100, verbose_name='kunci'),
+        ),
+    ]
@@ -5,12 +5,31 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+import logging
 import uuid
-import traceback
+
+logger = logging.getLogger(__name__)
 
 # --- MODEL BARU UNTUK HIERARKI KODE BARANG ---
 
-class ItemCodeGolongan(models.Model):
+class ItemCodeTreeModel(models.Model):
+    """Basis model hierarki kode: setiap perubahan menaikkan versi cache pohon kode (setelah commit)."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .code_tree import invalidate_code_tree_on_commit
+        invalidate_code_tree_on_commit()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from .code_tree import invalidate_code_tree_on_commit
+        invalidate_code_tree_on_commit()
+        return result
+
+class ItemCodeGolongan(ItemCodeTreeModel):
     code = models.CharField(_('kode golongan'), max_length=1, unique=True)
     description = models.TextField(_('uraian golongan'), blank=True, null=True)
 
@@ -22,7 +41,7 @@ class ItemCodeGolongan(models.Model):
     def __str__(self):
         return f"{self.code} - {self.description or 'Tanpa Uraian'}"
 
-class ItemCodeBidang(models.Model):
+class ItemCodeBidang(ItemCodeTreeModel):
     golongan = models.ForeignKey(
         ItemCodeGolongan,
         on_delete=models.CASCADE,
@@ -41,7 +60,7 @@ class ItemCodeBidang(models.Model):
         gol_code = getattr(self.golongan, 'code', '?')
         return f"{gol_code}.{self.code} - {self.description or 'Tanpa Uraian'}"
 
-class ItemCodeKelompok(models.Model):
+class ItemCodeKelompok(ItemCodeTreeModel):
     bidang = models.ForeignKey(
         ItemCodeBidang,
         on_delete=models.CASCADE,
@@ -61,7 +80,7 @@ class ItemCodeKelompok(models.Model):
         gol_code = getattr(getattr(self.bidang, 'golongan', None), 'code', '?')
         return f"{gol_code}.{bid_code}.{self.code} - {self.description or 'Tanpa Uraian'}"
 
-class ItemCodeSubKelompok(models.Model):
+class ItemCodeSubKelompok(ItemCodeTreeModel):
     kelompok = models.ForeignKey(
         ItemCodeKelompok,
         on_delete=models.CASCADE,
@@ -86,6 +105,10 @@ class ItemCodeSubKelompok(models.Model):
 
     def get_base_code_prefix(self):
         """Mengembalikan prefix kode hingga level subkelompok (tanpa kd_brg). Misal: 1.01.01.01"""
+        from .code_tree import get_code_tree
+        parent = get_code_tree().kelompok_prefix(self.kelompok_id)
+        if parent is not None:
+            return f"{parent[0]}.{self.code}"
         try:
             kel = self.kelompok
             bid = kel.bidang
@@ -96,6 +119,10 @@ class ItemCodeSubKelompok(models.Model):
 
     def get_full_base_code_prefix(self):
         """Mengembalikan prefix kode hingga level subkelompok (tanpa kd_brg). Misal: 1010101"""
+        from .code_tree import get_code_tree
+        parent = get_code_tree().kelompok_prefix(self.kelompok_id)
+        if parent is not None:
+            return f"{parent[1]}{str(self.code).zfill(2)}"
         try:
             kel = self.kelompok
             bid = kel.bidang
@@ -109,7 +136,10 @@ class ItemCodeSubKelompok(models.Model):
              return None
 
 class ItemCodeBarang(models.Model):
-     """Merepresentasikan entitas barang dasar dari CSV."""
+     """
+     Merepresentasikan entitas barang dasar dari CSV. Tidak termasuk pohon kode yang
+     di-cache (lihat code_tree), sehingga perubahannya tidak menaikkan versi cache.
+     """
      sub_kelompok = models.ForeignKey(
          ItemCodeSubKelompok,
          on_delete=models.CASCADE,
@@ -131,6 +161,10 @@ class ItemCodeBarang(models.Model):
          blank=True,
          db_index=True
      )
+     # Hash baris CSV terakhir yang diimpor (lihat code_import); dipakai import mode delta
+     import_fingerprint = models.CharField(
+         _('fingerprint import'), max_length=64, blank=True, editable=False
+     )
 
      class Meta:
          verbose_name = _('Kode Barang Dasar')
@@ -145,6 +179,10 @@ class ItemCodeBarang(models.Model):
          """Helper internal untuk men-generate kode dasar lengkap."""
          if not self.sub_kelompok_id or not self.code:
              return None
+         from .code_tree import get_code_tree
+         cached_prefix = get_code_tree().subkelompok_prefix(self.sub_kelompok_id)
+         if cached_prefix is not None:
+             return f"{cached_prefix[1]}{str(self.code).zfill(3)}"
          try:
              sk = ItemCodeSubKelompok.objects.select_related(
                  'kelompok__bidang__golongan'
@@ -156,7 +194,7 @@ class ItemCodeBarang(models.Model):
          except ItemCodeSubKelompok.DoesNotExist:
               return None
          except Exception:
-              traceback.print_exc()
+              logger.exception("Gagal men-generate full_base_code untuk ItemCodeBarang %s", self.pk)
               return None
 
      def save(self, *args, **kwargs):
@@ -174,7 +212,14 @@ class ItemCodeBarang(models.Model):
                      f"ItemCodeBarang dengan subkel={self.sub_kelompok_id}, code={self.code}. "
                      f"Periksa data hierarki induknya."
                  )
+         is_update = bool(self.pk) and not generate_code
+         if is_update:
+             # Diubah di luar import: import delta berikutnya menerapkan ulang baris CSV-nya
+             self.import_fingerprint = ''
          super().save(*args, **kwargs)
+         if is_update:
+             from .snapshots import refresh_stock_snapshots
+             refresh_stock_snapshots(self.variants.values_list('pk', flat=True))
 
 # --- MODEL VARIAN PRODUK SPESIFIK (DITAMBAH BARCODE) ---
 class ProductVariant(models.Model):
@@ -242,19 +287,21 @@ class ProductVariant(models.Model):
     def _generate_specific_code(self):
          """Generate 3 digit kode spesifik berikutnya untuk base_item_code ini."""
          if not self.base_item_code_id: return None
-         last_variant = ProductVariant.objects.filter(
-             base_item_code=self.base_item_code
-         ).exclude(pk=self.pk).order_by('-specific_code').first()
-         if last_variant and last_variant.specific_code:
-             try: next_num = int(last_variant.specific_code) + 1
-             except ValueError:
-                 next_num = ProductVariant.objects.filter(
-                     base_item_code=self.base_item_code
-                 ).count() + (0 if self.pk else 1)
-         else:
-             next_num = 1
+         from .sequences import allocate_number
+         next_num = allocate_number(
+             NumberSequence.Scope.VARIANT, self.base_item_code_id,
+             seed=lambda: ProductVariant.last_specific_number(self.base_item_code_id)
+         )
          return f"{next_num:03d}"
 
+    @staticmethod
+    def last_specific_number(base_item_code_id):
+         """Kode spesifik numerik terbesar yang sudah ada (dipakai sekali untuk seed counter)."""
+         codes = ProductVariant.objects.filter(
+             base_item_code_id=base_item_code_id
+         ).values_list('specific_code', flat=True)
+         return max((int(code) for code in codes if code and code.isdigit()), default=0)
+
     def save(self, *args, **kwargs):
          if not self.pk or not self.specific_code:
              self.specific_code = self._generate_specific_code()
@@ -270,13 +317,15 @@ class ProductVariant(models.Model):
              except ItemCodeBarang.DoesNotExist:
                  raise IntegrityError(f"ItemCodeBarang ID {self.base_item_code_id} tidak ditemukan.")
              except Exception as e:
-                 traceback.print_exc()
+                 logger.exception("Gagal men-generate full_code untuk ProductVariant %s", self.pk)
                  raise IntegrityError(f"Gagal men-generate full_code: {e}")
 
          if self.full_code and (not self.pk or not self.barcode):
              self.barcode = self.full_code
 
          super().save(*args, **kwargs)
+         from .snapshots import refresh_stock_snapshots
+         refresh_stock_snapshots([self.pk])
 
 # --- MODEL KUITANSI (Receipt) ---
 class Receipt(models.Model):
@@ -306,6 +355,91 @@ class Receipt(models.Model):
     def __str__(self):
          return f"Kuitansi {self.receipt_number} ({self.receipt_date})"
 
+# --- MODEL JOB IMPORT KUITANSI (ASINKRON) ---
+class ReceiptImportJob(models.Model):
+    """Job upload kuitansi yang diproses di luar request-thread (worker lokal)."""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Menunggu Diproses')
+        PROCESSING = 'PROCESSING', _('Sedang Diproses')
+        COMPLETED = 'COMPLETED', _('Selesai')
+        FAILED = 'FAILED', _('Gagal')
+
+    uploaded_file = models.FileField(
+        _('file unggahan'), upload_to='receipt_imports/%Y/%m/'
+    )
+    original_filename = models.CharField(
+        _('nama file asli'), max_length=255, blank=True
+    )
+    status = models.CharField(
+        _('status'), max_length=20, choices=Status.choices,
+        default=Status.PENDING, db_index=True
+    )
+    total_rows = models.PositiveIntegerField(_('total baris'), default=0)
+    processed_rows = models.PositiveIntegerField(_('baris diproses'), default=0)
+    created_variants = models.PositiveIntegerField(_('varian baru'), default=0)
+    last_committed_row = models.PositiveIntegerField(
+        _('baris terakhir tersimpan'), default=0,
+        help_text="Nomor baris file terakhir yang sudah di-commit; retry melanjutkan setelah baris ini."
+    )
+    error_count = models.PositiveIntegerField(_('jumlah error'), default=0)
+    errors = models.JSONField(
+        _('error per baris'), default=list, blank=True,
+        help_text="Dibatasi sejumlah entri pertama; total ada di error_count."
+    )
+    message = models.TextField(_('pesan'), blank=True, null=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='receipt_import_jobs',
+        on_delete=models.PROTECT,
+        verbose_name=_('dibuat oleh')
+    )
+    created_at = models.DateTimeField(_('dibuat tanggal'), auto_now_add=True)
+    started_at = models.DateTimeField(_('mulai diproses'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('selesai diproses'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Job Import Kuitansi')
+        verbose_name_plural = _('Job Import Kuitansi')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.original_filename or self.uploaded_file.name} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if not self.total_rows: return 100 if self.status == self.Status.COMPLETED else 0
+        return round(self.processed_rows * 100 / self.total_rows, 1)
+
+# --- MODEL COUNTER NOMOR URUT ---
+class NumberSequence(models.Model):
+    """Counter nomor urut per (scope, key), dialokasikan lewat inventory.sequences."""
+    class Scope(models.TextChoices):
+        REQUEST = 'REQUEST', _('Nomor Permintaan')
+        SPMB = 'SPMB', _('Nomor SPMB')
+        VARIANT = 'VARIANT', _('Kode Spesifik Varian')
+        CACHE = 'CACHE', _('Versi Cache')
+
+    scope = models.CharField(_('lingkup'), max_length=20, choices=Scope.choices)
+    key = models.CharField(
+        _('kunci'), max_length=100,
+        help_text=_(
+            "'<kode bagian>/<tahun>' untuk permintaan (mis. 'WBC.051/2025'), 'WBC.05/<tahun>' untuk SPMB, "
+            "ID kode barang dasar untuk varian, atau nama cache (mis. 'code_tree')"
+        )
+    )
+    last_value = models.PositiveBigIntegerField(_('nomor terakhir'), default=0)
+
+    class Meta:
+        verbose_name = _('Counter Nomor Urut')
+        verbose_name_plural = _('Counter Nomor Urut')
+        ordering = ['scope', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_number_sequence_scope_key')
+        ]
+
+    def __str__(self):
+        return f"{self.get_scope_display()} [{self.key}]: {self.last_value}"
+
 # --- MODEL ITEM INVENTARIS (BATCH) ---
 class InventoryItem(models.Model):
     variant = models.ForeignKey(
@@ -374,6 +508,11 @@ class Stock(models.Model):
         variant_code = getattr(getattr(self, 'variant', None), 'full_code', 'N/A')
         return f"Stok {variant_name} ({variant_code}): {self.total_quantity}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .snapshots import refresh_stock_snapshots
+        refresh_stock_snapshots([self.variant_id])
+
     @property
     def is_low_stock(self):
         if self.low_stock_threshold is None: return False
@@ -383,6 +522,49 @@ class Stock(models.Model):
     def is_out_of_stock(self):
         return self.total_quantity <= 0
 
+# --- MODEL NILAI STOK FIFO (LEDGER) ---
+class StockValuation(models.Model):
+    """Nilai persediaan FIFO per varian, diperbarui oleh setiap alur yang mengubah batch/stok."""
+    variant = models.OneToOneField(
+        ProductVariant,
+        related_name='fifo_valuation',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_('varian produk spesifik')
+    )
+    total_value = models.DecimalField(
+        _('total nilai FIFO'), max_digits=19, decimal_places=2, default=0
+    )
+    last_updated = models.DateTimeField(_('terakhir diperbarui'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Nilai Stok FIFO')
+        verbose_name_plural = _('Nilai Stok FIFO')
+
+    def __str__(self):
+        return f"Nilai FIFO varian #{self.variant_id}: {self.total_value}"
+
+class StockValuationLive(models.Model):
+    """
+    Nilai FIFO yang dihitung langsung di database (view SQL dengan window function
+    SUM() OVER per varian). Read-only; dipakai untuk laporan `?valuation=live`.
+    """
+    variant = models.OneToOneField(
+        ProductVariant,
+        related_name='fifo_valuation_live',
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        verbose_name=_('varian produk spesifik')
+    )
+    total_quantity = models.IntegerField(_('total kuantitas'))
+    total_value = models.DecimalField(_('total nilai FIFO'), max_digits=19, decimal_places=2)
+
+    class Meta:
+        managed = False
+        db_table = 'inventory_stockvaluation_live'
+        verbose_name = _('Nilai Stok FIFO (Live)')
+        verbose_name_plural = _('Nilai Stok FIFO (Live)')
+
 # --- MODEL REQUEST ---
 class Request(models.Model):
     class Status(models.TextChoices):
@@ -467,21 +649,13 @@ class Request(models.Model):
     def _generate_request_number(self):
         if not self.requester_id or not getattr(self.requester, 'department_code', None):
              return None
+        from .sequences import allocate_number, last_sequence_number
         year = timezone.now().year; department_code = self.requester.department_code
         prefix = f"ND-"; suffix = f"/{department_code}/PS/{year}"
-        last_request = Request.objects.filter(
-            request_number__startswith=prefix, request_number__endswith=suffix
-        ).exclude(pk=self.pk).order_by('request_number').last()
-        sequence = 1
-        if last_request and last_request.request_number:
-            try:
-                last_seq_str = last_request.request_number.replace(prefix, "").split('/')[0]
-                sequence = int(last_seq_str) + 1
-            except (IndexError, ValueError, TypeError):
-                 count = Request.objects.filter(
-                     request_number__startswith=prefix, request_number__endswith=suffix
-                 ).exclude(pk=self.pk).count()
-                 sequence = count + 1
+        sequence = allocate_number(
+            NumberSequence.Scope.REQUEST, f"{department_code}/{year}",
+            seed=lambda: last_sequence_number(Request, 'request_number', prefix, suffix)
+        )
         return f"{prefix}{sequence:02d}{suffix}"
 
 # --- MODEL ITEM PERMINTAAN ---
@@ -546,22 +720,19 @@ class SPMB(models.Model):
         super().save(*args, **kwargs)
 
     def _generate_spmb_number(self):
+        return SPMB.reserve_spmb_numbers(1)[0]
+
+    @staticmethod
+    def reserve_spmb_numbers(count):
+        """Reservasi `count` nomor SPMB berurutan dengan satu akses ke counter."""
+        from .sequences import reserve_numbers, last_sequence_number
         year = timezone.now().year; wbc_code = "WBC.05" # HARDCODED
         prefix = f"SPMB-"; suffix = f"/{wbc_code}/PS/{year}"
-        last_spmb = SPMB.objects.filter(
-            spmb_number__startswith=prefix, spmb_number__endswith=suffix
-        ).exclude(pk=self.pk).order_by('spmb_number').last()
-        sequence = 1
-        if last_spmb and last_spmb.spmb_number:
-            try:
-                last_seq_str = last_spmb.spmb_number.replace(prefix, "").split('/')[0]
-                sequence = int(last_seq_str) + 1
-            except (IndexError, ValueError, TypeError):
-                 count = SPMB.objects.filter(
-                     spmb_number__startswith=prefix, spmb_number__endswith=suffix
-                 ).exclude(pk=self.pk).count()
-                 sequence = count + 1
-        return f"{prefix}{sequence:02d}{suffix}"
+        first = reserve_numbers(
+            NumberSequence.Scope.SPMB, f"{wbc_code}/{year}", count,
+            seed=lambda: last_sequence_number(SPMB, 'spmb_number', prefix, suffix)
+        )
+        return [f"{prefix}{sequence:02d}{suffix}" for sequence in range(first, first + count)]
 
 # --- MODEL LOG PERMINTAAN ---
 class RequestLog(models.Model):
@@ -638,12 +809,116 @@ class Transaction(models.Model):
         verbose_name = _('Transaksi Stok')
         verbose_name_plural = _('Transaksi Stok')
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination ledger: WHERE (timestamp, id) < (...) ORDER BY timestamp DESC, id DESC
+            models.Index(fields=['-timestamp', '-id'], name='inv_tx_timestamp_id_idx'),
+        ]
 
     def __str__(self):
         direction = "+" if self.quantity > 0 else ""
         variant_name = getattr(getattr(self, 'variant', None), 'name', 'N/A')
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M')} - {variant_name}: {direction}{self.quantity} ({self.transaction_type})"
 
+# --- MODEL SNAPSHOT STOK (READ MODEL LAPORAN) ---
+class StockSnapshot(models.Model):
+    """
+    Salinan datar Stock + ProductVariant + hierarki kode barang untuk laporan stok,
+    sehingga filter/pencarian/urutan cukup membaca satu tabel. Diperbarui dalam
+    transaksi yang sama setiap kali Stock, ProductVariant atau ItemCodeBarang berubah.
+    """
+    variant = models.OneToOneField(
+        ProductVariant,
+        related_name='stock_snapshot',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_('varian produk spesifik')
+    )
+    full_code = models.CharField(_('kode lengkap varian'), max_length=20, blank=True, db_index=True)
+    type_name = models.CharField(_('jenis barang'), max_length=100, db_index=True)
+    variant_name = models.CharField(_('nama spesifik'), max_length=150)
+    unit_of_measure = models.CharField(_('satuan'), max_length=20)
+    base_item_description = models.TextField(_('uraian barang (dasar)'), blank=True)
+    account_code = models.CharField(_('kode akun'), max_length=20, blank=True, null=True, db_index=True)
+    golongan_code = models.CharField(_('kode golongan'), max_length=1, db_index=True)
+    bidang_code = models.CharField(_('kode bidang'), max_length=10, db_index=True)
+    kelompok_code = models.CharField(_('kode kelompok'), max_length=10, db_index=True)
+    sub_kelompok_code = models.CharField(_('kode sub kelompok'), max_length=15, db_index=True)
+    total_quantity = models.PositiveIntegerField(_('total kuantitas'), default=0)
+    low_stock_threshold = models.PositiveIntegerField(_('ambang batas stok rendah'), blank=True, null=True)
+    is_low_stock = models.BooleanField(_('stok rendah'), default=False, db_index=True)
+    is_out_of_stock = models.BooleanField(_('stok habis'), default=False, db_index=True)
+    last_updated = models.DateTimeField(_('terakhir diperbarui'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Snapshot Stok')
+        verbose_name_plural = _('Snapshot Stok')
+        ordering = ['full_code']
+
+    def __str__(self):
+        return f"Snapshot {self.full_code}: {self.total_quantity}"
+
+# --- MODEL REKAP KONSUMSI HARIAN ---
+class DailyConsumption(models.Model):
+    """
+    Rekap jumlah barang keluar per (hari, unit peminta, varian). Diisi saat request
+    diproses dan dapat dibangun ulang dari Transaction dengan `rebuild_consumption_rollup`.
+    """
+    day = models.DateField(_('tanggal'))
+    department_code = models.CharField(_('kode bagian/bidang peminta'), max_length=10, blank=True)
+    variant = models.ForeignKey(
+        ProductVariant, related_name='daily_consumption', on_delete=models.CASCADE,
+        verbose_name=_('varian produk')
+    )
+    quantity_out = models.PositiveBigIntegerField(_('jumlah keluar'), default=0)
+
+    class Meta:
+        verbose_name = _('Rekap Konsumsi Harian')
+        verbose_name_plural = _('Rekap Konsumsi Harian')
+        ordering = ['-day', 'department_code']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'department_code', 'variant'], name='unique_daily_consumption'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.department_code or '-'} - varian #{self.variant_id}: {self.quantity_out}"
+
+# --- MODEL REKONSILIASI STOK ---
+class LedgerBalance(models.Model):
+    """
+    Saldo ledger (jumlah Transaction.quantity) per varian sampai checkpoint rekonsiliasi.
+    Diisi oleh `reconcile_stock`; hanya Transaction baru yang dijumlahkan di setiap putaran.
+    """
+    variant = models.OneToOneField(
+        ProductVariant,
+        related_name='ledger_balance',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_('varian produk spesifik')
+    )
+    net_quantity = models.BigIntegerField(_('saldo bersih ledger'), default=0)
+
+    class Meta:
+        verbose_name = _('Saldo Ledger')
+        verbose_name_plural = _('Saldo Ledger')
+
+    def __str__(self):
+        return f"Saldo ledger varian #{self.variant_id}: {self.net_quantity}"
+
+class ReconciliationCheckpoint(models.Model):
+    """Id Transaction terakhir yang sudah dijumlahkan ke LedgerBalance."""
+    name = models.CharField(_('nama'), max_length=50, unique=True)
+    last_transaction_id = models.BigIntegerField(_('id transaksi terakhir'), default=0)
+    updated_at = models.DateTimeField(_('terakhir diperbarui'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Checkpoint Rekonsiliasi')
+        verbose_name_plural = _('Checkpoint Rekonsiliasi')
+
+    def __str__(self):
+        return f"{self.name}: transaksi #{self.last_transaction_id}"
+
 # --- MODEL STOCK OPNAME ---
 class StockOpnameSession(models.Model):
     class Status(models.TextChoices):
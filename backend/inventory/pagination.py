@@ -0,0 +1,138 @@
+# backend/inventory/pagination.py
+"""
+Pagination untuk endpoint ledger transaksi.
+
+Default tetap nomor halaman (kompatibel dengan klien lama). Dengan `?pagination=cursor`
+dipakai keyset pagination pada (timestamp, id): halaman berikutnya diambil dengan
+WHERE (timestamp, id) < posisi terakhir, tanpa OFFSET dan tanpa COUNT(*), sehingga
+biaya per halaman sama meskipun menelusuri histori bertahun-tahun ke belakang.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class TimestampKeysetPagination(BasePagination):
+    """Keyset pagination berurutan (-timestamp, -id). Respons tanpa field 'count'."""
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor tidak valid.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            timestamp = parse_datetime(data['t'])
+            if timestamp is None:
+                raise ValueError
+            return bool(data.get('r')), timestamp, int(data['i'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        # Baris bisa berupa instance model atau dict hasil .values() (mode compact)
+        timestamp, pk = (obj['timestamp'], obj['id']) if isinstance(obj, dict) else (obj.timestamp, obj.pk)
+        data = json.dumps({'t': timestamp.isoformat(), 'i': pk, 'r': int(reverse)})
+        encoded = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[0]
+
+        if cursor is None:
+            queryset = queryset.order_by('-timestamp', '-id')
+        elif not reverse:
+            _, timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+            ).order_by('-timestamp', '-id')
+        else:
+            _, timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk)
+            ).order_by('timestamp', 'id')
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TransactionLedgerPagination(BasePagination):
+    """
+    Nomor halaman secara default; keyset (TimestampKeysetPagination) jika
+    `?pagination=cursor` atau parameter `cursor` dikirim.
+    """
+    display_page_controls = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        query_params = request.query_params
+        if query_params.get('pagination') == 'cursor' or TimestampKeysetPagination.cursor_query_param in query_params:
+            self.delegate = TimestampKeysetPagination()
+        else:
+            self.delegate = PageNumberPagination()
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
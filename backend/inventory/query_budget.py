@@ -0,0 +1,152 @@
+# backend/inventory/query_budget.py
+"""
+Anggaran query SQL per request dan pendeteksi N+1.
+
+`QueryBudgetMiddleware` mencatat jumlah query, total waktu SQL, dan fingerprint query
+yang berulang (SQL dengan placeholder, daftar `IN (...)` diringkas) untuk setiap request.
+- DEBUG: hasilnya dipasang sebagai header `X-Query-Count`, `X-Query-Time-Ms`, `X-Query-Repeated`.
+- Request yang melebihi QUERY_BUDGET atau punya query berulang >= QUERY_BUDGET_REPEAT_THRESHOLD
+  dicatat di logger `inventory.query_budget`.
+ViewSet dapat memakai anggaran sendiri lewat atribut kelas `query_budget`.
+
+Untuk test, `assert_query_budget` menggagalkan blok yang melebihi anggaran:
+
+    with assert_query_budget(5, max_repeats=2):
+        client.get('/api/stock-levels/')
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL ter-normalisasi: whitespace diringkas dan `IN (%s, %s, ...)` menjadi `IN (...)`."""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql.strip()))
+
+
+class QueryRecorder:
+    """Execute wrapper yang menghitung query, waktu, dan fingerprint di semua koneksi."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def start(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def stop(self):
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+
+    def repeated(self, threshold):
+        """[(fingerprint, jumlah)] untuk query yang dijalankan >= threshold kali, terbanyak dulu."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000, 2)
+
+    def report(self, threshold):
+        lines = [f'{self.count} query, {self.duration_ms} ms']
+        lines += [f'  {count}x {sql}' for sql, count in self.repeated(threshold)]
+        return '\n'.join(lines)
+
+
+def _budget_settings():
+    return (
+        getattr(settings, 'QUERY_BUDGET', 50),
+        getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5),
+    )
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder().start()
+        request._query_budget = None
+        try:
+            response = self.get_response(request)
+        except Exception:
+            recorder.stop()
+            raise
+
+        if response.streaming:
+            # Export CSV/XLSX menjalankan query saat konten di-stream: catat setelah selesai
+            response.streaming_content = self._finish_streaming(request, response.streaming_content, recorder)
+            return response
+
+        recorder.stop()
+        self._check(request, recorder)
+        if settings.DEBUG:
+            repeated = recorder.fingerprints.most_common(1)
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = str(recorder.duration_ms)
+            response['X-Query-Repeated'] = str(repeated[0][1] if repeated else 0)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        request._query_budget = getattr(view_class, 'query_budget', None)
+
+    def _finish_streaming(self, request, content, recorder):
+        try:
+            yield from content
+        finally:
+            recorder.stop()
+            self._check(request, recorder)
+
+    def _check(self, request, recorder):
+        budget, threshold = _budget_settings()
+        if getattr(request, '_query_budget', None) is not None:
+            budget = request._query_budget
+        repeated = recorder.repeated(threshold)
+        if recorder.count > budget or repeated:
+            logger.warning(
+                'Query budget terlampaui: %s %s (anggaran %s)\n%s',
+                request.method, request.path, budget, recorder.report(threshold)
+            )
+
+
+@contextmanager
+def assert_query_budget(max_queries, max_repeats=None):
+    """
+    Context manager untuk test: AssertionError jika blok menjalankan lebih dari
+    `max_queries` query, atau (jika diisi) satu fingerprint lebih dari `max_repeats` kali.
+    """
+    recorder = QueryRecorder().start()
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+    repeats = recorder.fingerprints.most_common(1)
+    too_many_repeats = max_repeats is not None and repeats and repeats[0][1] > max_repeats
+    if recorder.count > max_queries or too_many_repeats:
+        threshold = max_repeats + 1 if max_repeats is not None else 2
+        raise AssertionError(f'Anggaran query terlampaui (maks {max_queries}): ' + recorder.report(threshold))
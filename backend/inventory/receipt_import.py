@@ -0,0 +1,385 @@
+# backend/inventory/receipt_import.py
+"""
+Mesin ingest massal (set-based) untuk data kuitansi pembelian.
+
+Alih-alih query per baris, seluruh baris file diproses sekaligus:
+kode barang dasar di-resolve dengan satu query IN, varian dicari/dibuat
+secara massal, InventoryItem & Transaction dibuat dengan bulk_create, dan
+Stock diupdate dengan satu upsert teragregasi per varian. Jumlah query
+sebanding dengan jumlah varian unik, bukan jumlah baris.
+"""
+import pandas as pd
+from django.utils import timezone
+
+from .models import (
+    ProductVariant, Receipt, InventoryItem, Transaction, NumberSequence
+)
+from .code_tree import barang_entries
+from .sequences import reserve_numbers
+from .valuation import refresh_valuations
+from .spreadsheet import iter_sheet_chunks, DEFAULT_CHUNK_SIZE
+from .stock_mutations import apply_stock_deltas
+
+
+RECEIPT_REQUIRED_COLUMNS = [
+    'Kode_Barang_Dasar', 'Jenis_Barang', 'Nama_Spesifik', 'Satuan', 'Jumlah',
+    'Harga_Beli_Satuan', 'Nomor_Kuitansi', 'Tanggal_Kuitansi'
+]
+RECEIPT_OPTIONAL_COLUMNS = ['Nama_Supplier', 'Tanggal_Kadaluarsa']
+# Jumlah maksimum error/peringatan per baris yang disimpan untuk laporan
+MAX_REPORTED_ERRORS = 500
+
+
+def _text_column(df, column):
+    """Kolom teks yang sudah di-strip; nilai kosong/NaN menjadi ''. Angka bulat tanpa '.0'."""
+    if column not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    series = df[column]
+    if pd.api.types.is_float_dtype(series):
+        # Kode numerik yang terbaca sebagai float (mis. 1010101001.0) dikembalikan ke bentuk bulat
+        as_int = series.dropna()
+        if (as_int == as_int.round()).all():
+            series = series.astype('Int64')
+    series = series.astype(object).where(series.notna(), '')
+    return series.astype(str).str.strip()
+
+
+def _json_safe(value):
+    """Nilai sel mentah yang aman untuk JSON (NaN -> None, tanggal -> ISO string)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value is pd.NaT:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _date_column(text_series):
+    """Parsing tanggal satu kolom sekaligus; nilai tidak valid menjadi NaT."""
+    return pd.to_datetime(text_series.where(text_series != '', None), errors='coerce', format='mixed')
+
+
+def validate_receipt_frame(df, row_numbers=None):
+    """
+    Validasi & normalisasi seluruh DataFrame kuitansi dengan operasi kolom pandas,
+    sebelum ada akses database sama sekali.
+
+    row_numbers adalah nomor baris asli di file; default baris ke-2 dst (baris 1 header).
+    Mengembalikan (records, errors, warnings). records adalah list dict siap
+    untuk ingest_receipt_rows(); errors berisi laporan lengkap per baris.
+    """
+    missing_cols = [col for col in RECEIPT_REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Kolom berikut tidak ditemukan di file: {', '.join(missing_cols)}")
+
+    df = df.reset_index(drop=True)
+    row_nums = pd.Index(row_numbers) if row_numbers is not None else df.index + 2
+    text = {col: _text_column(df, col) for col in RECEIPT_REQUIRED_COLUMNS + RECEIPT_OPTIONAL_COLUMNS}
+
+    # Jumlah: harus bilangan bulat positif
+    quantity = pd.to_numeric(df['Jumlah'], errors='coerce')
+    # Harga: normalisasi desimal koma -> titik sekaligus untuk satu kolom
+    price = pd.to_numeric(text['Harga_Beli_Satuan'].str.replace(',', '.', regex=False), errors='coerce')
+    receipt_date = _date_column(text['Tanggal_Kuitansi'])
+    expiry_date = _date_column(text['Tanggal_Kadaluarsa'])
+
+    checks = [
+        (pd.concat([text[col] == '' for col in RECEIPT_REQUIRED_COLUMNS], axis=1).any(axis=1),
+         "Kolom wajib (Kode Dasar, Jenis, Nama Spesifik, Satuan, Jumlah, Harga, No Kuitansi, Tgl Kuitansi) tidak boleh kosong."),
+        ((text['Jumlah'] != '') & (quantity.isna() | (quantity != quantity.round())),
+         "Format Jumlah tidak valid (harus bilangan bulat)."),
+        (quantity.notna() & (quantity <= 0), "Jumlah harus positif."),
+        ((text['Harga_Beli_Satuan'] != '') & price.isna(), "Format Harga_Beli_Satuan tidak valid."),
+        (price.notna() & (price < 0), "Harga beli tidak boleh negatif."),
+        ((text['Tanggal_Kuitansi'] != '') & receipt_date.isna(), "Format Tanggal_Kuitansi tidak valid."),
+    ]
+
+    # Data mentah per baris untuk laporan error (harus bisa di-serialize JSON)
+    raw_rows = [
+        {key: _json_safe(value) for key, value in row.items()}
+        for row in df.to_dict('records')
+    ]
+
+    messages = pd.Series('', index=df.index, dtype=object)
+    for mask, message in checks:
+        messages = messages.where(~mask, messages + message + ' ')
+    invalid = messages != ''
+    errors = [
+        {"row": int(row_nums[i]), "error": f"ValueError: {messages[i].strip()}", "data": raw_rows[i]}
+        for i in df.index[invalid]
+    ]
+
+    invalid_expiry = (text['Tanggal_Kadaluarsa'] != '') & (text['Tanggal_Kadaluarsa'].str.lower() != 'nan') & expiry_date.isna()
+    warnings = [
+        f"Baris {int(row_nums[i])}: Format Tanggal_Kadaluarsa '{text['Tanggal_Kadaluarsa'][i]}' tidak valid, akan diabaikan."
+        for i in df.index[invalid_expiry]
+    ]
+
+    if errors:
+        return [], errors, warnings
+
+    clean = pd.DataFrame({
+        'row_num': row_nums,
+        'base_code': text['Kode_Barang_Dasar'],
+        'type_name': text['Jenis_Barang'],
+        'variant_name': text['Nama_Spesifik'],
+        'unit': text['Satuan'],
+        'quantity': quantity.astype('int64'),
+        'purchase_price': price,
+        'receipt_number': text['Nomor_Kuitansi'],
+        'receipt_date': receipt_date.dt.date,
+        'supplier': text['Nama_Supplier'],
+        'expiry_date': expiry_date.dt.date.astype(object).where(expiry_date.notna(), None),
+    })
+    records = clean.to_dict('records')
+    for record, raw in zip(records, raw_rows):
+        record['row_num'] = int(record['row_num'])
+        record['quantity'] = int(record['quantity'])
+        record['raw'] = raw
+    return records, errors, warnings
+
+
+def iter_receipt_chunks(file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Baca file kuitansi secara streaming dan validasi per chunk.
+    Generator (records, errors, warnings); raise ValueError jika file/kolom tidak valid.
+    """
+    for chunk in iter_sheet_chunks(file, RECEIPT_REQUIRED_COLUMNS, chunk_size):
+        yield validate_receipt_frame(chunk.frame, chunk.row_numbers)
+
+
+def _variant_key(base_item_code_id, type_name, name):
+    """Kunci pencocokan varian (case-insensitive, sama seperti lookup iexact)."""
+    return (base_item_code_id, type_name.lower(), name.lower())
+
+
+def _row_error(record, message):
+    return {"row": record['row_num'], "error": f"ValueError: {message}", "data": record.get('raw', {})}
+
+
+def _resolve_base_codes(records):
+    """Resolve semua Kode_Barang_Dasar (BarangEntry per kode) dengan satu query IN."""
+    return barang_entries(r['base_code'] for r in records)
+
+
+def _resolve_variants(records, base_map):
+    """
+    Cari varian yang sudah ada (satu query) dan buat varian baru secara massal.
+    Mengembalikan (variant_map, jumlah_varian_baru, warnings).
+    """
+    base_ids = {base_map[r['base_code']].id for r in records}
+    variant_map = {}
+    for variant in ProductVariant.objects.filter(base_item_code_id__in=base_ids):
+        variant_map.setdefault(_variant_key(variant.base_item_code_id, variant.type_name, variant.name), variant)
+
+    warnings = []
+    to_create = {}
+    for r in records:
+        base = base_map[r['base_code']]
+        key = _variant_key(base.id, r['type_name'], r['variant_name'])
+        existing = variant_map.get(key)
+        if existing is not None:
+            if existing.unit_of_measure.lower() != r['unit'].lower():
+                warnings.append(
+                    f"Baris {r['row_num']}: Satuan '{r['unit']}' berbeda dgn Varian '{existing.name}' "
+                    f"({existing.unit_of_measure}). Menggunakan satuan yg sudah ada."
+                )
+            continue
+        if key not in to_create:
+            to_create[key] = ProductVariant(
+                base_item_code_id=base.id,
+                type_name=r['type_name'],
+                name=r['variant_name'],
+                unit_of_measure=r['unit'],
+            )
+
+    if to_create:
+        # Satu blok kode spesifik direservasi dari counter untuk tiap kode dasar
+        base_codes = {base.id: base.full_base_code for base in base_map.values()}
+        new_per_base = {}
+        for variant in to_create.values():
+            new_per_base.setdefault(variant.base_item_code_id, []).append(variant)
+        for base_id, variants in sorted(new_per_base.items()):
+            first = reserve_numbers(
+                NumberSequence.Scope.VARIANT, base_id, len(variants),
+                seed=lambda base_id=base_id: ProductVariant.last_specific_number(base_id)
+            )
+            for offset, variant in enumerate(variants):
+                variant.specific_code = f"{first + offset:03d}"
+                variant.full_code = f"{base_codes[base_id]}{variant.specific_code}"
+                variant.barcode = variant.full_code
+        ProductVariant.objects.bulk_create(list(to_create.values()))
+        variant_map.update(to_create)
+
+    return variant_map, len(to_create), warnings
+
+
+def _missing_base_code_errors(records, base_map):
+    return [
+        _row_error(r, f"Kode Barang Dasar '{r['base_code']}' tidak ditemukan di database.")
+        for r in records if r['base_code'] not in base_map
+    ]
+
+
+def _resolve_receipts(records, user, create=True):
+    """
+    Cari kuitansi berdasarkan nomor (satu query) dan buat yang belum ada secara massal.
+    Mengembalikan (receipt_map, errors). Nomor yang sudah terpakai dengan tanggal
+    berbeda dilaporkan sebagai error baris. create=False hanya melakukan pengecekan.
+    """
+    existing = {
+        receipt.receipt_number: receipt
+        for receipt in Receipt.objects.filter(receipt_number__in={r['receipt_number'] for r in records})
+    }
+    receipt_map = {}
+    errors = []
+    to_create = {}
+    for r in records:
+        number, receipt_date = r['receipt_number'], r['receipt_date']
+        receipt = existing.get(number) or to_create.get(number)
+        if receipt is None:
+            receipt = Receipt(
+                receipt_number=number, receipt_date=receipt_date,
+                supplier_name=r['supplier'], uploaded_by=user
+            )
+            to_create[number] = receipt
+        elif receipt.receipt_date != receipt_date:
+            errors.append(_row_error(r, f"Nomor Kuitansi '{number}' sudah ada dengan tanggal atau data lain yang berbeda."))
+            continue
+        receipt_map[(number, receipt_date)] = receipt
+
+    if create and not errors and to_create:
+        Receipt.objects.bulk_create(list(to_create.values()))
+    return receipt_map, errors
+
+
+def _create_receipt_items(lines, user, now):
+    """bulk_create InventoryItem lalu Transaction IN-nya."""
+    items = [
+        InventoryItem(
+            variant=variant,
+            receipt=receipt,
+            quantity=r['quantity'],
+            purchase_price=r['purchase_price'],
+            expiry_date=r['expiry_date'],
+            added_by=user,
+            entry_date=now
+        )
+        for variant, receipt, r in lines
+    ]
+    InventoryItem.objects.bulk_create(items)
+    Transaction.objects.bulk_create([
+        Transaction(
+            variant=item.variant,
+            inventory_item=item,
+            quantity=item.quantity,
+            transaction_type=Transaction.Type.IN,
+            user=user,
+            receipt=item.receipt,
+            timestamp=now,
+            notes=f"Penerimaan barang via upload kuitansi #{item.receipt.receipt_number}. Item Batch #{item.id}"
+        )
+        for item in items
+    ])
+
+
+def check_receipt_rows(records):
+    """
+    Pengecekan read-only atas seluruh baris (kode dasar & konflik nomor kuitansi)
+    tanpa menulis apa pun. Dipakai sebelum ingest bertahap per chunk.
+    """
+    base_map = _resolve_base_codes(records)
+    errors = _missing_base_code_errors(records, base_map)
+    if errors:
+        return errors
+    _, errors = _resolve_receipts(records, user=None, create=False)
+    return errors
+
+
+def _cross_chunk_receipt_errors(records, receipt_dates):
+    """Nomor kuitansi yang muncul lagi di chunk berikutnya dengan tanggal berbeda."""
+    errors = []
+    for r in records:
+        first_date = receipt_dates.setdefault(r['receipt_number'], r['receipt_date'])
+        if first_date != r['receipt_date']:
+            errors.append(_row_error(
+                r, f"Nomor Kuitansi '{r['receipt_number']}' sudah ada dengan tanggal atau data lain yang berbeda."
+            ))
+    return errors
+
+
+def scan_receipt_file(file, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """
+    Tahap validasi streaming seluruh file, tanpa menulis apa pun. Memori tetap sebesar
+    satu chunk: baris tidak disimpan, hanya `max_errors` error/peringatan pertama.
+    Setelah ada error, chunk berikutnya hanya divalidasi formatnya (tanpa query database).
+    Mengembalikan dict total_rows, error_count, errors, warning_count, warnings.
+    Raise ValueError jika file/kolom tidak valid.
+    """
+    scan = {'total_rows': 0, 'error_count': 0, 'errors': [], 'warning_count': 0, 'warnings': []}
+    receipt_dates = {}
+    for records, chunk_errors, warnings in iter_receipt_chunks(file, chunk_size):
+        scan['total_rows'] += len(records) + len(chunk_errors)
+        scan['warning_count'] += len(warnings)
+        scan['warnings'].extend(warnings[:max_errors - len(scan['warnings'])])
+        new_errors = list(chunk_errors)
+        if records and not scan['error_count'] and not new_errors:
+            new_errors.extend(check_receipt_rows(records))
+            new_errors.extend(_cross_chunk_receipt_errors(records, receipt_dates))
+        scan['error_count'] += len(new_errors)
+        # error_count menghitung semua error; yang disimpan hanya max_errors pertama
+        scan['errors'].extend(new_errors[:max_errors - len(scan['errors'])])
+    return scan
+
+
+def ingest_receipt_rows(records, user):
+    """
+    Ingest baris kuitansi yang sudah diparsing secara set-based.
+
+    Setiap record adalah dict dengan key: row_num, raw, base_code, type_name,
+    variant_name, unit, quantity, purchase_price, receipt_number, receipt_date,
+    supplier, expiry_date.
+
+    Harus dipanggil di dalam transaction.atomic(). Jika ada error resolusi
+    (kode dasar tidak ditemukan, konflik nomor kuitansi) tidak ada data yang
+    ditulis dan daftar error dikembalikan.
+    """
+    result = {"processed": 0, "created_variants": 0, "errors": [], "warnings": []}
+    if not records:
+        return result
+
+    # 1. Resolve ItemCodeBarang (satu query IN)
+    base_map = _resolve_base_codes(records)
+    result["errors"] = _missing_base_code_errors(records, base_map)
+    if result["errors"]:
+        return result
+
+    # 2. Resolve/buat Receipt secara massal
+    receipt_map, receipt_errors = _resolve_receipts(records, user)
+    if receipt_errors:
+        result["errors"] = receipt_errors
+        return result
+
+    # 3. Resolve/buat ProductVariant secara massal
+    variant_map, created_variants, warnings = _resolve_variants(records, base_map)
+    result["created_variants"] = created_variants
+    result["warnings"] = warnings
+
+    # 4. InventoryItem (urutan baris dipertahankan untuk FIFO)
+    now = timezone.now()
+    lines = []
+    stock_deltas = {}
+    for r in records:
+        base = base_map[r['base_code']]
+        variant = variant_map[_variant_key(base.id, r['type_name'], r['variant_name'])]
+        receipt = receipt_map[(r['receipt_number'], r['receipt_date'])]
+        lines.append((variant, receipt, r))
+        stock_deltas[variant.id] = stock_deltas.get(variant.id, 0) + r['quantity']
+
+    _create_receipt_items(lines, user, now)
+
+    # 5. Update Stock: satu upsert teragregasi per varian (lihat stock_mutations)
+    apply_stock_deltas(stock_deltas)
+    refresh_valuations(stock_deltas)
+
+    result["processed"] = len(lines)
+    return result
@@ -0,0 +1,247 @@
+# backend/inventory/reconciliation.py
+"""
+Rekonsiliasi stok: Stock.total_quantity vs ledger (Transaction) vs batch (InventoryItem).
+
+Per varian dibandingkan tiga angka, masing-masing dari satu query agregat ber-GROUP BY:
+- ledger : jumlah Transaction.quantity (IN/ADJUST+ positif, OUT/ADJUST- negatif)
+- batch  : jumlah InventoryItem.quantity yang masih tersisa (> 0)
+- stok   : Stock.total_quantity (dibaca bersama LedgerBalance dalam satu query varian)
+
+Mode inkremental (default): saldo ledger sampai checkpoint disimpan di LedgerBalance,
+sehingga setiap putaran hanya menjumlahkan Transaction dengan id > checkpoint dan hanya
+memeriksa varian yang tersentuh sejak checkpoint. Mode penuh (`full=True`) menjumlahkan
+seluruh ledger, memeriksa semua varian dan membangun ulang LedgerBalance.
+Checkpoint hanya dimajukan sampai Transaction yang lebih tua dari
+RECONCILIATION_CHECKPOINT_LAG_SECONDS, agar transaksi yang belum commit tidak terlewat.
+
+Perbaikan (`repair_mismatch`): Stock di-set ke saldo ledger (default), atau ke jumlah batch
+dengan Transaction ADJUST penyeimbang agar ledger ikut sama. Karena hasil scan bisa sudah
+usang, baris Stock dikunci lalu ledger dan batch varian itu dihitung ulang sebelum
+perbaikan. Selisih batch vs ledger tanpa sumber yang jelas (mis. hasil stock opname)
+hanya dilaporkan.
+"""
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import InventoryItem, LedgerBalance, ProductVariant, ReconciliationCheckpoint, Stock, Transaction
+from .stock_mutations import apply_stock_delta, NegativeStockError
+from .valuation import refresh_valuations
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'stock'
+RECONCILE_BATCH_SIZE = 2000
+REPAIR_SOURCES = ('ledger', 'batches')
+
+Repair = namedtuple('Repair', 'old_stock new_stock skipped')
+
+
+class Mismatch(namedtuple('Mismatch', 'variant_id full_code stock ledger batches')):
+    __slots__ = ()
+
+    @property
+    def issues(self):
+        issues = []
+        if self.stock != self.ledger:
+            issues.append('stock_vs_ledger')
+        if self.batches != self.ledger:
+            issues.append('batches_vs_ledger')
+        return issues
+
+    def needs_repair(self, source):
+        if source == 'batches':
+            return self.stock != self.batches or self.ledger != self.batches
+        return self.stock != self.ledger
+
+    def as_dict(self):
+        return {**self._asdict(), 'issues': self.issues}
+
+
+def _ledger_totals(after_id, settled_id):
+    """
+    Satu query agregat: {variant_id: (net, settled)} untuk Transaction dengan id > after_id.
+    `settled` hanya menjumlahkan id <= settled_id (bagian yang boleh masuk checkpoint).
+    """
+    rows = Transaction.objects.filter(pk__gt=after_id).values('variant_id').annotate(
+        net=Sum('quantity'), settled=Sum('quantity', filter=Q(pk__lte=settled_id))
+    ).order_by()
+    return {row['variant_id']: (row['net'] or 0, row['settled'] or 0) for row in rows.iterator()}
+
+
+def _batch_totals(variant_ids=None):
+    queryset = InventoryItem.objects.filter(quantity__gt=0)
+    if variant_ids is not None:
+        queryset = queryset.filter(variant_id__in=variant_ids)
+    rows = queryset.values('variant_id').annotate(total=Sum('quantity')).order_by()
+    return {row['variant_id']: row['total'] for row in rows.iterator()}
+
+
+def _variant_rows(variant_ids=None):
+    queryset = ProductVariant.objects.all()
+    if variant_ids is not None:
+        queryset = queryset.filter(pk__in=variant_ids)
+    return queryset.order_by('pk').values_list(
+        'pk', 'full_code', 'stock_level__total_quantity', 'ledger_balance__net_quantity'
+    ).iterator(chunk_size=RECONCILE_BATCH_SIZE)
+
+
+class StockReconciliation:
+    """
+    Satu putaran rekonsiliasi. `prepare()` membaca ledger (dan, jika `advance`, memajukan
+    checkpoint); iterasi `mismatches()` lalu mengalirkan selisih per varian, urut id varian.
+    """
+
+    def __init__(self, full=False, advance=True):
+        self.full = full
+        self.advance = advance
+        self.scope = None  # None: semua varian
+        self.pending = {}  # bagian ledger setelah LedgerBalance, per varian
+        self.checkpoint_id = 0
+        self.checked = 0
+
+    def prepare(self):
+        lag = timedelta(seconds=getattr(settings, 'RECONCILIATION_CHECKPOINT_LAG_SECONDS', 300))
+        with transaction.atomic():
+            if self.advance:
+                # Lock checkpoint: dua putaran bersamaan tidak boleh menjumlahkan delta yang sama dua kali
+                checkpoint, _ = ReconciliationCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+                checkpoint = ReconciliationCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+            else:
+                checkpoint = ReconciliationCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+                checkpoint = checkpoint or ReconciliationCheckpoint(name=CHECKPOINT_NAME)
+            after_id = 0 if self.full else checkpoint.last_transaction_id
+            settled_id = Transaction.objects.filter(
+                pk__gt=after_id, timestamp__lte=timezone.now() - lag
+            ).aggregate(last_id=Max('pk'))['last_id'] or after_id
+            totals = _ledger_totals(after_id, settled_id)
+
+            if self.advance:
+                self._store_balances(totals)
+                checkpoint.last_transaction_id = settled_id
+                checkpoint.save(update_fields=['last_transaction_id', 'updated_at'])
+                self.pending = {variant_id: net - settled for variant_id, (net, settled) in totals.items()}
+            else:
+                self.pending = {variant_id: net for variant_id, (net, _) in totals.items()}
+            self.checkpoint_id = checkpoint.last_transaction_id
+        if not self.full:
+            self.scope = sorted(totals)
+        return self
+
+    def _store_balances(self, totals):
+        if self.full:
+            LedgerBalance.objects.exclude(variant_id__in=list(totals)).delete()
+            balances = {variant_id: settled for variant_id, (_, settled) in totals.items()}
+        else:
+            current = dict(
+                LedgerBalance.objects.filter(variant_id__in=list(totals)).values_list('variant_id', 'net_quantity')
+            )
+            balances = {
+                variant_id: current.get(variant_id, 0) + settled
+                for variant_id, (_, settled) in totals.items() if settled
+            }
+        LedgerBalance.objects.bulk_create(
+            [LedgerBalance(variant_id=variant_id, net_quantity=net) for variant_id, net in sorted(balances.items())],
+            batch_size=RECONCILE_BATCH_SIZE,
+            update_conflicts=True, unique_fields=['variant'], update_fields=['net_quantity']
+        )
+
+    def _ledger(self, variant_id, balance):
+        # Mode penuh tanpa advance: seluruh ledger ada di pending, LedgerBalance diabaikan
+        base = 0 if self.full and not self.advance else (balance or 0)
+        return base + self.pending.get(variant_id, 0)
+
+    def _compare(self, variant_ids):
+        batches = _batch_totals(variant_ids)
+        for variant_id, full_code, stock, balance in _variant_rows(variant_ids):
+            self.checked += 1
+            mismatch = Mismatch(
+                variant_id, full_code, stock or 0, self._ledger(variant_id, balance), batches.get(variant_id, 0)
+            )
+            if mismatch.issues:
+                yield mismatch
+
+    def mismatches(self):
+        if self.scope is None:
+            yield from self._compare(None)
+            return
+        for start in range(0, len(self.scope), RECONCILE_BATCH_SIZE):
+            yield from self._compare(self.scope[start:start + RECONCILE_BATCH_SIZE])
+
+
+def reconcile_stock(full=False, advance=True):
+    """Jalankan prepare() dan kembalikan objek StockReconciliation siap diiterasi."""
+    return StockReconciliation(full=full, advance=advance).prepare()
+
+
+def _locked_mismatch(mismatch):
+    """
+    Hitung ulang stok, ledger, dan batch satu varian dengan baris Stock terkunci. Penerimaan
+    atau pengeluaran yang commit setelah scan ikut terhitung di ketiganya, sehingga tidak
+    terbaca sebagai selisih. Harus dipanggil di dalam transaksi.
+    """
+    variant_id = mismatch.variant_id
+    stock = Stock.objects.select_for_update().filter(variant_id=variant_id).values_list(
+        'total_quantity', flat=True
+    ).first()
+    checkpoint_id = ReconciliationCheckpoint.objects.select_for_update().filter(name=CHECKPOINT_NAME).values_list(
+        'last_transaction_id', flat=True
+    ).first() or 0
+    balance = LedgerBalance.objects.filter(variant_id=variant_id).values_list('net_quantity', flat=True).first()
+    pending = Transaction.objects.filter(variant_id=variant_id, pk__gt=checkpoint_id).aggregate(
+        net=Sum('quantity')
+    )['net']
+    batches = InventoryItem.objects.filter(variant_id=variant_id, quantity__gt=0).aggregate(
+        total=Sum('quantity')
+    )['total']
+    return Mismatch(variant_id, mismatch.full_code, stock or 0, (balance or 0) + (pending or 0), batches or 0)
+
+
+def repair_mismatch(mismatch, source='ledger', user=None):
+    """
+    Samakan Stock dengan `source` ('ledger' atau 'batches'). `mismatch` hasil scan hanya
+    menunjuk varian: angka yang dipakai dihitung ulang dengan baris Stock terkunci, sehingga
+    perubahan stok yang commit setelah scan tidak ikut terhapus. Mengembalikan
+    Repair(old_stock, new_stock, skipped) (skipped=True jika varian ternyata sudah cocok),
+    atau None jika tidak bisa diperbaiki.
+    """
+    if source not in REPAIR_SOURCES:
+        raise ValueError(f"Sumber perbaikan tidak dikenal: {source}")
+    try:
+        with transaction.atomic():
+            mismatch = _locked_mismatch(mismatch)
+            if not mismatch.needs_repair(source):
+                logger.info("Reconciliation: variant %s already consistent; skipped", mismatch.variant_id)
+                return Repair(mismatch.stock, mismatch.stock, True)
+            target = mismatch.ledger if source == 'ledger' else mismatch.batches
+            if target < 0:
+                logger.warning(
+                    "Reconciliation: variant %s has negative %s total %s; not repaired", mismatch.variant_id, source, target
+                )
+                return None
+            change = apply_stock_delta(mismatch.variant_id, target - mismatch.stock)
+            if source == 'batches' and mismatch.batches != mismatch.ledger:
+                Transaction.objects.create(
+                    variant_id=mismatch.variant_id,
+                    quantity=mismatch.batches - mismatch.ledger,
+                    transaction_type=Transaction.Type.ADJUSTMENT,
+                    user=user,
+                    notes=(
+                        f"Rekonsiliasi stok: ledger {mismatch.ledger} -> batch {mismatch.batches} "
+                        f"(stok sistem {mismatch.stock} -> {change.total})"
+                    )
+                )
+            refresh_valuations([mismatch.variant_id])
+    except NegativeStockError as e:
+        logger.warning("Reconciliation: variant %s not repaired: %s", mismatch.variant_id, e)
+        return None
+    logger.info(
+        "Reconciliation: variant %s stock %s -> %s (source %s, user %s)",
+        mismatch.variant_id, mismatch.stock, change.total, source, getattr(user, 'pk', None)
+    )
+    return Repair(mismatch.stock, change.total, False)
@@ -0,0 +1,73 @@
+# backend/inventory/rollups.py
+"""
+Pemeliharaan tabel rekap DailyConsumption (jumlah keluar per hari/unit/varian).
+
+Penambahan dilakukan dengan satu INSERT ... ON CONFLICT DO UPDATE yang menjumlahkan
+nilai lama, sehingga aman dipanggil berulang di dalam transaksi pengeluaran barang.
+Rekap dapat dibangun ulang dari Transaction untuk rentang tanggal tertentu.
+"""
+from django.db import connections, router
+from django.db.models import Sum
+from django.db.models.functions import Abs, Coalesce, TruncDate
+
+from .models import DailyConsumption, Transaction
+
+UPSERT_BATCH_SIZE = 500
+
+
+def add_consumption(totals):
+    """Tambahkan {(day, department_code, variant_id): qty} ke rekap harian."""
+    rows = [
+        (day, department_code or '', variant_id, quantity)
+        for (day, department_code, variant_id), quantity in sorted(totals.items()) if quantity
+    ]
+    if not rows:
+        return
+    connection = connections[router.db_for_write(DailyConsumption)]
+    qn = connection.ops.quote_name
+    table = qn(DailyConsumption._meta.db_table)
+    day_col, dept_col, variant_col, qty_col = (
+        qn('day'), qn('department_code'), qn(DailyConsumption._meta.get_field('variant').column), qn('quantity_out')
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({day_col}, {dept_col}, {variant_col}, {qty_col}) VALUES {placeholders} "
+                f"ON CONFLICT ({day_col}, {dept_col}, {variant_col}) "
+                f"DO UPDATE SET {qty_col} = {table}.{qty_col} + EXCLUDED.{qty_col}",
+                [value for row in batch for value in row]
+            )
+
+
+def consumption_source(start_date=None, end_date=None):
+    """Agregasi Transaction OUT per (hari, unit peminta, varian) untuk rentang tanggal."""
+    queryset = Transaction.objects.filter(
+        transaction_type=Transaction.Type.OUT,
+        related_request__isnull=False,
+        related_request__requester__isnull=False
+    )
+    if start_date:
+        queryset = queryset.filter(timestamp__date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(timestamp__date__lte=end_date)
+    return queryset.annotate(day=TruncDate('timestamp')).values(
+        'day', 'related_request__requester__department_code', 'variant_id'
+    ).annotate(quantity=Coalesce(Sum(Abs('quantity')), 0)).order_by()
+
+
+def rebuild_consumption(start_date=None, end_date=None):
+    """Hapus lalu bangun ulang rekap untuk rentang tanggal. Mengembalikan jumlah baris rekap."""
+    existing = DailyConsumption.objects.all()
+    if start_date:
+        existing = existing.filter(day__gte=start_date)
+    if end_date:
+        existing = existing.filter(day__lte=end_date)
+    existing.delete()
+    totals = {}
+    for row in consumption_source(start_date, end_date).iterator():
+        key = (row['day'], row['related_request__requester__department_code'] or '', row['variant_id'])
+        totals[key] = totals.get(key, 0) + row['quantity']
+    add_consumption(totals)
+    return len(totals)
@@ -0,0 +1,68 @@
+# backend/inventory/sequences.py
+"""
+Alokasi nomor urut (nomor permintaan, SPMB, kode spesifik varian) lewat tabel counter.
+
+Setiap (scope, key) punya satu baris NumberSequence. Nomor berikutnya diambil dengan
+satu `UPDATE ... RETURNING` yang mengunci baris tersebut sampai transaksi selesai,
+sehingga submit bersamaan tidak menghasilkan nomor ganda dan tidak perlu scan tabel.
+Baris counter dibuat saat pertama dipakai; nilai awalnya di-seed dari data lama.
+"""
+from django.db import connections, router
+
+from .models import NumberSequence
+
+
+def reserve_numbers(scope, key, count, seed=None):
+    """
+    Reservasi `count` nomor berurutan untuk (scope, key) dan kembalikan nomor pertama.
+
+    `seed` adalah callable yang mengembalikan nomor terakhir yang sudah terpakai; hanya
+    dipanggil ketika baris counter belum ada (mis. tahun baru atau data sebelum counter).
+    """
+    if count < 1:
+        raise ValueError("Jumlah nomor yang direservasi minimal 1.")
+    key = str(key)
+    connection = connections[router.db_for_write(NumberSequence)]
+    qn = connection.ops.quote_name
+    table = qn(NumberSequence._meta.db_table)
+    scope_col, key_col, value_col = qn('scope'), qn('key'), qn('last_value')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {value_col} = {value_col} + %s "
+            f"WHERE {scope_col} = %s AND {key_col} = %s RETURNING {value_col}",
+            [count, scope, key]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            start = seed() if seed else 0
+            # Dua proses bisa sama-sama belum menemukan baris; ON CONFLICT menjaga hasilnya tetap unik
+            cursor.execute(
+                f"INSERT INTO {table} ({scope_col}, {key_col}, {value_col}) VALUES (%s, %s, %s) "
+                f"ON CONFLICT ({scope_col}, {key_col}) DO UPDATE SET {value_col} = {table}.{value_col} + %s "
+                f"RETURNING {value_col}",
+                [scope, key, start + count, count]
+            )
+            row = cursor.fetchone()
+    return row[0] - count + 1
+
+
+def allocate_number(scope, key, seed=None):
+    """Ambil satu nomor berikutnya untuk (scope, key)."""
+    return reserve_numbers(scope, key, 1, seed=seed)
+
+
+def last_sequence_number(model, field, prefix, suffix):
+    """
+    Nomor urut terbesar dari nomor lama berformat '{prefix}{urut}/...{suffix}'.
+    Hanya dipakai untuk seed counter sehingga cukup dijalankan sekali per key.
+    """
+    numbers = model.objects.filter(
+        **{f"{field}__startswith": prefix, f"{field}__endswith": suffix}
+    ).values_list(field, flat=True)
+    last = 0
+    for number in numbers:
+        sequence = number[len(prefix):].split('/')[0]
+        if sequence.isdigit():
+            last = max(last, int(sequence))
+    return last
@@ -6,13 +6,15 @@ from .models import (
     # Model hierarki kode baru
     ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok, ItemCodeBarang,
     # Model utama yg dimodifikasi/digunakan
-    ProductVariant, InventoryItem, Stock, Receipt,
+    ProductVariant, InventoryItem, Stock, StockSnapshot, Receipt, ReceiptImportJob,
     # Model lain (request, spmb, log, transaksi, opname)
     Request, RequestItem, SPMB, RequestLog, Transaction,
     StockOpnameSession, StockOpnameItem
 )
 # Impor serializer user & model user
 from users.serializers import BasicUserSerializer, UserSerializer
+from .fieldsets import SparseFieldsMixin
+from .code_tree import get_code_tree
 from users.models import CustomUser
 from django.utils.translation import gettext_lazy as _ 
 
@@ -202,8 +204,7 @@ class StockOpnameConfirmSerializer(serializers.Serializer):
 
 # --- Serializer Laporan ---
 class CurrentStockReportSerializer(serializers.ModelSerializer):
-    full_code = serializers.CharField(source='variant.full_code', read_only=True); type_name = serializers.CharField(source='variant.type_name', read_only=True); variant_name = serializers.CharField(source='variant.name', read_only=True); unit_of_measure = serializers.CharField(source='variant.unit_of_measure', read_only=True); base_item_description = serializers.CharField(source='variant.base_item_code.base_description', read_only=True); account_code = serializers.CharField(source='variant.base_item_code.account_code', read_only=True); is_low_stock = serializers.BooleanField(read_only=True); is_out_of_stock = serializers.BooleanField(read_only=True)
-    class Meta: model = Stock; fields = ['full_code','type_name','variant_name','base_item_description','unit_of_measure','total_quantity','low_stock_threshold','last_updated','is_low_stock','is_out_of_stock','account_code']
+    class Meta: model = StockSnapshot; fields = ['full_code','type_name','variant_name','base_item_description','unit_of_measure','total_quantity','low_stock_threshold','last_updated','is_low_stock','is_out_of_stock','account_code']; read_only_fields = fields
 
 class StockValueFIFOReportSerializer(serializers.ModelSerializer):
     full_code = serializers.CharField(source='variant.full_code', read_only=True); type_name = serializers.CharField(source='variant.type_name', read_only=True); variant_name = serializers.CharField(source='variant.name', read_only=True); unit_of_measure = serializers.CharField(source='variant.unit_of_measure', read_only=True); base_item_description = serializers.CharField(source='variant.base_item_code.base_description', read_only=True); total_quantity = serializers.IntegerField(read_only=True); fifo_total_value = serializers.DecimalField(max_digits=19, decimal_places=2, read_only=True, default=Decimal('0.00'))
@@ -264,7 +265,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 # --- Serializer Baru untuk Laporan Slow/Fast Moving ---
 
-class MovingItemsReportSerializer(serializers.ModelSerializer):
+class MovingItemsReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer untuk menampilkan data laporan barang slow/fast moving.
     Menampilkan detail varian dan total kuantitas keluar dalam periode tertentu.
@@ -297,7 +298,7 @@ class MovingItemsReportSerializer(serializers.ModelSerializer):
 
 # --- Serializer untuk Laporan Nilai Stok FIFO ---
 
-class StockValueFIFOReportSerializer(serializers.ModelSerializer):
+class StockValueFIFOReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer untuk menampilkan data laporan nilai stok menggunakan metode FIFO.
     Menampilkan detail varian, kuantitas, dan total nilai FIFO yang dihitung di View.
@@ -331,30 +332,14 @@ class StockValueFIFOReportSerializer(serializers.ModelSerializer):
 
 # --- Serializers untuk Laporan Stok Terkini ---
 
-class CurrentStockReportSerializer(serializers.ModelSerializer):
+class CurrentStockReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer untuk menampilkan data laporan stok terkini.
-    Mengambil data dari model Stock dan relasinya ke ProductVariant & ItemCodeBarang.
+    Membaca StockSnapshot (salinan datar Stock + ProductVariant + ItemCodeBarang),
+    sehingga semua field berasal dari satu tabel tanpa join.
     """
-    # Ambil field dari ProductVariant terkait
-    full_code = serializers.CharField(source='variant.full_code', read_only=True)
-    type_name = serializers.CharField(source='variant.type_name', read_only=True)
-    variant_name = serializers.CharField(source='variant.name', read_only=True)
-    unit_of_measure = serializers.CharField(source='variant.unit_of_measure', read_only=True)
-
-    # Ambil field dari ItemCodeBarang terkait (melalui ProductVariant)
-    base_item_description = serializers.CharField(source='variant.base_item_code.base_description', read_only=True)
-    account_code = serializers.CharField(source='variant.base_item_code.account_code', read_only=True)
-
-    # Field dari model Stock itu sendiri
-    # total_quantity sudah ada di model Stock
-    # low_stock_threshold sudah ada
-    # last_updated sudah ada
-    is_low_stock = serializers.BooleanField(read_only=True)
-    is_out_of_stock = serializers.BooleanField(read_only=True)
-
     class Meta:
-        model = Stock # Sumber data utama adalah model Stock
+        model = StockSnapshot # Read model laporan stok
         fields = [
             'full_code',                # Kode lengkap varian
             'type_name',                # Jenis Barang
@@ -368,8 +353,7 @@ class CurrentStockReportSerializer(serializers.ModelSerializer):
             'is_out_of_stock',          # Status stok habis (boolean)
             'account_code',             # Kode Akun terkait
         ]
-        # Kita tidak perlu read_only_fields di sini karena semua source adalah read_only
-        # atau berasal dari property model
+        read_only_fields = fields
 
 class ItemCodeGolonganSerializer(serializers.ModelSerializer):
     class Meta:
@@ -391,7 +375,8 @@ class ItemCodeKelompokSerializer(serializers.ModelSerializer):
         fields = '__all__' # Termasuk bidang_id, code, description
 
     def get_bidang_full_code(self, obj):
-         return f"{obj.bidang.golongan.code}.{obj.bidang.code}"
+         prefix = get_code_tree().bidang_prefix(obj.bidang_id)
+         return prefix[0] if prefix else f"{obj.bidang.golongan.code}.{obj.bidang.code}"
 
 class ItemCodeSubKelompokSerializer(serializers.ModelSerializer):
     # Tampilkan kode kelompok induk
@@ -401,14 +386,23 @@ class ItemCodeSubKelompokSerializer(serializers.ModelSerializer):
         fields = '__all__' # Termasuk kelompok_id, code, base_description
 
     def get_kelompok_full_code(self, obj):
+         prefix = get_code_tree().kelompok_prefix(obj.kelompok_id)
+         if prefix:
+              return prefix[0]
          bidang = obj.kelompok.bidang
          return f"{bidang.golongan.code}.{bidang.code}.{obj.kelompok.code}"
 
-class ItemCodeBarangSerializer(serializers.ModelSerializer):
+class ItemCodeBarangSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer untuk Kode Barang Dasar."""
     # Tampilkan kode subkelompok induk
-    sub_kelompok_full_code = serializers.CharField(source='sub_kelompok.get_base_code_prefix', read_only=True)
+    # Prefix dibaca dari cache pohon kode (tanpa query per baris)
+    sub_kelompok_full_code = serializers.SerializerMethodField()
     full_base_code = serializers.CharField(source='get_full_base_code', read_only=True) # Kode 10 digit
+    # Kolom yang dibaca method model (untuk pemangkasan kolom ?fields=)
+    field_dependencies = {
+        'sub_kelompok_full_code': ['sub_kelompok'],
+        'full_base_code': ['full_base_code'],
+    }
 
     class Meta:
         model = ItemCodeBarang
@@ -418,8 +412,12 @@ class ItemCodeBarangSerializer(serializers.ModelSerializer):
                   'account_code', 'account_description')
         # 'sub_kelompok' (ID) dan 'code' diperlukan saat membuat/update
 
+    def get_sub_kelompok_full_code(self, obj):
+        prefix = get_code_tree().subkelompok_prefix(obj.sub_kelompok_id)
+        return prefix[0] if prefix else obj.sub_kelompok.get_base_code_prefix()
+
 # --- Serializer untuk Varian Produk Spesifik (Modifikasi Besar) ---
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer untuk Varian Produk Spesifik (misal: Aspal Pertamina)."""
     # Tampilkan detail Kode Barang Dasar secara nested saat read-only
     base_item_code = ItemCodeBarangSerializer(read_only=True)
@@ -448,18 +446,23 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         read_only_fields = ('specific_code', 'full_code')
 
 # --- Serializer Stok (Modifikasi Relasi) ---
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Relasi variant sekarang ke ProductVariantSerializer yg baru
     variant = ProductVariantSerializer(read_only=True)
     is_low_stock = serializers.BooleanField(read_only=True)
     is_out_of_stock = serializers.BooleanField(read_only=True)
+    # Kolom yang dibaca property model (untuk pemangkasan kolom ?fields=)
+    field_dependencies = {
+        'is_low_stock': ['total_quantity', 'low_stock_threshold'],
+        'is_out_of_stock': ['total_quantity'],
+    }
 
     class Meta:
         model = Stock
         fields = ('variant', 'total_quantity', 'low_stock_threshold', 'last_updated', 'is_low_stock', 'is_out_of_stock')
 
 # --- Serializer Item Inventaris (Modifikasi Relasi + Tambah Receipt) ---
-class InventoryItemSerializer(serializers.ModelSerializer):
+class InventoryItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Relasi variant sekarang ke ProductVariantSerializer yg baru
     variant = ProductVariantSerializer(read_only=True)
     added_by = BasicUserSerializer(read_only=True)
@@ -506,7 +509,7 @@ class InventoryItemCreateSerializer(serializers.ModelSerializer):
 
 
 # --- Serializer Kuitansi (Baru) ---
-class ReceiptSerializer(serializers.ModelSerializer):
+class ReceiptSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     uploaded_by = BasicUserSerializer(read_only=True)
     # inventory_items = InventoryItemSerializer(many=True, read_only=True) # Bisa ditambahkan jika ingin lihat item terkait
 
@@ -536,12 +539,20 @@ class RequestItemSerializer(serializers.ModelSerializer):
         read_only_fields = ('quantity_approved_spv2', 'quantity_issued')
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # variant merujuk ke ProductVariantSerializer yg baru
     variant = ProductVariantSerializer(read_only=True)
     user = BasicUserSerializer(read_only=True)
     inventory_item_info = serializers.CharField(source='inventory_item.__str__', read_only=True, allow_null=True)
     transaction_type_display = serializers.CharField(source='get_transaction_type_display', read_only=True)
+    # Kolom yang dibaca InventoryItem.__str__ (untuk pemangkasan kolom ?fields=)
+    field_dependencies = {
+        'inventory_item_info': [
+            'inventory_item__quantity', 'inventory_item__entry_date',
+            'inventory_item__variant__full_code', 'inventory_item__variant__type_name',
+            'inventory_item__variant__name', 'inventory_item__variant__unit_of_measure',
+        ],
+    }
 
     class Meta:
         model = Transaction
@@ -551,7 +562,7 @@ class TransactionSerializer(serializers.ModelSerializer):
             'related_request', 'related_spmb', 'notes'
         )
 
-class StockOpnameItemSerializer(serializers.ModelSerializer):
+class StockOpnameItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # variant merujuk ke ProductVariantSerializer yg baru
     variant = ProductVariantSerializer(read_only=True)
     confirmed_by = BasicUserSerializer(read_only=True)
@@ -561,12 +572,12 @@ class StockOpnameItemSerializer(serializers.ModelSerializer):
         model = StockOpnameItem
         fields = (
             'id', 'opname_session', 'variant', 'system_quantity', 'counted_quantity',
-            'difference', 'notes', 'confirmation_status','confirmation_status_display',
+            'difference', 'confirmation_status','confirmation_status_display',
             'confirmed_by', 'confirmation_notes', 'confirmed_at'
         )
         read_only_fields = ('difference',)
 
-class RequestListSerializer(serializers.ModelSerializer):
+class RequestListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer ringkas untuk daftar permintaan."""
     requester = BasicUserSerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -635,7 +646,7 @@ class RequestDetailSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
-class SPMBSerializer(serializers.ModelSerializer):
+class SPMBSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer untuk menampilkan detail SPMB."""
     # Tampilkan info ringkas request terkait menggunakan serializer yg sesuai
     request = RequestListSerializer(read_only=True)
@@ -646,7 +657,7 @@ class SPMBSerializer(serializers.ModelSerializer):
         fields = ('id', 'spmb_number', 'request', 'issued_by', 'issued_at')
         read_only_fields = fields
 
-class RequestLogSerializer(serializers.ModelSerializer):
+class RequestLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer untuk menampilkan log histori request."""
     user = BasicUserSerializer(read_only=True)
     status_from_display = serializers.CharField(source='get_status_from_display', read_only=True, allow_null=True)
@@ -695,4 +706,20 @@ class StockOpnameConfirmSerializer(serializers.Serializer):
 
 class ReceiptUploadSerializer(serializers.Serializer):
     """Serializer untuk menerima file upload kuitansi."""
-    file = serializers.FileField(required=True, help_text="File Excel (.xlsx) atau CSV (.csv) berisi detail pembelian.")
\ No newline at end of file
+    file = serializers.FileField(required=True, help_text="File Excel (.xlsx) atau CSV (.csv) berisi detail pembelian.")
+
+class ReceiptImportJobSerializer(serializers.ModelSerializer):
+    """Serializer status job import kuitansi (untuk polling progres dari frontend)."""
+    created_by = BasicUserSerializer(read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percent = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ReceiptImportJob
+        fields = (
+            'id', 'original_filename', 'status', 'status_display',
+            'total_rows', 'processed_rows', 'progress_percent', 'created_variants', 'last_committed_row',
+            'error_count', 'errors', 'message',
+            'created_by', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
@@ -0,0 +1,65 @@
+# backend/inventory/snapshots.py
+"""
+Pemeliharaan StockSnapshot (read model laporan stok).
+
+Setiap refresh membaca Stock beserta varian dan seluruh hierarki kodenya dalam satu
+query, lalu menulis baris snapshot dengan satu upsert (bulk_create update_conflicts).
+Dipanggil di dalam transaksi penulis stok/varian sehingga snapshot selalu konsisten.
+"""
+from .models import Stock, StockSnapshot
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+_SOURCE_FIELDS = {
+    'full_code': 'variant__full_code',
+    'type_name': 'variant__type_name',
+    'variant_name': 'variant__name',
+    'unit_of_measure': 'variant__unit_of_measure',
+    'base_item_description': 'variant__base_item_code__base_description',
+    'account_code': 'variant__base_item_code__account_code',
+    'golongan_code': 'variant__base_item_code__sub_kelompok__kelompok__bidang__golongan__code',
+    'bidang_code': 'variant__base_item_code__sub_kelompok__kelompok__bidang__code',
+    'kelompok_code': 'variant__base_item_code__sub_kelompok__kelompok__code',
+    'sub_kelompok_code': 'variant__base_item_code__sub_kelompok__code',
+    'total_quantity': 'total_quantity',
+    'low_stock_threshold': 'low_stock_threshold',
+    'last_updated': 'last_updated',
+}
+_UPDATE_FIELDS = list(_SOURCE_FIELDS) + ['is_low_stock', 'is_out_of_stock']
+
+
+def _build_snapshot(row):
+    values = {field: row[source] for field, source in _SOURCE_FIELDS.items()}
+    values['full_code'] = values['full_code'] or ''
+    values['base_item_description'] = values['base_item_description'] or ''
+    threshold = values['low_stock_threshold']
+    values['is_low_stock'] = threshold is not None and values['total_quantity'] <= threshold
+    values['is_out_of_stock'] = values['total_quantity'] <= 0
+    return StockSnapshot(variant_id=row['variant_id'], **values)
+
+
+def _write_snapshots(stocks):
+    snapshots = [_build_snapshot(row) for row in stocks.values('variant_id', *_SOURCE_FIELDS.values())]
+    if snapshots:
+        StockSnapshot.objects.bulk_create(
+            snapshots, batch_size=SNAPSHOT_BATCH_SIZE,
+            update_conflicts=True, unique_fields=['variant'], update_fields=_UPDATE_FIELDS
+        )
+    return len(snapshots)
+
+
+def refresh_stock_snapshots(variant_ids):
+    """Perbarui snapshot untuk varian yang punya baris Stock (varian tanpa Stock diabaikan)."""
+    variant_ids = sorted({variant_id for variant_id in variant_ids if variant_id})
+    for start in range(0, len(variant_ids), SNAPSHOT_BATCH_SIZE):
+        _write_snapshots(Stock.objects.filter(variant_id__in=variant_ids[start:start + SNAPSHOT_BATCH_SIZE]))
+
+
+def rebuild_stock_snapshots():
+    """Bangun ulang seluruh snapshot dari Stock. Mengembalikan jumlah baris."""
+    StockSnapshot.objects.exclude(variant_id__in=Stock.objects.values('variant_id')).delete()
+    total = 0
+    variant_ids = list(Stock.objects.order_by('variant_id').values_list('variant_id', flat=True))
+    for start in range(0, len(variant_ids), SNAPSHOT_BATCH_SIZE):
+        total += _write_snapshots(Stock.objects.filter(variant_id__in=variant_ids[start:start + SNAPSHOT_BATCH_SIZE]))
+    return total
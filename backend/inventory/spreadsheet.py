@@ -0,0 +1,89 @@
+# backend/inventory/spreadsheet.py
+"""
+Pembaca file Excel/CSV secara streaming untuk upload berukuran besar.
+
+File .xlsx dibaca dengan openpyxl mode read_only (values_only) dan CSV dengan
+csv.reader inkremental. Baris dikirim ke pipeline dalam chunk berukuran tetap
+sehingga pemakaian memori tidak bergantung pada jumlah baris file.
+"""
+import csv
+import io
+from collections import namedtuple
+
+import openpyxl
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 1000
+CSV_DELIMITER = ';'
+
+# row_numbers: nomor baris di file (header = baris 1), frame: DataFrame chunk
+SheetChunk = namedtuple('SheetChunk', ['row_numbers', 'frame'])
+
+
+def _is_xlsx(file):
+    """File .xlsx adalah arsip zip (diawali 'PK'); selain itu diperlakukan sebagai CSV."""
+    file.seek(0)
+    signature = file.read(2)
+    file.seek(0)
+    return signature == b'PK'
+
+
+def _iter_xlsx_rows(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            yield row_number, values
+    finally:
+        workbook.close()
+
+
+def _iter_csv_rows(file, delimiter):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        for row_number, values in enumerate(csv.reader(text, delimiter=delimiter), start=1):
+            yield row_number, [value if value != '' else None for value in values]
+    finally:
+        # Lepaskan wrapper tanpa menutup file upload aslinya
+        text.detach()
+
+
+def _is_blank(values):
+    return all(value is None or (isinstance(value, str) and not value.strip()) for value in values)
+
+
+def iter_sheet_chunks(file, required_columns, chunk_size=DEFAULT_CHUNK_SIZE, delimiter=CSV_DELIMITER):
+    """
+    Generator SheetChunk dari file Excel (.xlsx) atau CSV.
+
+    Baris pertama adalah header; baris kosong dilewati (nomor baris tetap sesuai file).
+    Raise ValueError jika file tidak bisa dibaca atau kolom wajib tidak ada.
+    """
+    try:
+        rows = _iter_xlsx_rows(file) if _is_xlsx(file) else _iter_csv_rows(file, delimiter)
+        _, header = next(rows)
+    except StopIteration:
+        raise ValueError("File kosong.")
+    except Exception as e:
+        raise ValueError(f"Gagal membaca file. Pastikan format Excel (.xlsx) atau CSV (separator '{delimiter}') valid. Detail: {e}")
+
+    columns = [str(name).strip() if name is not None else '' for name in header]
+    missing_cols = [col for col in required_columns if col not in columns]
+    if missing_cols:
+        rows.close()
+        raise ValueError(f"Kolom berikut tidak ditemukan di file: {', '.join(missing_cols)}")
+
+    # Kolom tanpa nama di header diabaikan
+    positions = [i for i, name in enumerate(columns) if name]
+    columns = [columns[i] for i in positions]
+    row_numbers, buffer = [], []
+    for row_number, values in rows:
+        if _is_blank(values):
+            continue
+        row_numbers.append(row_number)
+        buffer.append([values[i] if i < len(values) else None for i in positions])
+        if len(buffer) >= chunk_size:
+            yield SheetChunk(row_numbers, pd.DataFrame(buffer, columns=columns))
+            row_numbers, buffer = [], []
+    if buffer:
+        yield SheetChunk(row_numbers, pd.DataFrame(buffer, columns=columns))
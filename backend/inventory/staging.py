@@ -0,0 +1,80 @@
+# backend/inventory/staging.py
+"""
+Loader staging untuk import massal katalog kode barang.
+
+Baris yang sudah diparsing dimasukkan ke tabel staging sementara (TEMPORARY: tidak
+ditulis ke WAL, hanya terlihat oleh koneksi ini) dengan `executemany`, lalu digabung ke
+tabel sebenarnya dengan satu pernyataan `INSERT ... SELECT ... ON CONFLICT`. SQL yang
+sama berjalan di PostgreSQL dan SQLite (test/dev).
+"""
+from django.db import connection
+
+from .models import ItemCodeBarang
+
+
+def _column_types(model, columns):
+    """[(kolom, tipe SQL)] dari field model, agar tipe staging sama dengan tabel tujuan."""
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    return [(column, fields[column].db_type(connection)) for column in columns]
+
+
+class StagingTable:
+    """Tabel staging sementara; dipakai sebagai context manager di dalam transaksi."""
+
+    def __init__(self, cursor, name, columns):
+        self.cursor = cursor
+        self.name = connection.ops.quote_name(name)
+        self.columns = [column for column, _ in columns]
+        self._definition = ', '.join(f'{connection.ops.quote_name(column)} {db_type}' for column, db_type in columns)
+
+    def __enter__(self):
+        self.cursor.execute(f'DROP TABLE IF EXISTS {self.name}')
+        self.cursor.execute(f'CREATE TEMPORARY TABLE {self.name} ({self._definition})')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Setelah error, transaksi PostgreSQL sudah gagal: DROP di sini akan menimpa error asli
+        # (InFailedSqlTransaction). Tabel TEMPORARY tetap hilang saat koneksi ditutup dan
+        # di-DROP IF EXISTS lagi oleh __enter__ berikutnya.
+        if exc_type is None:
+            self.cursor.execute(f'DROP TABLE IF EXISTS {self.name}')
+
+    def load(self, rows):
+        """Isi staging dari iterable tuple (urutan sesuai kolom). Mengembalikan jumlah baris."""
+        columns = ', '.join(connection.ops.quote_name(column) for column in self.columns)
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        rows = list(rows)
+        self.cursor.executemany(f'INSERT INTO {self.name} ({columns}) VALUES ({placeholders})', rows)
+        return len(rows)
+
+
+# --- KATALOG KODE BARANG ---
+
+_BARANG_COLUMNS = [
+    'sub_kelompok_id', 'code', 'full_base_code', 'base_description',
+    'account_code', 'account_description', 'import_fingerprint',
+]
+_BARANG_UPDATE_COLUMNS = ['base_description', 'account_code', 'account_description', 'import_fingerprint']
+
+
+def merge_item_codes(barang):
+    """
+    Upsert ItemCodeBarang (instance belum tersimpan) lewat staging:
+    satu INSERT ... ON CONFLICT (sub_kelompok_id, code) DO UPDATE. save() tidak dipanggil.
+    """
+    if not barang:
+        return 0
+    qn = connection.ops.quote_name
+    table = qn(ItemCodeBarang._meta.db_table)
+    columns = ', '.join(qn(column) for column in _BARANG_COLUMNS)
+    updates = ', '.join(f'{qn(column)} = EXCLUDED.{qn(column)}' for column in _BARANG_UPDATE_COLUMNS)
+    with connection.cursor() as cursor:
+        with StagingTable(cursor, 'staging_item_code_barang', _column_types(ItemCodeBarang, _BARANG_COLUMNS)) as staging:
+            staging.load(tuple(getattr(item, column) for column in _BARANG_COLUMNS) for item in barang)
+            # `WHERE true`: wajib di SQLite agar ON CONFLICT tidak dibaca sebagai bagian JOIN
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging.name} WHERE true '
+                f'ON CONFLICT ({qn("sub_kelompok_id")}, {qn("code")}) DO UPDATE SET {updates}'
+            )
+            return cursor.rowcount
+
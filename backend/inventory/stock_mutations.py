@@ -0,0 +1,131 @@
+# backend/inventory/stock_mutations.py
+"""
+Layanan perubahan Stock.total_quantity.
+
+Setiap perubahan adalah satu pernyataan SQL atomik di database:
+- delta positif: upsert `INSERT ... ON CONFLICT (variant_id) DO UPDATE SET total_quantity = total_quantity + delta`
+- delta negatif: `UPDATE ... SET total_quantity = total_quantity + delta WHERE total_quantity + delta >= 0`
+Nilai baru dikembalikan lewat RETURNING (PostgreSQL, SQLite >= 3.35; backend lain memakai
+SELECT setelah pernyataan tulis, di transaksi yang sama), sehingga tidak ada baca-ubah-tulis
+di Python, tidak ada lost update, dan lock baris Stock hanya dipegang selama satu UPDATE.
+SQL dijalankan di koneksi database tulis untuk Stock (router.db_for_write).
+Jika stok tidak cukup, NegativeStockError dilempar (atau, dengan clamp=True, stok
+di-set ke 0 dan delta yang benar-benar diterapkan dikembalikan).
+Semua alur tulis stok (batch manual, upload kuitansi, proses request, stock opname)
+memakai modul ini; snapshot laporan stok ikut diperbarui.
+"""
+from collections import namedtuple
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Stock
+from .snapshots import refresh_stock_snapshots
+
+StockChange = namedtuple('StockChange', 'total applied')
+
+
+class NegativeStockError(Exception):
+    """Delta negatif melebihi stok sistem varian."""
+
+    def __init__(self, variant_id, delta, available):
+        self.variant_id = variant_id
+        self.delta = delta
+        self.available = available
+        super().__init__(
+            f"Stok sistem varian #{variant_id} tidak mencukupi: perubahan {delta}, tersedia {available}."
+        )
+
+
+def _connection():
+    return connections[router.db_for_write(Stock)]
+
+
+def _table(cursor):
+    return cursor.db.ops.quote_name(Stock._meta.db_table)
+
+
+def _supports_returning(db):
+    """RETURNING pada INSERT ... ON CONFLICT dan UPDATE (tidak ada feature flag Django untuk UPDATE)."""
+    if db.vendor == 'postgresql':
+        return True
+    return db.vendor == 'sqlite' and db.Database.sqlite_version_info >= (3, 35)
+
+
+def _returning_total(cursor, sql, params, variant_id):
+    """Jalankan sql; kembalikan total_quantity baru atau None jika tidak ada baris yang berubah."""
+    if _supports_returning(cursor.db):
+        cursor.execute(f'{sql} RETURNING total_quantity', params)
+        row = cursor.fetchone()
+        return row[0] if row else None
+    cursor.execute(sql, params)
+    if cursor.rowcount == 0:
+        return None
+    cursor.execute(f'SELECT total_quantity FROM {_table(cursor)} WHERE variant_id = %s', [variant_id])
+    return cursor.fetchone()[0]
+
+
+def _increment(cursor, variant_id, delta, now):
+    table = _table(cursor)
+    threshold = Stock._meta.get_field('low_stock_threshold').default
+    return _returning_total(
+        cursor,
+        f'INSERT INTO {table} (variant_id, total_quantity, low_stock_threshold, last_updated) '
+        f'VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT (variant_id) DO UPDATE SET '
+        f'total_quantity = {table}.total_quantity + EXCLUDED.total_quantity, last_updated = EXCLUDED.last_updated',
+        [variant_id, delta, threshold, now], variant_id
+    )
+
+
+def _decrement(cursor, variant_id, delta, now):
+    return _returning_total(
+        cursor,
+        f'UPDATE {_table(cursor)} SET total_quantity = total_quantity + %s, last_updated = %s '
+        f'WHERE variant_id = %s AND total_quantity + %s >= 0',
+        [delta, now, variant_id, delta], variant_id
+    )
+
+
+def _apply(cursor, variant_id, delta, clamp, now):
+    if delta >= 0:
+        return StockChange(_increment(cursor, variant_id, delta, now), delta)
+    total = _decrement(cursor, variant_id, delta, now)
+    if total is not None:
+        return StockChange(total, delta)
+    current = Stock.objects.select_for_update().filter(variant_id=variant_id).values_list('total_quantity', flat=True).first()
+    if not clamp:
+        raise NegativeStockError(variant_id, delta, current or 0)
+    if not current:
+        return StockChange(0, 0)
+    # Stok tidak cukup: kosongkan (baris sudah terkunci oleh select_for_update di atas)
+    return StockChange(_decrement(cursor, variant_id, -current, now), -current)
+
+
+def apply_stock_deltas(deltas, clamp=False):
+    """
+    Terapkan {variant_id: delta}. Varian diurutkan agar urutan lock antar transaksi konsisten
+    (hindari deadlock). Mengembalikan {variant_id: StockChange(total, applied)}.
+    Seluruh perubahan atomik: NegativeStockError membatalkan semuanya.
+    """
+    deltas = {variant_id: delta for variant_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+    now = timezone.now()
+    changes = {}
+    db = _connection()
+    with transaction.atomic(using=db.alias), db.cursor() as cursor:
+        for variant_id in sorted(deltas):
+            changes[variant_id] = _apply(cursor, variant_id, deltas[variant_id], clamp, now)
+        refresh_stock_snapshots(changes)
+    return changes
+
+
+def apply_stock_delta(variant_id, delta, clamp=False):
+    """Terapkan satu delta; mengembalikan StockChange(total, applied)."""
+    change = apply_stock_deltas({variant_id: delta}, clamp=clamp).get(variant_id)
+    if change is None:
+        # delta 0: tidak ada perubahan, cukup baca nilai saat ini
+        total = Stock.objects.filter(variant_id=variant_id).values_list('total_quantity', flat=True).first()
+        change = StockChange(total or 0, 0)
+    return change
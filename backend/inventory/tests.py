@@ -1,3 +1,801 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction, IntegrityError
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .code_import import diff_item_code_rows, import_item_code_rows, parse_item_code_csv, row_fingerprint
+from .code_tree import _tree_for_version, barang_entries, get_code_tree, invalidate_code_tree
+from .compact import STOCK_COMPACT_FIELDS, TRANSACTION_COMPACT_FIELDS
+from .models import (
+    ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok, ItemCodeBarang,
+    InventoryItem, Stock, Transaction, ReceiptImportJob, Request, RequestItem, ProductVariant, SPMB,
+    StockSnapshot, RequestLog, LedgerBalance, NumberSequence,
+)
+from .fifo import FifoAllocator, issue_request, issue_requests, InsufficientStockError
+from .import_jobs import process_receipt_import_job, retry_receipt_import_job, MAX_STORED_ERRORS
+from .query_budget import assert_query_budget
+from .reconciliation import Mismatch, Repair, reconcile_stock, repair_mismatch
+from .sequences import allocate_number, reserve_numbers
+from .spreadsheet import DEFAULT_CHUNK_SIZE
+from .receipt_import import validate_receipt_frame, ingest_receipt_rows
+from .staging import StagingTable, merge_item_codes
+from .stock_mutations import apply_stock_delta, NegativeStockError, StockChange
+
+
+def create_code_tree():
+    """Hierarki kode minimal: satu SubKelompok dengan dua ItemCodeBarang."""
+    golongan = ItemCodeGolongan.objects.create(code='1')
+    bidang = ItemCodeBidang.objects.create(golongan=golongan, code='01')
+    kelompok = ItemCodeKelompok.objects.create(bidang=bidang, code='01')
+    sub_kelompok = ItemCodeSubKelompok.objects.create(kelompok=kelompok, code='01', base_description='ATK')
+    pulpen = ItemCodeBarang.objects.create(sub_kelompok=sub_kelompok, code='001', base_description='Pulpen')
+    kertas = ItemCodeBarang.objects.create(sub_kelompok=sub_kelompok, code='002', base_description='Kertas')
+    # on_commit tidak berjalan di TestCase: naikkan versi pohon kode secara langsung
+    invalidate_code_tree()
+    return sub_kelompok, pulpen, kertas
+
+
+def create_user(email, role, department_code='WBC.051'):
+    return get_user_model().objects.create_user(
+        email=email, password='rahasia-123', role=role, department_code=department_code,
+        password_reset_required=False
+    )
+
+
+def receipt_records(rows):
+    """Baris kuitansi (list dict kolom file) -> records hasil validate_receipt_frame."""
+    records, errors, _ = validate_receipt_frame(pd.DataFrame(rows))
+    assert not errors, errors
+    return records
+
+
+def receipt_row(base_code, quantity, number='KW-001', name='Biru'):
+    return {
+        'Kode_Barang_Dasar': base_code, 'Jenis_Barang': 'Pulpen', 'Nama_Spesifik': name, 'Satuan': 'pcs',
+        'Jumlah': quantity, 'Harga_Beli_Satuan': '1500,50', 'Nomor_Kuitansi': number,
+        'Tanggal_Kuitansi': '2025-01-10',
+    }
+
+
+RECEIPT_CSV_HEADER = 'Kode_Barang_Dasar;Jenis_Barang;Nama_Spesifik;Satuan;Jumlah;Harga_Beli_Satuan;Nomor_Kuitansi;Tanggal_Kuitansi'
+
+
+def receipt_csv(lines):
+    """File CSV kuitansi (delimiter ';') dari baris-baris teks tanpa header."""
+    content = '\n'.join([RECEIPT_CSV_HEADER] + list(lines)) + '\n'
+    return SimpleUploadedFile('kuitansi.csv', content.encode('utf-8'), content_type='text/csv')
+
+
+class _RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+class StagingLoaderTests(TestCase):
+    """Loader staging (staging.py) dan ingest kuitansi set-based."""
+
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.operator = create_user('operator@example.com', 'OPERATOR')
+
+    def _barang(self, code, description):
+        return ItemCodeBarang(
+            sub_kelompok_id=self.sub_kelompok.pk, code=code, full_base_code=f'1010101{code}',
+            base_description=description, account_code=None, account_description=None, import_fingerprint='x'
+        )
+
+    def test_merge_item_codes_inserts_new_and_updates_existing(self):
+        with transaction.atomic():
+            merge_item_codes([self._barang('001', 'Pulpen Gel'), self._barang('003', 'Spidol')])
+        self.assertEqual(ItemCodeBarang.objects.get(pk=self.pulpen.pk).base_description, 'Pulpen Gel')
+        self.assertEqual(ItemCodeBarang.objects.get(full_base_code='1010101003').base_description, 'Spidol')
+        self.assertEqual(ItemCodeBarang.objects.count(), 3)
+
+    def test_staging_table_does_not_drop_after_error(self):
+        cursor = _RecordingCursor()
+        with self.assertRaises(IntegrityError):
+            with StagingTable(cursor, 'staging_test', [('code', 'varchar(10)')]):
+                raise IntegrityError('duplikat')
+        # Hanya DROP + CREATE dari __enter__; tidak ada DROP setelah error
+        self.assertEqual(len(cursor.statements), 2)
+        self.assertTrue(cursor.statements[1].startswith('CREATE TEMPORARY TABLE'))
+
+    def test_ingest_receipt_rows(self):
+        records = receipt_records([
+            receipt_row(self.pulpen.full_base_code, 5),
+            receipt_row(self.pulpen.full_base_code, 7),
+            receipt_row(self.kertas.full_base_code, 3, name='A4'),
+        ])
+        with transaction.atomic():
+            result = ingest_receipt_rows(records, self.operator)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['processed'], 3)
+        items = list(InventoryItem.objects.order_by('id').values_list('quantity', flat=True))
+        self.assertEqual(items, [5, 7, 3])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(transaction_type=Transaction.Type.IN).values_list('quantity', flat=True)),
+            [3, 5, 7]
+        )
+        self.assertFalse(Transaction.objects.filter(inventory_item__isnull=True).exists())
+        self.assertEqual(
+            sorted(Stock.objects.values_list('total_quantity', flat=True)), [3, 12]
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='ims-test-media-'))
+class ReceiptImportJobTests(TestCase):
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.operator = create_user('operator@example.com', 'OPERATOR')
+
+    def _job(self, lines):
+        return ReceiptImportJob.objects.create(uploaded_file=receipt_csv(lines), created_by=self.operator)
+
+    def test_error_count_includes_rows_beyond_stored_errors(self):
+        bad_rows = MAX_STORED_ERRORS + 120
+        job = self._job(
+            f'{self.pulpen.full_base_code};Pulpen;Biru;pcs;bukan-angka;1000;KW-{n};2025-01-10' for n in range(bad_rows)
+        )
+        process_receipt_import_job(job.pk, chunk_size=100)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptImportJob.Status.FAILED)
+        self.assertEqual(job.error_count, bad_rows)
+        self.assertEqual(len(job.errors), MAX_STORED_ERRORS)
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_retry_resumes_after_last_committed_row(self):
+        rows = 250
+        job = self._job(
+            f'{self.pulpen.full_base_code};Pulpen;Biru;pcs;2;1000;KW-{n % 3};2025-01-10' for n in range(rows)
+        )
+        calls = []
+
+        def fail_on_third_chunk(records, user):
+            calls.append(records[0]['row_num'])
+            if len(calls) == 3:
+                raise RuntimeError('koneksi terputus')
+            return ingest_receipt_rows(records, user)
+
+        with mock.patch('inventory.import_jobs.ingest_receipt_rows', side_effect=fail_on_third_chunk):
+            process_receipt_import_job(job.pk, chunk_size=100)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptImportJob.Status.FAILED)
+        self.assertEqual((job.processed_rows, job.last_committed_row), (200, 201))
+        self.assertIn('200 baris sampai baris 201 sudah tersimpan', job.message)
+        self.assertEqual(InventoryItem.objects.count(), 200)
+
+        self.assertTrue(retry_receipt_import_job(job.pk))
+        self.assertFalse(retry_receipt_import_job(job.pk))
+        process_receipt_import_job(job.pk, chunk_size=100)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptImportJob.Status.COMPLETED)
+        self.assertEqual((job.processed_rows, job.last_committed_row), (rows, rows + 1))
+        self.assertEqual(InventoryItem.objects.count(), rows)
+        self.assertEqual(Stock.objects.get().total_quantity, rows * 2)
+
+
+class ReceiptUploadTests(TestCase):
+    url = '/api/inventory-items/upload_receipt/'
+
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('operator@example.com', 'OPERATOR'))
+
+    def test_upload_spanning_several_chunks_is_ingested(self):
+        rows = DEFAULT_CHUNK_SIZE * 2 + 10
+        lines = (
+            f'{self.pulpen.full_base_code};Pulpen;Biru;pcs;2;1000;KW-{n % 3};2025-01-10' for n in range(rows)
+        )
+        response = self.client.post(self.url, {'file': receipt_csv(lines)}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['processed_items'], rows)
+        self.assertEqual(InventoryItem.objects.count(), rows)
+        self.assertEqual(Stock.objects.get().total_quantity, rows * 2)
+
+    def test_invalid_rows_reject_whole_file(self):
+        lines = [
+            f'{self.pulpen.full_base_code};Pulpen;Biru;pcs;2;1000;KW-1;2025-01-10',
+            f'{self.pulpen.full_base_code};Pulpen;Biru;pcs;2;1000;KW-1;2025-02-10',
+            '9999999999;Pulpen;Biru;pcs;2;1000;KW-2;2025-01-10',
+        ]
+        response = self.client.post(self.url, {'file': receipt_csv(lines)}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['details']['errors'])
+        self.assertFalse(InventoryItem.objects.exists())
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Mengunci jumlah query endpoint yang sering dipanggil. Data dibuat cukup banyak
+    sehingga N+1 (query per baris) akan melampaui `max_repeats`.
+    """
+    rows = 15
+
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.admin = create_user('admin@example.com', 'ADMIN')
+        peminta = create_user('peminta@example.com', 'PEMINTA')
+        records = receipt_records([
+            receipt_row(base_code, 3, number=f'KW-{n % 4}', name=f'Varian {n}')
+            for n in range(self.rows) for base_code in (self.pulpen.full_base_code, self.kertas.full_base_code)
+        ])
+        with transaction.atomic():
+            ingest_receipt_rows(records, self.admin)
+        variants = list(ProductVariant.objects.all())
+        for n in range(self.rows):
+            request = Request.objects.create(requester=peminta, status=Request.Status.SUBMITTED)
+            RequestItem.objects.create(request=request, variant=variants[n], quantity_requested=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        # Anggaran mengukur kondisi tunak: pohon kode sudah dimuat dan versinya tidak dicek ulang
+        get_code_tree()
+        version_check = mock.patch('inventory.code_tree.VERSION_CHECK_INTERVAL', float('inf'))
+        version_check.start()
+        self.addCleanup(version_check.stop)
+
+    def test_stock_levels_list(self):
+        with assert_query_budget(4, max_repeats=1):
+            response = self.client.get('/api/stock-levels/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], self.rows * 2)
+
+    def test_requests_list(self):
+        # COUNT + halaman + prefetch items/varian/kode dasar
+        with assert_query_budget(5, max_repeats=1):
+            response = self.client.get('/api/requests/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], self.rows)
+
+    def test_export_transactions_csv(self):
+        with assert_query_budget(4, max_repeats=1):
+            response = self.client.get('/api/reports/transactions/export-csv/')
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(content.strip().splitlines()), self.rows * 2 + 1)
+
+
+class StockReconciliationTests(TestCase):
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.admin = create_user('admin@example.com', 'ADMIN')
+        with transaction.atomic():
+            ingest_receipt_rows(receipt_records([
+                receipt_row(self.pulpen.full_base_code, 10),
+                receipt_row(self.kertas.full_base_code, 4, name='A4'),
+            ]), self.admin)
+        self.biru = ProductVariant.objects.get(base_item_code=self.pulpen)
+        self.a4 = ProductVariant.objects.get(base_item_code=self.kertas)
+
+    def _settle_ledger(self):
+        # Transaksi lebih tua dari RECONCILIATION_CHECKPOINT_LAG_SECONDS boleh masuk checkpoint
+        Transaction.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+
+    def test_consistent_stock_has_no_mismatches(self):
+        run = reconcile_stock(full=True, advance=False)
+        self.assertEqual(list(run.mismatches()), [])
+        self.assertEqual(run.checked, 2)
+
+    def test_checkpoint_lag_keeps_recent_transactions_pending(self):
+        run = reconcile_stock()
+        self.assertEqual(list(run.mismatches()), [])
+        self.assertEqual(run.checkpoint_id, 0)
+        self.assertFalse(LedgerBalance.objects.exists())
+
+        self._settle_ledger()
+        run = reconcile_stock()
+        self.assertEqual(list(run.mismatches()), [])
+        self.assertEqual(run.checkpoint_id, Transaction.objects.order_by('-pk').first().pk)
+        self.assertEqual(
+            dict(LedgerBalance.objects.values_list('variant_id', 'net_quantity')), {self.biru.pk: 10, self.a4.pk: 4}
+        )
+
+    def test_incremental_checks_only_variants_touched_since_checkpoint(self):
+        self._settle_ledger()
+        reconcile_stock()
+        Stock.objects.filter(variant=self.biru).update(total_quantity=7)
+        with transaction.atomic():
+            ingest_receipt_rows(receipt_records([receipt_row(self.kertas.full_base_code, 2, number='KW-002', name='A4')]), self.admin)
+        Stock.objects.filter(variant=self.a4).update(total_quantity=0)
+
+        incremental = list(reconcile_stock(advance=False).mismatches())
+        self.assertEqual(incremental, [Mismatch(self.a4.pk, self.a4.full_code, 0, 6, 6)])
+        full = list(reconcile_stock(full=True, advance=False).mismatches())
+        self.assertEqual(full, [
+            Mismatch(self.biru.pk, self.biru.full_code, 7, 10, 10), Mismatch(self.a4.pk, self.a4.full_code, 0, 6, 6)
+        ])
+        self.assertEqual(full[0].issues, ['stock_vs_ledger'])
+
+    def test_repair_from_ledger(self):
+        Stock.objects.filter(variant=self.biru).update(total_quantity=7)
+        [mismatch] = reconcile_stock(full=True, advance=False).mismatches()
+        result = repair_mismatch(mismatch, source='ledger', user=self.admin)
+        self.assertEqual(result, Repair(7, 10, False))
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 10)
+        self.assertFalse(Transaction.objects.filter(transaction_type=Transaction.Type.ADJUSTMENT).exists())
+
+    def test_repair_from_batches_posts_adjustment(self):
+        InventoryItem.objects.filter(variant=self.biru).update(quantity=8)
+        [mismatch] = reconcile_stock(full=True, advance=False).mismatches()
+        self.assertEqual(mismatch.issues, ['batches_vs_ledger'])
+        result = repair_mismatch(mismatch, source='batches', user=self.admin)
+        self.assertEqual(result, Repair(10, 8, False))
+        adjustment = Transaction.objects.get(transaction_type=Transaction.Type.ADJUSTMENT)
+        self.assertEqual((adjustment.variant_id, adjustment.quantity, adjustment.user), (self.biru.pk, -2, self.admin))
+        self.assertEqual(list(reconcile_stock(full=True, advance=False).mismatches()), [])
+
+    def test_repair_rechecks_stale_scan(self):
+        # Hasil scan yang usang: ledger terbaca sebelum penerimaan 5 unit commit, stok sesudahnya
+        stale = Mismatch(self.biru.pk, self.biru.full_code, stock=15, ledger=10, batches=10)
+        with transaction.atomic():
+            ingest_receipt_rows(receipt_records([receipt_row(self.pulpen.full_base_code, 5, number='KW-002')]), self.admin)
+        result = repair_mismatch(stale, source='ledger')
+        self.assertTrue(result.skipped)
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 15)
+
+
+class FifoIssueTests(TestCase):
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.operator = create_user('operator@example.com', 'OPERATOR')
+        self.peminta = create_user('peminta@example.com', 'PEMINTA')
+        # Dua batch Pulpen Biru: 4 unit (lebih lama) lalu 10 unit; satu batch Kertas A4: 3 unit
+        for number, quantity in (('KW-001', 4), ('KW-002', 10)):
+            with transaction.atomic():
+                ingest_receipt_rows(
+                    receipt_records([receipt_row(self.pulpen.full_base_code, quantity, number=number)]), self.operator
+                )
+        with transaction.atomic():
+            ingest_receipt_rows(
+                receipt_records([receipt_row(self.kertas.full_base_code, 3, number='KW-003', name='A4')]), self.operator
+            )
+        self.biru = ProductVariant.objects.get(base_item_code=self.pulpen)
+        self.a4 = ProductVariant.objects.get(base_item_code=self.kertas)
+        self.old_batch, self.new_batch = InventoryItem.objects.filter(variant=self.biru).order_by('id')
+        InventoryItem.objects.filter(pk=self.old_batch.pk).update(entry_date=timezone.now() - timedelta(days=30))
+
+    def _approved_request(self, *lines):
+        req = Request.objects.create(requester=self.peminta, status=Request.Status.APPROVED_SPV2)
+        for variant, quantity in lines:
+            RequestItem.objects.create(
+                request=req, variant=variant, quantity_requested=quantity, quantity_approved_spv2=quantity
+            )
+        return req
+
+    def test_issue_request_rejects_request_processed_concurrently(self):
+        req = self._approved_request((self.biru, 2))
+        stale = Request.objects.get(pk=req.pk)
+        with transaction.atomic():
+            issue_request(req, self.operator)
+        with self.assertRaises(Request.DoesNotExist):
+            with transaction.atomic():
+                issue_request(stale, self.operator)
+        self.assertEqual(SPMB.objects.count(), 1)
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 12)
+
+    def test_issue_takes_oldest_batch_first(self):
+        req = self._approved_request((self.biru, 6), (self.a4, 2))
+        with transaction.atomic():
+            spmb = issue_request(req, self.operator)
+        self.assertEqual(InventoryItem.objects.get(pk=self.old_batch.pk).quantity, 0)
+        self.assertEqual(InventoryItem.objects.get(pk=self.new_batch.pk).quantity, 8)
+        out = Transaction.objects.filter(transaction_type=Transaction.Type.OUT, variant=self.biru)
+        self.assertEqual(
+            sorted(out.values_list('inventory_item_id', 'quantity')),
+            [(self.old_batch.pk, -4), (self.new_batch.pk, -2)]
+        )
+        self.assertEqual(out.filter(related_spmb=spmb, related_request=req).count(), 2)
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 8)
+        self.assertEqual(Stock.objects.get(variant=self.a4).total_quantity, 1)
+        req.refresh_from_db()
+        self.assertEqual((req.status, req.operator_processor), (Request.Status.COMPLETED, self.operator))
+        self.assertEqual(
+            list(RequestItem.objects.filter(request=req).order_by('id').values_list('quantity_issued', flat=True)), [6, 2]
+        )
+
+    def test_insufficient_stock_writes_nothing(self):
+        req = self._approved_request((self.biru, 2), (self.a4, 5))
+        with self.assertRaises(InsufficientStockError):
+            with transaction.atomic():
+                issue_request(req, self.operator)
+        self.assertEqual(
+            sorted(InventoryItem.objects.values_list('quantity', flat=True)), [3, 4, 10]
+        )
+        self.assertFalse(Transaction.objects.filter(transaction_type=Transaction.Type.OUT).exists())
+        self.assertFalse(SPMB.objects.exists())
+        self.assertEqual(Request.objects.get(pk=req.pk).status, Request.Status.APPROVED_SPV2)
+
+    def test_spmb_numbers_are_consecutive(self):
+        year = timezone.now().year
+        numbers = []
+        for _ in range(3):
+            req = self._approved_request((self.biru, 1))
+            with transaction.atomic():
+                numbers.append(issue_request(req, self.operator).spmb_number)
+        self.assertEqual(numbers, [f'SPMB-{n:02d}/WBC.05/PS/{year}' for n in (1, 2, 3)])
+
+    def test_insufficient_stock_reports_aggregate_need(self):
+        with self.assertRaises(InsufficientStockError) as raised:
+            with transaction.atomic():
+                FifoAllocator([self.biru.pk]).allocate([(self.biru, 8), (self.biru, 8)])
+        self.assertEqual((raised.exception.requested, raised.exception.available), (16, 14))
+
+    def test_stock_drift_skips_only_the_affected_request(self):
+        # Stok sistem 5 lebih kecil dari total batch 14
+        Stock.objects.filter(variant=self.biru).update(total_quantity=5)
+        first = self._approved_request((self.biru, 4))
+        second = self._approved_request((self.biru, 4))
+        third = self._approved_request((self.a4, 1))
+        with transaction.atomic():
+            outcomes = issue_requests([first.pk, second.pk, third.pk], self.operator)
+        errors = {req.pk: error for req, _, error in outcomes}
+        self.assertIsNone(errors[first.pk])
+        self.assertIn('tersedia 1', errors[second.pk])
+        self.assertIsNone(errors[third.pk])
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 1)
+        self.assertEqual(Request.objects.get(pk=second.pk).status, Request.Status.APPROVED_SPV2)
+
+
+    def test_bulk_process_skips_request_without_stock(self):
+        # Diproses berurutan submitted_at: pertama 10 dari 14, kedua (butuh 6) dilewati, ketiga 3 dari sisa 4
+        requests = [self._approved_request((self.biru, quantity)) for quantity in (10, 6, 3)]
+        for offset, req in enumerate(requests):
+            Request.objects.filter(pk=req.pk).update(submitted_at=timezone.now() + timedelta(minutes=offset))
+        client = APIClient()
+        client.force_authenticate(self.operator)
+        response = client.post(
+            '/api/requests/bulk-process/', {'request_ids': [req.pk for req in requests] + [999999]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['processed'], response.data['failed']), (2, 2))
+        results = {result['request_id']: result for result in response.data['results']}
+        self.assertEqual(results[requests[1].pk]['status'], 'FAILED')
+        self.assertEqual(results[999999]['status'], 'FAILED')
+        year = timezone.now().year
+        self.assertEqual(
+            [results[requests[0].pk]['spmb_number'], results[requests[2].pk]['spmb_number']],
+            [f'SPMB-01/WBC.05/PS/{year}', f'SPMB-02/WBC.05/PS/{year}']
+        )
+        statuses = dict(Request.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[requests[1].pk], Request.Status.APPROVED_SPV2)
+        self.assertEqual(Stock.objects.get(variant=self.biru).total_quantity, 1)
+        self.assertEqual(RequestLog.objects.filter(action='PROCESS').count(), 2)
+
+class InventoryItemViewSetTests(TestCase):
+    url = '/api/inventory-items/'
+
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.operator = create_user('operator@example.com', 'OPERATOR')
+        with transaction.atomic():
+            ingest_receipt_rows(receipt_records([receipt_row(self.pulpen.full_base_code, 5)]), self.operator)
+        self.batch = InventoryItem.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.operator)
+
+    def test_create_rolls_back_batch_when_stock_update_fails(self):
+        payload = {'variant': self.batch.variant_id, 'quantity': 3, 'purchase_price': '1000'}
+        with mock.patch('inventory.views.refresh_valuations', side_effect=RuntimeError('gagal')):
+            with self.assertRaises(RuntimeError), self.assertLogs('django.request', 'ERROR'):
+                self.client.post(self.url, payload, format='json')
+        self.assertEqual(InventoryItem.objects.count(), 1)
+        self.assertEqual(Stock.objects.get().total_quantity, 5)
+
+    def test_destroy_keeps_batch_when_stock_update_fails(self):
+        with mock.patch('inventory.views.refresh_valuations', side_effect=RuntimeError('gagal')):
+            with self.assertRaises(RuntimeError), self.assertLogs('django.request', 'ERROR'):
+                self.client.delete(f'{self.url}{self.batch.pk}/')
+        self.assertTrue(InventoryItem.objects.filter(pk=self.batch.pk).exists())
+        self.assertEqual(Stock.objects.get().total_quantity, 5)
+
+    def test_destroy_deducts_stock(self):
+        response = self.client.delete(f'{self.url}{self.batch.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Stock.objects.get().total_quantity, 0)
+        self.assertEqual(Transaction.objects.filter(transaction_type=Transaction.Type.ADJUSTMENT).get().quantity, -5)
+
+
+class StockMutationTests(TestCase):
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.variant = ProductVariant.objects.create(
+            base_item_code=self.pulpen, type_name='Pulpen', name='Merah', unit_of_measure='pcs'
+        )
+
+    def _stock(self):
+        return Stock.objects.get(variant=self.variant).total_quantity
+
+    def test_positive_delta_creates_row(self):
+        self.assertFalse(Stock.objects.filter(variant=self.variant).exists())
+        self.assertEqual(apply_stock_delta(self.variant.pk, 7), StockChange(7, 7))
+        self.assertEqual(apply_stock_delta(self.variant.pk, 3), StockChange(10, 3))
+        self.assertEqual(self._stock(), 10)
+
+    def test_negative_delta_below_zero_is_refused(self):
+        apply_stock_delta(self.variant.pk, 4)
+        with self.assertRaises(NegativeStockError) as raised:
+            apply_stock_delta(self.variant.pk, -5)
+        self.assertEqual((raised.exception.delta, raised.exception.available), (-5, 4))
+        self.assertEqual(self._stock(), 4)
+        self.assertEqual(apply_stock_delta(self.variant.pk, -4), StockChange(0, -4))
+
+    def test_clamp_empties_stock(self):
+        apply_stock_delta(self.variant.pk, 4)
+        self.assertEqual(apply_stock_delta(self.variant.pk, -9, clamp=True), StockChange(0, -4))
+        self.assertEqual(apply_stock_delta(self.variant.pk, -1, clamp=True), StockChange(0, 0))
+        self.assertEqual(self._stock(), 0)
+
+    def test_without_returning(self):
+        with mock.patch('inventory.stock_mutations._supports_returning', return_value=False):
+            self.assertEqual(apply_stock_delta(self.variant.pk, 5), StockChange(5, 5))
+            self.assertEqual(apply_stock_delta(self.variant.pk, -2), StockChange(3, -2))
+            with self.assertRaises(NegativeStockError):
+                apply_stock_delta(self.variant.pk, -4)
+        self.assertEqual(self._stock(), 3)
+
+    def test_snapshot_follows_stock(self):
+        apply_stock_delta(self.variant.pk, 6)
+        snapshot = StockSnapshot.objects.get(variant=self.variant)
+        self.assertEqual((snapshot.total_quantity, snapshot.is_out_of_stock), (6, False))
+        apply_stock_delta(self.variant.pk, -6)
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.total_quantity, snapshot.is_out_of_stock), (0, True))
+
+
+class NumberSequenceTests(TestCase):
+    scope = NumberSequence.Scope.REQUEST
+
+    def test_first_reservation_inserts_counter_from_seed(self):
+        self.assertEqual(reserve_numbers(self.scope, 'WBC.051/2025', 1, seed=lambda: 41), 42)
+        self.assertEqual(NumberSequence.objects.get(scope=self.scope, key='WBC.051/2025').last_value, 42)
+
+    def test_existing_counter_is_updated(self):
+        NumberSequence.objects.create(scope=self.scope, key='WBC.051/2025', last_value=7)
+        seed = mock.Mock(return_value=0)
+        self.assertEqual(allocate_number(self.scope, 'WBC.051/2025', seed=seed), 8)
+        self.assertEqual(allocate_number(self.scope, 'WBC.051/2025', seed=seed), 9)
+        seed.assert_not_called()
+
+    def test_range_reservation(self):
+        self.assertEqual(reserve_numbers(self.scope, 'A/2025', 5), 1)
+        self.assertEqual(reserve_numbers(self.scope, 'A/2025', 3), 6)
+        self.assertEqual(allocate_number(self.scope, 'A/2025'), 9)
+        # Key lain punya counter sendiri
+        self.assertEqual(reserve_numbers(self.scope, 'B/2025', 2), 1)
+        with self.assertRaises(ValueError):
+            reserve_numbers(self.scope, 'A/2025', 0)
+
+    def test_counter_created_concurrently_is_incremented(self):
+        # Proses lain membuat baris counter di antara UPDATE (tidak ada baris) dan INSERT: ON CONFLICT menambahkan
+        def seed():
+            NumberSequence.objects.create(scope=self.scope, key='WBC.051/2025', last_value=10)
+            return 3
+        self.assertEqual(reserve_numbers(self.scope, 'WBC.051/2025', 2, seed=seed), 11)
+        self.assertEqual(NumberSequence.objects.get(scope=self.scope, key='WBC.051/2025').last_value, 12)
+
+
+class CodeTreeTests(TestCase):
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+
+    def test_tree_loads_only_upper_levels(self):
+        _tree_for_version.cache_clear()
+        cache.clear()
+        with self.assertNumQueries(4):
+            tree = _tree_for_version(-1)
+        self.assertEqual(tree.subkelompok_prefix(self.sub_kelompok.pk), ('1.01.01.01', '1010101'))
+
+    def test_barang_changes_do_not_invalidate_tree(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ItemCodeBarang.objects.create(sub_kelompok=self.sub_kelompok, code='003', base_description='Spidol')
+            self.pulpen.base_description = 'Pulpen Gel'
+            self.pulpen.save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            ItemCodeSubKelompok.objects.create(kelompok=self.sub_kelompok.kelompok, code='02', base_description='Kertas')
+        self.assertEqual(len(callbacks), 1)
+
+    def test_barang_entries_by_full_base_code(self):
+        with self.assertNumQueries(1):
+            entries = barang_entries([self.pulpen.full_base_code, '9999999999'])
+        self.assertEqual(list(entries), [self.pulpen.full_base_code])
+        self.assertEqual(entries[self.pulpen.full_base_code].id, self.pulpen.pk)
+
+
+class LedgerListTests(TestCase):
+    """Representasi list transaksi/stok: cursor keyset, `?fields=`, dan `?view=compact`."""
+    rows = 15
+
+    def setUp(self):
+        self.sub_kelompok, self.pulpen, self.kertas = create_code_tree()
+        self.admin = create_user('admin@example.com', 'ADMIN')
+        # Satu ingest: semua Transaction IN punya timestamp yang sama persis
+        with transaction.atomic():
+            ingest_receipt_rows(receipt_records([
+                receipt_row(base_code, 2, name=f'Varian {n}')
+                for n in range(self.rows) for base_code in (self.pulpen.full_base_code, self.kertas.full_base_code)
+            ]), self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        get_code_tree()
+        version_check = mock.patch('inventory.code_tree.VERSION_CHECK_INTERVAL', float('inf'))
+        version_check.start()
+        self.addCleanup(version_check.stop)
+
+    def test_cursor_round_trip_over_equal_timestamps(self):
+        self.assertEqual(Transaction.objects.values('timestamp').distinct().count(), 1)
+        pages = []
+        url = '/api/transactions/?pagination=cursor&page_size=7'
+        while url:
+            # Tanpa COUNT: satu query halaman saja
+            with assert_query_budget(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 7, 2])
+        self.assertEqual(
+            [pk for page in pages for pk in page], list(Transaction.objects.order_by('-id').values_list('pk', flat=True))
+        )
+
+        # Kembali ke awal lewat `previous`: halaman yang sama, urutan yang sama
+        backward = [pages[-1]]
+        url = response.data['previous']
+        while url:
+            response = self.client.get(url)
+            backward.append([row['id'] for row in response.data['results']])
+            url = response.data['previous']
+        self.assertEqual(backward[::-1], pages)
+
+    def test_sparse_fields_prune_columns_without_deferred_loads(self):
+        # COUNT + halaman; kolom yang di-defer oleh .only() tidak boleh dimuat ulang per baris
+        with assert_query_budget(2, max_repeats=1), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/stock-levels/?fields=total_quantity,variant.full_code,variant.name')
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'total_quantity', 'variant'})
+        self.assertEqual(set(row['variant']), {'full_code', 'name'})
+        page_sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"inventory_productvariant"."full_code"', page_sql)
+        self.assertNotIn('"inventory_productvariant"."barcode"', page_sql)
+
+        # inventory_item_info membaca InventoryItem.__str__ lewat field_dependencies
+        with assert_query_budget(2, max_repeats=1):
+            response = self.client.get('/api/transactions/?fields=id,quantity,inventory_item_info')
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'quantity', 'inventory_item_info'})
+        self.assertIn('Varian', row['inventory_item_info'])
+
+    def test_compact_view_returns_flat_value_rows(self):
+        with assert_query_budget(2, max_repeats=1):
+            response = self.client.get('/api/stock-levels/?view=compact')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], self.rows * 2)
+        row = response.data['results'][0]
+        self.assertIsInstance(row, dict)
+        self.assertEqual(set(row), set(STOCK_COMPACT_FIELDS))
+        stock = Stock.objects.select_related('variant__base_item_code').get(variant_id=row['variant_id'])
+        self.assertEqual(row['variant_full_code'], stock.variant.full_code)
+        self.assertEqual(row['base_item_full_code'], stock.variant.base_item_code.full_base_code)
+        self.assertEqual(row['total_quantity'], 2)
+        self.assertIs(row['is_out_of_stock'], False)
+
+        # Header Accept dengan profile compact sama dengan ?view=compact; cursor tetap bekerja
+        response = self.client.get(
+            '/api/transactions/?pagination=cursor&page_size=5', HTTP_ACCEPT='application/json; profile="compact"'
+        )
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][0]
+        self.assertEqual(set(row), set(TRANSACTION_COMPACT_FIELDS) | {'transaction_type_display'})
+        self.assertEqual(row['transaction_type'], Transaction.Type.IN)
+        self.assertEqual(row['transaction_type_display'], Transaction.Type.IN.label)
+        self.assertEqual(row['user_email'], self.admin.email)
+        next_page = self.client.get(response.data['next'], HTTP_ACCEPT='application/json; profile="compact"')
+        self.assertLess(next_page.data['results'][0]['id'], response.data['results'][-1]['id'])
+
+
+ITEM_CODE_CSV_HEADER = 'kd_gol;kdbid;kdkel;kdskel;kd_brg;ur_sskel;kd_akun;ur_akun'
+
+
+def item_code_rows(lines):
+    """Hasil parse_item_code_csv dari baris-baris teks CSV kode barang tanpa header."""
+    rows, errors = parse_item_code_csv(io.StringIO('\n'.join([ITEM_CODE_CSV_HEADER] + list(lines)) + '\n'))
+    assert not errors, errors
+    return rows
+
+
+class ItemCodeImportTests(TestCase):
+    def test_inserts_all_five_levels(self):
+        rows = item_code_rows([
+            '3;05;02;01;001;Meja Kerja;117;Peralatan Kantor',
+            '3;05;02;01;002;Kursi Kerja;117;Peralatan Kantor',
+            '3;05;02;02;001;Lemari;;',
+        ])
+        with transaction.atomic():
+            result = import_item_code_rows(rows)
+        self.assertEqual(result, {'created': 3, 'updated': 0, 'errors': []})
+        self.assertEqual(ItemCodeGolongan.objects.count(), 1)
+        self.assertEqual(ItemCodeBidang.objects.count(), 1)
+        self.assertEqual(ItemCodeKelompok.objects.count(), 1)
+        self.assertEqual(
+            list(ItemCodeSubKelompok.objects.order_by('code').values_list('code', 'base_description')),
+            [('01', 'Meja Kerja'), ('02', 'Lemari')]
+        )
+        meja = ItemCodeBarang.objects.get(full_base_code='3050201001')
+        self.assertEqual((meja.base_description, meja.account_code, meja.account_description), ('Meja Kerja', '117', 'Peralatan Kantor'))
+        self.assertEqual(meja.import_fingerprint, row_fingerprint(rows['3', '05', '02', '01', '001']))
+        lemari = ItemCodeBarang.objects.get(full_base_code='3050202001')
+        self.assertIsNone(lemari.account_code)
+
+    def test_upserts_changed_description(self):
+        sub_kelompok, pulpen, kertas = create_code_tree()
+        with transaction.atomic():
+            result = import_item_code_rows(item_code_rows(['1;01;01;01;001;Pulpen Gel;117;ATK']))
+        self.assertEqual(result, {'created': 0, 'updated': 1, 'errors': []})
+        pulpen.refresh_from_db()
+        self.assertEqual((pulpen.base_description, pulpen.account_code), ('Pulpen Gel', '117'))
+        self.assertEqual(ItemCodeBarang.objects.count(), 2)
+        # Uraian level atas yang sudah ada tidak ditimpa
+        sub_kelompok.refresh_from_db()
+        self.assertEqual(sub_kelompok.base_description, 'ATK')
+
+    def test_reports_full_base_code_collisions(self):
+        create_code_tree()
+        # '1' dan '001' menghasilkan full_base_code yang sama
+        rows = item_code_rows([
+            '1;01;01;01;1;Pulpen Lain;;',
+            '1;01;01;01;3;Spidol;;',
+            '1;01;01;01;003;Spidol Papan;;',
+        ])
+        with transaction.atomic():
+            result = import_item_code_rows(rows)
+        self.assertEqual((result['created'], result['updated']), (1, 0))
+        self.assertEqual(result['errors'], [
+            'Error processing row 2: full_base_code 1010101001 sudah dipakai kode barang lain.',
+            'Error processing row 4: full_base_code 1010101003 sudah dipakai kode barang lain.',
+        ])
+        self.assertEqual(ItemCodeBarang.objects.get(full_base_code='1010101001').base_description, 'Pulpen')
+        self.assertEqual(ItemCodeBarang.objects.get(full_base_code='1010101003').base_description, 'Spidol')
+
+    def test_delta_import_skips_unchanged_and_reports_missing(self):
+        lines = ['2;01;01;01;001;Meja Kerja;117;Peralatan', '2;01;01;01;002;Kursi;117;Peralatan']
+        with transaction.atomic():
+            import_item_code_rows(item_code_rows(lines + ['2;01;01;01;003;Lemari;;']))
+
+        # Whitespace berbeda tidak dianggap perubahan; Kursi berubah, Rak baru, Lemari hilang dari CSV
+        rows = item_code_rows([
+            '2;01;01;01;001;Meja  Kerja;117;Peralatan', '2;01;01;01;002;Kursi Lipat;117;Peralatan',
+            '2;01;01;01;004;Rak;;',
+        ])
+        changed_rows, summary = diff_item_code_rows(rows)
+        self.assertEqual(summary, {'inserted': 1, 'changed': 1, 'unchanged': 1, 'removed': ['2010101003']})
+        self.assertEqual(sorted(key[-1] for key in changed_rows), ['002', '004'])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as csvfile:
+            csvfile.write('\n'.join([ITEM_CODE_CSV_HEADER, *lines[:1], '2;01;01;01;002;Kursi Lipat;117;Peralatan']) + '\n')
+        self.addCleanup(os.unlink, csvfile.name)
+        stdout = io.StringIO()
+        call_command('import_item_codes', csvfile.name, '--delta', stdout=stdout, stderr=io.StringIO())
+        output = stdout.getvalue()
+        self.assertIn('Created 0 new base items, Updated 1 existing base items.', output)
+        self.assertIn('Not in CSV (kept): 2010101003', output)
+        self.assertIn('Delta summary: 0 inserted, 1 changed, 1 unchanged, 1 not in CSV.', output)
+        self.assertEqual(ItemCodeBarang.objects.get(full_base_code='2010101002').base_description, 'Kursi Lipat')
+        self.assertTrue(ItemCodeBarang.objects.filter(full_base_code='2010101003').exists())
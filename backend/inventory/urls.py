@@ -8,6 +8,7 @@ router = DefaultRouter()
 router.register(r'product-variants', views.ProductVariantViewSet)
 router.register(r'stock-levels', views.StockViewSet)
 router.register(r'inventory-items', views.InventoryItemViewSet)
+router.register(r'receipt-import-jobs', views.ReceiptImportJobViewSet)
 router.register(r'requests', views.RequestViewSet)
 router.register(r'spmbs', views.SPMBViewSet)
 router.register(r'request-logs', views.RequestLogViewSet)
@@ -20,6 +21,7 @@ router.register(r'reports/low-stock-alert', views.LowStockAlertViewSet, basename
 router.register(r'reports/moving-items', views.MovingItemsReportViewSet, basename='report-moving-items')
 router.register(r'reports/transactions', views.TransactionReportViewSet, basename='report-transactions')
 router.register(r'reports/consumption', views.ConsumptionReportViewSet, basename='report-consumption')
+router.register(r'reports/stock-reconciliation', views.StockReconciliationViewSet, basename='report-stock-reconciliation')
 
 urlpatterns = [
     path('', include(router.urls)),
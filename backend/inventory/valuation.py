@@ -0,0 +1,59 @@
+# backend/inventory/valuation.py
+"""
+Ledger nilai persediaan FIFO per varian (tabel StockValuation).
+
+Nilai FIFO = harga beli batch tertua yang masih bersisa, dikalikan kuantitas sampai
+sejumlah stok sistem (Stock.total_quantity). Nilai dihitung ulang hanya untuk varian
+yang berubah, di dalam transaksi yang sama dengan perubahan batch/stoknya, sehingga
+laporan nilai stok cukup membaca satu baris per varian.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import InventoryItem, Stock, StockValuation
+
+
+def compute_fifo_value(quantity_on_hand, batches):
+    """Nilai FIFO dari [(quantity, purchase_price), ...] yang sudah urut (entry_date, id)."""
+    total_value = Decimal('0.00')
+    quantity_to_value = quantity_on_hand
+    for quantity, purchase_price in batches:
+        if quantity_to_value <= 0:
+            break
+        taken = min(quantity_to_value, quantity)
+        total_value += taken * (purchase_price or Decimal('0.00'))
+        quantity_to_value -= taken
+    return total_value
+
+
+def refresh_valuations(variant_ids):
+    """Hitung ulang dan simpan (upsert) nilai FIFO untuk varian yang diberikan."""
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return
+    on_hand = dict(
+        Stock.objects.filter(variant_id__in=variant_ids).values_list('variant_id', 'total_quantity')
+    )
+    batches = defaultdict(list)
+    open_batches = InventoryItem.objects.filter(
+        variant_id__in=variant_ids, quantity__gt=0
+    ).order_by('variant_id', 'entry_date', 'id').values_list('variant_id', 'quantity', 'purchase_price')
+    for variant_id, quantity, purchase_price in open_batches:
+        batches[variant_id].append((quantity, purchase_price))
+
+    now = timezone.now()
+    StockValuation.objects.bulk_create(
+        [
+            StockValuation(
+                variant_id=variant_id,
+                total_value=compute_fifo_value(on_hand.get(variant_id, 0), batches[variant_id]),
+                last_updated=now
+            )
+            for variant_id in variant_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['variant'],
+        update_fields=['total_value', 'last_updated']
+    )
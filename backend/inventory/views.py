@@ -1,24 +1,22 @@
 # backend/inventory/views.py
-from rest_framework import viewsets, status, permissions, generics, pagination
+from rest_framework import viewsets, status, permissions, generics, pagination, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import serializers
 from rest_framework import filters
 from rest_framework.views import APIView
-from django.db.models import F, Prefetch, Sum, Q, Value, Subquery, OuterRef
-from django.db.models.functions import Coalesce, Abs
+from django.db.models import F, Prefetch, Sum, Q, Value, Subquery, OuterRef, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils.dateparse import parse_date
-from django.http import HttpResponse
 import csv
 from datetime import date, timedelta
-from decimal import Decimal, InvalidOperation
-from django.db import transaction, IntegrityError
+from decimal import Decimal
+from django.db import transaction
 from django.utils import timezone
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFromToRangeFilter, ModelChoiceFilter, ChoiceFilter, CharFilter
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFromToRangeFilter, ModelChoiceFilter, ChoiceFilter, CharFilter, OrderingFilter
 # from django.shortcuts import get_object_or_404 # Mungkin tidak terpakai
 import pandas as pd
-import openpyxl
-import traceback # Untuk debugging jika perlu
+import logging
 
 # Impor model dengan benar
 from .models import (
@@ -26,7 +24,8 @@ from .models import (
     Request, RequestItem, SPMB, RequestLog, Transaction, ProductVariant,
     StockOpnameSession, StockOpnameItem,
     ItemCodeGolongan, ItemCodeBidang, ItemCodeKelompok, ItemCodeSubKelompok, ItemCodeBarang,
-    Receipt # Pastikan Receipt hanya diimpor sekali
+    Receipt, # Pastikan Receipt hanya diimpor sekali
+    ReceiptImportJob, DailyConsumption, StockSnapshot,
 )
 # Impor serializer dengan benar
 from .serializers import (
@@ -36,10 +35,22 @@ from .serializers import (
     RequestLogSerializer, TransactionSerializer, StockOpnameSessionSerializer,
     StockOpnameItemSerializer, StockOpnameFileUploadSerializer,
     StockOpnameConfirmSerializer, StockValueFIFOReportSerializer,
-    ReceiptUploadSerializer, ReceiptSerializer,
+    ReceiptUploadSerializer, ReceiptSerializer, ReceiptImportJobSerializer,
     ItemCodeBarangSerializer,
     CurrentStockReportSerializer, MovingItemsReportSerializer, ConsumptionReportSerializer,
 )
+from .receipt_import import ingest_receipt_rows, iter_receipt_chunks, scan_receipt_file, MAX_REPORTED_ERRORS
+from .import_jobs import create_receipt_import_job, retry_receipt_import_job
+from .fifo import issue_request, issue_requests, InsufficientStockError
+from .valuation import refresh_valuations
+from .stock_mutations import apply_stock_delta, NegativeStockError
+from .reconciliation import reconcile_stock, repair_mismatch, REPAIR_SOURCES
+from .pagination import TransactionLedgerPagination
+from .compact import (
+    CompactListMixin, STOCK_COMPACT_FIELDS, TRANSACTION_COMPACT_FIELDS, STOCK_OPNAME_ITEM_COMPACT_FIELDS,
+)
+from .fieldsets import SparseFieldsViewMixin
+from .exports import streaming_csv_response, export_filename, wants_gzip, EXPORT_CHUNK_SIZE
 # Impor permission kustom
 from .permissions import (
     IsAdminUser, IsOperatorOrReadOnly, IsOperator, IsPeminta,
@@ -47,17 +58,18 @@ from .permissions import (
     CanApproveRequestSpv2, CanProcessRequestOperator, IsOwnerOfRequest
 )
 
+logger = logging.getLogger(__name__)
+
 # --- FilterSet Kustom untuk Laporan Konsumsi ---
 
 class ConsumptionFilter(FilterSet):
-    timestamp_range = DateFromToRangeFilter(field_name='timestamp')
-    department_code = CharFilter(field_name='related_request__requester__department_code', lookup_expr='iexact')
-    # Tambahkan filter lain jika perlu, misal variant
-    # variant = ModelChoiceFilter(queryset=ProductVariant.objects.all(), field_name='variant')
+    # Nama parameter tetap sama seperti saat laporan masih membaca Transaction langsung
+    timestamp_range = DateFromToRangeFilter(field_name='day')
+    department_code = CharFilter(field_name='department_code', lookup_expr='iexact')
 
     class Meta:
-        model = Transaction
-        fields = ['timestamp_range', 'department_code', 'variant'] # Tambahkan 'variant' jika filter di atas diaktifkan
+        model = DailyConsumption
+        fields = ['timestamp_range', 'department_code', 'variant']
 
 # --- ViewSet Baru untuk Laporan Konsumsi (dengan Ekspor CSV) ---
 
@@ -84,30 +96,16 @@ class ConsumptionReportViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """
-        Mengambil data transaksi keluar, mengagregasi per departemen & varian,
+        Menjumlahkan rekap konsumsi harian (DailyConsumption) per departemen & varian,
         dan menganotasi dengan detail yang diperlukan serializer.
         """
-        queryset = Transaction.objects.filter(
-            transaction_type=Transaction.Type.OUT,
-            related_request__isnull=False,
-            related_request__requester__isnull=False
-        ).select_related(
-            'variant__base_item_code',
-            'related_request__requester'
-        )
-
-        # Filter diterapkan oleh DjangoFilterBackend menggunakan filterset_class
-
-        report_data = queryset.values(
-            'related_request__requester__department_code', # Grouping
-            'variant__id',                                  # Grouping
+        # Filter (rentang tanggal, departemen, varian) diterapkan oleh DjangoFilterBackend
+        # pada kolom rekap, sehingga agregasi hanya membaca satu baris per hari/unit/varian.
+        report_data = DailyConsumption.objects.values(
+            'department_code',  # Grouping
+            'variant__id',      # Grouping
         ).annotate(
-            total_quantity_consumed=Coalesce(Sum(Abs('quantity')), 0),
-            # Ambil data lain menggunakan F expression
-            department_code=F('related_request__requester__department_code'),
-            # Ambil data requester jika ingin ditampilkan per user, bukan hanya dept
-            # requester_id=F('related_request__requester__id'),
-            # requester_email=F('related_request__requester__email'),
+            total_quantity_consumed=Coalesce(Sum('quantity_out'), 0),
             variant_id=F('variant__id'),
             variant_full_code=F('variant__full_code'),
             variant_type_name=F('variant__type_name'),
@@ -127,6 +125,7 @@ class ConsumptionReportViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Ekspor data laporan konsumsi per unit/varian ke format CSV.
         Menerima query parameter filter yang sama dengan list view.
+        Dikirim streaming; tambahkan `?compress=gzip` untuk mengunduh file .csv.gz.
         """
         # Terapkan filter yang sama seperti list view
         queryset = self.filter_queryset(self.get_queryset())
@@ -146,12 +145,6 @@ class ConsumptionReportViewSet(viewsets.ReadOnlyModelViewSet):
              queryset = queryset.order_by(*self.ordering)
 
 
-        # Siapkan HttpResponse dengan header CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="laporan_konsumsi_{date.today().strftime("%Y%m%d")}.csv"'
-
-        writer = csv.writer(response, delimiter=';')
-
         # Tulis header kolom (sesuaikan dengan field di ConsumptionReportSerializer)
         header = [
             'Kode Departemen',
@@ -164,13 +157,11 @@ class ConsumptionReportViewSet(viewsets.ReadOnlyModelViewSet):
             'Satuan',
             'Total Kuantitas Konsumsi',
         ]
-        writer.writerow(header)
 
-        # Tulis data per baris
         # Karena queryset sudah berisi dictionary hasil values().annotate(),
         # kita bisa langsung akses key-nya
-        for row in queryset:
-            writer.writerow([
+        rows = (
+            [
                 row.get('department_code', ''),
                 # row.get('requester_id', ''), # Jika ada
                 # row.get('requester_email', ''), # Jika ada
@@ -180,11 +171,72 @@ class ConsumptionReportViewSet(viewsets.ReadOnlyModelViewSet):
                 row.get('base_item_description', ''),
                 row.get('variant_unit', ''),
                 row.get('total_quantity_consumed', 0),
-            ])
-
-        return response
+            ]
+            for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_csv_response(export_filename('laporan_konsumsi'), header, rows, gzip=wants_gzip(request))
     # --- AKHIR ACTION EKSPOR CSV ---
 
+# --- View Set Rekonsiliasi Stok ---
+class StockReconciliationViewSet(viewsets.ViewSet):
+    """
+    API endpoint selisih Stock vs ledger Transaction vs batch InventoryItem per varian.
+    GET hanya membaca (checkpoint tidak dimajukan; itu tugas `manage.py reconcile_stock`).
+    `?full=true` memeriksa semua varian, default hanya varian yang bertransaksi sejak checkpoint.
+    """
+    permission_classes = [IsOperator | IsAtasanOperator | IsAdminUser]
+
+    def _run(self, request):
+        full = request.query_params.get('full', '').lower() in ('1', 'true')
+        return reconcile_stock(full=full, advance=False)
+
+    def list(self, request):
+        run = self._run(request)
+        results = [mismatch.as_dict() for mismatch in run.mismatches()]
+        return Response({'checked': run.checked, 'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='export-csv')
+    def export_csv(self, request):
+        """Ekspor selisih ke CSV (streaming); tambahkan `?compress=gzip` untuk file .csv.gz."""
+        header = ['ID Varian', 'Kode Varian', 'Stok Sistem', 'Saldo Ledger', 'Sisa Batch', 'Masalah']
+        rows = (
+            [m.variant_id, m.full_code, m.stock, m.ledger, m.batches, ', '.join(m.issues)]
+            for m in self._run(request).mismatches()
+        )
+        return streaming_csv_response(export_filename('rekonsiliasi_stok'), header, rows, gzip=wants_gzip(request))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def repair(self, request):
+        """
+        Aksi Admin: samakan stok sistem dengan `source` ('ledger' default, atau 'batches').
+        Body opsional: {"source": ..., "variant_ids": [...]}; query `?full=true` seperti list.
+        """
+        source = request.data.get('source', 'ledger')
+        if source not in REPAIR_SOURCES:
+            return Response({"error": f"source harus salah satu dari: {', '.join(REPAIR_SOURCES)}."}, status=status.HTTP_400_BAD_REQUEST)
+        variant_ids = request.data.get('variant_ids') or []
+        try:
+            if not isinstance(variant_ids, list):
+                raise TypeError
+            variant_ids = {int(pk) for pk in variant_ids} or None
+        except (TypeError, ValueError):
+            return Response({"error": "variant_ids harus berupa daftar ID varian."}, status=status.HTTP_400_BAD_REQUEST)
+        repaired, skipped, failed = [], [], []
+        for mismatch in self._run(request).mismatches():
+            if variant_ids is not None and mismatch.variant_id not in variant_ids:
+                continue
+            if not mismatch.needs_repair(source):
+                continue
+            result = repair_mismatch(mismatch, source=source, user=request.user)
+            if result is None:
+                failed.append(mismatch.variant_id)
+            elif result.skipped:
+                # Selisih hasil scan hilang setelah dihitung ulang (mis. transaksi yang baru commit)
+                skipped.append(mismatch.variant_id)
+            else:
+                repaired.append({'variant_id': mismatch.variant_id, 'old_stock': result.old_stock, 'new_stock': result.new_stock})
+        return Response({'repaired': repaired, 'skipped': skipped, 'failed': failed})
+
 # --- FilterSet Kustom untuk Transaksi ---
 
 class TransactionFilter(FilterSet):
@@ -200,10 +252,11 @@ class TransactionFilter(FilterSet):
 
 # --- ViewSet untuk Laporan Histori Transaksi (dengan Ekspor CSV) ---
 
-class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
+class TransactionReportViewSet(SparseFieldsViewMixin, CompactListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint untuk menampilkan laporan histori transaksi (keluar/masuk/penyesuaian).
     Read-only, dengan filter tanggal, tipe, varian, search, ordering, dan ekspor CSV.
+    `?view=compact` mengembalikan baris datar tanpa serializer bersarang.
     """
     serializer_class = TransactionSerializer
     permission_classes = [IsOperator | IsAtasanOperator | IsAdminUser] # Sesuaikan permission jika perlu
@@ -230,6 +283,10 @@ class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
         'user__email',
     ]
     ordering = ['-timestamp'] # Default: transaksi terbaru dulu
+    # ?pagination=cursor: keyset pada (timestamp, id) tanpa COUNT(*) (ordering diabaikan)
+    pagination_class = TransactionLedgerPagination
+    compact_fields = TRANSACTION_COMPACT_FIELDS
+    compact_choices = {'transaction_type': Transaction.Type}
 
     def get_queryset(self):
         """
@@ -238,7 +295,7 @@ class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = Transaction.objects.select_related(
             'variant__base_item_code',
             'user',
-            'inventory_item',
+            'inventory_item__variant', # Dibaca InventoryItem.__str__ (inventory_item_info)
             'related_request',
             'related_spmb',
             'receipt'
@@ -251,6 +308,7 @@ class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Ekspor data laporan transaksi ke format CSV.
         Menerima query parameter filter yang sama dengan list view.
+        Dikirim streaming; tambahkan `?compress=gzip` untuk mengunduh file .csv.gz.
         """
         # Terapkan filter yang sama seperti list view
         queryset = self.filter_queryset(self.get_queryset())
@@ -262,12 +320,6 @@ class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
              queryset = queryset.order_by(*self.ordering)
 
 
-        # Siapkan HttpResponse dengan header CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="laporan_transaksi_{date.today().strftime("%Y%m%d")}.csv"'
-
-        writer = csv.writer(response, delimiter=';')
-
         # Tulis header kolom (sesuaikan dengan field di TransactionSerializer)
         header = [
             'ID Transaksi',
@@ -289,38 +341,36 @@ class TransactionReportViewSet(viewsets.ReadOnlyModelViewSet):
             'No Kuitansi',
             'Catatan',
         ]
-        writer.writerow(header)
-
-        # Tulis data per baris
-        for tx in queryset:
-            variant = tx.variant
-            user = tx.user
-            req = tx.related_request
-            spmb = tx.related_spmb
-            receipt = tx.receipt
-
-            writer.writerow([
-                tx.id,
-                tx.timestamp.strftime('%Y-%m-%d %H:%M:%S') if tx.timestamp else '',
-                getattr(variant, 'full_code', ''),
-                getattr(variant, 'type_name', ''),
-                getattr(variant, 'name', ''),
-                getattr(variant, 'unit_of_measure', ''),
-                tx.quantity,
-                tx.get_transaction_type_display(), # Tampilkan display name
-                getattr(user, 'email', ''),
-                getattr(user, 'get_full_name', lambda: '')(), # Panggil get_full_name jika ada
-                getattr(tx.inventory_item, 'id', ''),
-                getattr(req, 'id', ''),
-                getattr(req, 'request_number', ''),
-                getattr(spmb, 'id', ''),
-                getattr(spmb, 'spmb_number', ''),
-                getattr(receipt, 'id', ''),
-                getattr(receipt, 'receipt_number', ''),
-                tx.notes,
-            ])
-
-        return response
+
+        # Baca sebagai tuple (values_list) agar tidak membuat instance model per baris
+        type_display = dict(Transaction.Type.choices)
+        values = queryset.values_list(
+            'id', 'timestamp', 'variant__full_code', 'variant__type_name', 'variant__name',
+            'variant__unit_of_measure', 'quantity', 'transaction_type', 'user__email',
+            'user__first_name', 'user__last_name', 'inventory_item_id', 'related_request_id',
+            'related_request__request_number', 'related_spmb_id', 'related_spmb__spmb_number',
+            'receipt_id', 'receipt__receipt_number', 'notes'
+        )
+        rows = (
+            [
+                tx_id,
+                timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else '',
+                full_code or '', type_name or '', name or '', unit or '',
+                quantity,
+                type_display.get(tx_type, tx_type), # Tampilkan display name
+                email or '',
+                f"{first_name or ''} {last_name or ''}".strip(),
+                batch_id or '',
+                request_id or '', request_number or '',
+                spmb_id or '', spmb_number or '',
+                receipt_id or '', receipt_number or '',
+                notes,
+            ]
+            for (tx_id, timestamp, full_code, type_name, name, unit, quantity, tx_type, email,
+                 first_name, last_name, batch_id, request_id, request_number, spmb_id, spmb_number,
+                 receipt_id, receipt_number, notes) in values.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_csv_response(export_filename('laporan_transaksi'), header, rows, gzip=wants_gzip(request))
     # --- AKHIR ACTION EKSPOR CSV ---
 
 # --- ViewSet Baru untuk Laporan Slow/Fast Moving ---
@@ -330,19 +380,17 @@ class MovingItemsReportViewSet(viewsets.ReadOnlyModelViewSet):
     API endpoint untuk menampilkan laporan barang slow/fast moving
     berdasarkan jumlah keluar dalam periode tanggal tertentu.
     Membutuhkan query parameter 'start_date' dan 'end_date' (YYYY-MM-DD).
+    Tambahkan `?include_zero=true` agar varian tanpa pengeluaran di periode tersebut
+    (slow moving, total 0) ikut ditampilkan; urutkan dengan `?ordering=total_quantity_issued`.
     """
     serializer_class = MovingItemsReportSerializer
     permission_classes = [IsOperator | IsAtasanOperator | IsAdminUser]
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['total_quantity_issued', 'variant_name', 'full_code']
-    ordering = ['-total_quantity_issued'] # Default: fast-moving
+    ordering = ['-total_quantity_issued', 'full_code'] # Default: fast-moving
 
-    def get_queryset(self):
-        """
-        Menganotasi ProductVariant dengan total kuantitas keluar
-        berdasarkan filter tanggal dari query parameters.
-        """
-        # Ambil dan Validasi Parameter Tanggal
+    def _get_date_range(self):
+        """Ambil dan validasi periode; default 30 hari terakhir s/d hari ini."""
         start_date_str = self.request.query_params.get('start_date', None)
         end_date_str = self.request.query_params.get('end_date', None)
 
@@ -353,72 +401,34 @@ class MovingItemsReportViewSet(viewsets.ReadOnlyModelViewSet):
         else: start_date = parse_date(start_date_str) or (end_date - timedelta(days=30))
 
         if start_date > end_date: start_date = end_date - timedelta(days=30)
+        return start_date, end_date
 
-        print(f"DEBUG: MovingItemsReport - Periode: {start_date} s/d {end_date}")
+    def get_queryset(self):
+        """
+        Menganotasi ProductVariant dengan total kuantitas keluar dalam periode,
+        dijumlahkan dari rekap harian (DailyConsumption) dalam satu query.
+        """
+        start_date, end_date = self._get_date_range()
 
-        # Query Utama
-        # 1. Dapatkan ID varian yang relevan (sama seperti sebelumnya)
-        transactions_in_period = Transaction.objects.filter(
-            transaction_type=Transaction.Type.OUT,
-            timestamp__date__gte=start_date,
-            timestamp__date__lte=end_date
+        # Rentang langsung pada kolom tanggal rekap (bukan fungsi atas timestamp),
+        # sehingga indeks (day, ...) tetap terpakai.
+        consumption_in_period = DailyConsumption.objects.filter(
+            day__gte=start_date, day__lte=end_date
         )
-        variant_issued_quantities = transactions_in_period.values('variant').annotate(
-            total_issued=Coalesce(Sum(Abs('quantity')), 0)
-        ).filter(total_issued__gt=0)
-        variant_ids = [item['variant'] for item in variant_issued_quantities]
-
-        # 2. Ambil objek ProductVariant
-        queryset = ProductVariant.objects.filter(
-            pk__in=variant_ids
-        ).select_related('base_item_code')
-
-        # 3. Tambahkan anotasi total_quantity_issued
-        # --- PERBAIKAN: Gunakan Q object untuk filter ---
-        annotated_queryset = queryset.annotate(
-             total_quantity_issued=Coalesce(Sum(
-                 Abs('transaction__quantity'),
-                 filter=Q(transaction__transaction_type=Transaction.Type.OUT) &
-                        Q(transaction__timestamp__date__gte=start_date) &
-                        Q(transaction__timestamp__date__lte=end_date)
-             ), 0)
-        )
-        # --- AKHIR PERBAIKAN ---
+        issued_per_variant = consumption_in_period.filter(
+            variant=OuterRef('pk')
+        ).order_by().values('variant').annotate(total=Sum('quantity_out')).values('total')
 
-        return annotated_queryset
-
-    # Override list lagi jika perlu memasukkan nilai dari issued_map secara manual
-    # (Mirip dengan StockValueFIFOReportViewSet, tapi mungkin tidak perlu jika anotasi cukup akurat)
-    # def list(self, request, *args, **kwargs):
-    #     queryset = self.filter_queryset(self.get_queryset())
-    #     page = self.paginate_queryset(queryset)
-    #     data_to_serialize = page if page is not None else queryset
-    #
-    #     # Dapatkan mapping ID varian ke jumlah keluar (seperti di get_queryset)
-    #     start_date, end_date = self._get_date_range(request) # Buat helper method jika perlu
-    #     transactions_in_period = Transaction.objects.filter(...)
-    #     variant_issued_quantities = transactions_in_period.values(...).annotate(...)
-    #     issued_map = {item['variant']: item['total_issued'] for item in variant_issued_quantities}
-    #
-    #     serializer = self.get_serializer(data_to_serialize, many=True)
-    #     final_data = serializer.data
-    #
-    #     # Masukkan nilai dari issued_map
-    #     for item_data in final_data:
-    #         variant_id = item_data.get('id') # Asumsi serializer punya 'id'
-    #         item_data['total_quantity_issued'] = issued_map.get(variant_id, 0)
-    #
-    #     if page is not None:
-    #          return self.get_paginated_response(final_data)
-    #     return Response(final_data)
-    #
-    # def _get_date_range(self, request):
-    #      # Helper untuk mengambil dan memvalidasi tanggal
-    #      # ... (logika ambil start_date, end_date dari query_params) ...
-    #      return start_date, end_date
+        queryset = ProductVariant.objects.select_related('base_item_code').annotate(
+            total_quantity_issued=Coalesce(Subquery(issued_per_variant), 0),
+            variant_name=F('name'),
+        )
+        if self.request.query_params.get('include_zero') != 'true':
+            queryset = queryset.filter(pk__in=consumption_in_period.values('variant'))
+        return queryset
 
 # ---View Set Laporan Stok Minimum ---
-class LowStockAlertViewSet(viewsets.ReadOnlyModelViewSet):
+class LowStockAlertViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint untuk menampilkan daftar barang yang stoknya
     sama dengan atau di bawah batas minimum (low stock alert).
@@ -431,20 +441,14 @@ class LowStockAlertViewSet(viewsets.ReadOnlyModelViewSet):
     # filterset_fields = { ... }
     # search_fields = [ ... ]
     # ordering_fields = [ ... ]
-    ordering = ['variant__full_code'] # Default ordering
+    ordering = ['full_code'] # Default ordering
 
     def get_queryset(self):
         """
-        Mengambil queryset Stock dan memfilternya untuk stok minimum.
+        Mengambil snapshot stok yang berstatus stok minimum.
         """
-        # Ambil data Stock dan relasinya
-        queryset = Stock.objects.select_related(
-            'variant__base_item_code'
-        ).filter(
-            # Filter utama: total kuantitas <= ambang batas DAN ambang batas tidak null
-            low_stock_threshold__isnull=False, # Pastikan threshold ada
-            total_quantity__lte=F('low_stock_threshold') # Bandingkan field dengan field
-        ).order_by('variant__full_code') # Urutkan
+        # Snapshot stok sudah menyimpan status stok rendah (threshold ada DAN total <= threshold)
+        queryset = StockSnapshot.objects.filter(is_low_stock=True).order_by('full_code') # Urutkan
 
         # Anda bisa tambahkan filter lain di sini jika perlu
         # Misalnya, hanya tampilkan yang stoknya > 0 tapi di bawah threshold
@@ -454,10 +458,11 @@ class LowStockAlertViewSet(viewsets.ReadOnlyModelViewSet):
 
 # --- ViewSet Laporan Nilai Stok FIFO ---
 
-class StockValueFIFOReportViewSet(viewsets.ReadOnlyModelViewSet):
+class StockValueFIFOReportViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint untuk menampilkan laporan nilai stok menggunakan metode FIFO.
-    Read-only. Nilai FIFO dihitung saat request. Termasuk ekspor CSV.
+    Read-only. Nilai FIFO dibaca dari ledger StockValuation; dengan `?valuation=live`
+    nilai dihitung langsung di database (view StockValuationLive). Termasuk ekspor CSV.
     """
     serializer_class = StockValueFIFOReportSerializer
     permission_classes = [IsOperator | IsAtasanOperator | IsAdminUser]
@@ -469,88 +474,33 @@ class StockValueFIFOReportViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """
-        Mengambil queryset Stock dan prefetch batch InventoryItem yang relevan.
+        Mengambil queryset Stock beserta nilai FIFO (satu join, tanpa memuat batch).
         """
-        inventory_items_prefetch = Prefetch(
-            'variant__inventory_items',
-            queryset=InventoryItem.objects.filter(quantity__gt=0).order_by('entry_date', 'id'),
-            to_attr='fifo_batches'
-        )
+        if self.request.query_params.get('valuation') == 'live':
+            value_source = 'variant__fifo_valuation_live__total_value'
+        else:
+            value_source = 'variant__fifo_valuation__total_value'
         queryset = Stock.objects.filter(total_quantity__gt=0).select_related(
             'variant__base_item_code'
-        ).prefetch_related(
-            inventory_items_prefetch
+        ).annotate(
+            fifo_total_value=Coalesce(
+                F(value_source), Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=19, decimal_places=2)
+            )
         ).order_by('variant__full_code')
         return queryset
 
-    def _calculate_fifo_value(self, stock_item):
-        """Helper method untuk menghitung nilai FIFO."""
-        total_quantity_on_hand = stock_item.total_quantity
-        fifo_total_value = Decimal('0.00')
-        quantity_to_value = total_quantity_on_hand
-        batches = getattr(stock_item.variant, 'fifo_batches', [])
-
-        for batch in batches:
-            if quantity_to_value <= 0: break
-            try:
-                purchase_price = batch.purchase_price or Decimal('0.00')
-                if not isinstance(purchase_price, Decimal): purchase_price = Decimal(purchase_price)
-            except (TypeError, ValueError, InvalidOperation) as e_price:
-                 purchase_price = Decimal('0.00')
-                 print(f"Warning (FIFO Calc): Invalid purchase price '{batch.purchase_price}' for batch ID {batch.id}. Using 0.")
-
-            qty_from_this_batch = min(Decimal(quantity_to_value), Decimal(batch.quantity))
-            fifo_total_value += (qty_from_this_batch * purchase_price)
-            quantity_to_value -= qty_from_this_batch
-
-        if quantity_to_value > 0:
-             print(f"Warning (FIFO Calc): Could not value remaining {quantity_to_value} units for variant {getattr(stock_item.variant, 'name', 'N/A')}.")
-
-        return fifo_total_value
-
-    def list(self, request, *args, **kwargs):
-        """
-        Override method list untuk menghitung nilai FIFO per item.
-        """
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        data_to_serialize = page if page is not None else queryset
-
-        results_with_fifo_value = []
-        for stock_item in data_to_serialize:
-            # Hitung nilai FIFO menggunakan helper method
-            stock_item.calculated_fifo_value = self._calculate_fifo_value(stock_item)
-            results_with_fifo_value.append(stock_item)
-
-        serializer = self.get_serializer(results_with_fifo_value, many=True)
-        final_data = serializer.data
-
-        # Masukkan nilai FIFO ke hasil serialisasi
-        for i, item_data in enumerate(final_data):
-             if i < len(results_with_fifo_value):
-                 item_data['fifo_total_value'] = results_with_fifo_value[i].calculated_fifo_value
-
-        if page is not None:
-             return self.get_paginated_response(final_data)
-        return Response(final_data)
-
     # --- ACTION BARU UNTUK EKSPOR CSV ---
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_fifo_value_csv(self, request):
         """
         Ekspor data laporan nilai stok FIFO ke format CSV.
         Menerima query parameter filter yang sama dengan list view.
+        Dikirim streaming; tambahkan `?compress=gzip` untuk mengunduh file .csv.gz.
         """
         # Terapkan filter yang sama seperti list view
         queryset = self.filter_queryset(self.get_queryset())
 
-        # Siapkan HttpResponse dengan header CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="laporan_nilai_stok_fifo_{date.today().strftime("%Y%m%d")}.csv"'
-
-        # Buat CSV writer
-        writer = csv.writer(response, delimiter=';')
-
         # Tulis header kolom (sesuaikan dengan field di StockValueFIFOReportSerializer)
         header = [
             'Kode Lengkap Varian',
@@ -561,82 +511,74 @@ class StockValueFIFOReportViewSet(viewsets.ReadOnlyModelViewSet):
             'Jumlah Stok Saat Ini',
             'Total Nilai (FIFO)',
         ]
-        writer.writerow(header)
-
-        # Tulis data per baris, hitung FIFO untuk setiap item
-        for stock_item in queryset:
-            # Hitung nilai FIFO untuk item ini
-            fifo_value = self._calculate_fifo_value(stock_item)
-
-            # Ambil data terkait dengan aman
-            variant = stock_item.variant
-            base_item = getattr(variant, 'base_item_code', None)
-
-            writer.writerow([
-                getattr(variant, 'full_code', ''),
-                getattr(variant, 'type_name', ''),
-                getattr(variant, 'name', ''),
-                getattr(base_item, 'base_description', '') if base_item else '',
-                getattr(variant, 'unit_of_measure', ''),
-                stock_item.total_quantity,
-                fifo_value, # Masukkan nilai FIFO yang sudah dihitung
-            ])
-
-        return response
+
+        # Nilai FIFO sudah dianotasi dari ledger
+        values = queryset.values_list(
+            'variant__full_code', 'variant__type_name', 'variant__name',
+            'variant__base_item_code__base_description', 'variant__unit_of_measure',
+            'total_quantity', 'fifo_total_value'
+        )
+        rows = (
+            [value if value is not None else '' for value in row]
+            for row in values.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_csv_response(export_filename('laporan_nilai_stok_fifo'), header, rows, gzip=wants_gzip(request))
     # --- AKHIR ACTION EKSPOR CSV ---
 
 # --- ViewSet Laporan Stok Terkini ---
 
-class CurrentStockReportViewSet(viewsets.ReadOnlyModelViewSet):
+class CurrentStockFilter(FilterSet):
+    # Nama parameter sama dengan versi lama (path relasi Stock -> varian -> hierarki kode),
+    # tetapi semuanya membaca kolom StockSnapshot yang terindeks.
+    variant__type_name = CharFilter(field_name='type_name', lookup_expr='exact')
+    variant__type_name__icontains = CharFilter(field_name='type_name', lookup_expr='icontains')
+    variant__base_item_code__sub_kelompok__kelompok__bidang__golongan__code = CharFilter(field_name='golongan_code')
+    variant__base_item_code__sub_kelompok__kelompok__bidang__code = CharFilter(field_name='bidang_code')
+    variant__base_item_code__sub_kelompok__kelompok__code = CharFilter(field_name='kelompok_code')
+    variant__base_item_code__sub_kelompok__code = CharFilter(field_name='sub_kelompok_code')
+    variant__base_item_code__account_code = CharFilter(field_name='account_code')
+    ordering = OrderingFilter(fields=(
+        ('full_code', 'variant__full_code'),
+        ('type_name', 'variant__type_name'),
+        ('variant_name', 'variant__name'),
+        ('total_quantity', 'total_quantity'),
+        ('last_updated', 'last_updated'),
+    ))
+
+    class Meta:
+        model = StockSnapshot
+        fields = []
+
+class CurrentStockReportViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint untuk menampilkan laporan stok terkini.
     Read-only, dengan kemampuan filter, pencarian, dan ekspor CSV.
+    Semua filter, pencarian dan urutan membaca satu tabel (StockSnapshot).
     """
     serializer_class = CurrentStockReportSerializer
     permission_classes = [IsOperator | IsAtasanOperator | IsAdminUser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = {
-        'variant__type_name': ['exact', 'icontains'],
-        'variant__base_item_code__sub_kelompok__kelompok__bidang__golongan__code': ['exact'],
-        'variant__base_item_code__sub_kelompok__kelompok__bidang__code': ['exact'],
-        'variant__base_item_code__sub_kelompok__kelompok__code': ['exact'],
-        'variant__base_item_code__sub_kelompok__code': ['exact'],
-        'variant__base_item_code__account_code': ['exact'],
-        # 'total_quantity': ['lte', 'gte'], # Bisa ditambahkan jika perlu
-    }
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_class = CurrentStockFilter # Termasuk parameter 'ordering'
     search_fields = [
-        'variant__full_code',
-        'variant__type_name',
-        'variant__name',
-        'variant__base_item_code__base_description',
-        'variant__base_item_code__account_code',
-    ]
-    ordering_fields = [
-        'variant__full_code',
-        'variant__type_name',
-        'variant__name',
-        'total_quantity',
-        'last_updated',
+        'full_code',
+        'type_name',
+        'variant_name',
+        'base_item_description',
+        'account_code',
     ]
-    ordering = ['variant__full_code']
 
     def get_queryset(self):
         """
-        Mengambil queryset dasar untuk laporan stok.
+        Mengambil queryset dasar untuk laporan stok (urutan default: kode lengkap varian).
         """
-        queryset = Stock.objects.select_related(
-            'variant__base_item_code' # Ambil data dasar varian
-        ).all() # Ambil semua stok, filter low/out of stock bisa di query param
+        queryset = StockSnapshot.objects.order_by('full_code')
 
         # Implementasi filter tambahan jika diperlukan
         query_params = self.request.query_params
         if query_params.get('low_stock_only') == 'true':
-             queryset = queryset.filter(
-                 low_stock_threshold__isnull=False,
-                 total_quantity__lte=F('low_stock_threshold')
-             )
+             queryset = queryset.filter(is_low_stock=True)
         elif query_params.get('out_of_stock_only') == 'true':
-             queryset = queryset.filter(total_quantity__lte=0)
+             queryset = queryset.filter(is_out_of_stock=True)
 
         return queryset
 
@@ -646,18 +588,11 @@ class CurrentStockReportViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Ekspor data laporan stok terkini ke format CSV.
         Menerima query parameter filter yang sama dengan list view.
+        Dikirim streaming; tambahkan `?compress=gzip` untuk mengunduh file .csv.gz.
         """
         # Terapkan filter yang sama seperti list view
         queryset = self.filter_queryset(self.get_queryset())
 
-        # Siapkan HttpResponse dengan header CSV
-        response = HttpResponse(content_type='text/csv')
-        # Beri nama file download
-        response['Content-Disposition'] = f'attachment; filename="laporan_stok_terkini_{date.today().strftime("%Y%m%d")}.csv"'
-
-        # Buat CSV writer
-        writer = csv.writer(response, delimiter=';') # Gunakan titik koma jika preferensi lokal
-
         # Tulis header kolom (sesuaikan dengan field di CurrentStockReportSerializer)
         header = [
             'Kode Lengkap Varian',
@@ -672,34 +607,26 @@ class CurrentStockReportViewSet(viewsets.ReadOnlyModelViewSet):
             # 'Status Stok Habis',
             # 'Kode Akun',
         ]
-        writer.writerow(header)
-
-        # Tulis data per baris
-        for stock_item in queryset:
-            # Ambil data terkait dengan aman
-            variant = stock_item.variant
-            base_item = getattr(variant, 'base_item_code', None)
-
-            writer.writerow([
-                getattr(variant, 'full_code', ''),
-                getattr(variant, 'type_name', ''),
-                getattr(variant, 'name', ''),
-                getattr(base_item, 'base_description', '') if base_item else '',
-                getattr(variant, 'unit_of_measure', ''),
-                stock_item.total_quantity,
-                # stock_item.low_stock_threshold,
-                stock_item.last_updated.strftime('%Y-%m-%d %H:%M:%S') if stock_item.last_updated else '',
-                # stock_item.is_low_stock,
-                # stock_item.is_out_of_stock,
-                # getattr(base_item , 'account_code', '') if base_item else '',
-            ])
-
-        return response
+
+        values = queryset.values_list(
+            'full_code', 'type_name', 'variant_name', 'base_item_description', 'unit_of_measure',
+            'total_quantity', 'last_updated'
+        )
+        rows = (
+            [
+                full_code or '', type_name or '', name or '', base_description or '', unit or '',
+                total_quantity,
+                last_updated.strftime('%Y-%m-%d %H:%M:%S') if last_updated else '',
+            ]
+            for (full_code, type_name, name, base_description, unit, total_quantity, last_updated)
+            in values.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_csv_response(export_filename('laporan_stok_terkini'), header, rows, gzip=wants_gzip(request))
     # --- AKHIR ACTION EKSPOR CSV ---
 
 # --- Views Produk & Stok ---
 
-class ProductVariantViewSet(viewsets.ModelViewSet):
+class ProductVariantViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """API endpoint untuk mengelola Varian Produk Spesifik."""
     # Gunakan select_related untuk mengambil data terkait
     queryset = ProductVariant.objects.select_related(
@@ -708,21 +635,17 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
     serializer_class = ProductVariantSerializer
     permission_classes = [IsAdminUser | IsOperatorOrReadOnly]
 
-class StockViewSet(viewsets.ReadOnlyModelViewSet):
-    """Menampilkan daftar stok barang."""
+class StockViewSet(SparseFieldsViewMixin, CompactListMixin, viewsets.ReadOnlyModelViewSet):
+    """Menampilkan daftar stok barang. `?view=compact` untuk baris datar tanpa varian bersarang."""
     # Sesuaikan select_related dan ordering
     queryset = Stock.objects.select_related(
         'variant__base_item_code' # Ambil kode barang dasar terkait varian
         ).order_by('variant__full_code') # Urutkan berdasarkan kode lengkap varian
     serializer_class = StockSerializer
     permission_classes = [permissions.IsAuthenticated]
+    compact_fields = STOCK_COMPACT_FIELDS
 
-    def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()
-        return queryset
-
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class InventoryItemViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """Endpoint untuk mengelola batch inventaris (FIFO)."""
     # Sesuaikan select_related
     queryset = InventoryItem.objects.select_related(
@@ -740,28 +663,24 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         # Untuk list, retrieve, update, destroy, gunakan serializer standar
         return InventoryItemSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         # Set added_by otomatis saat input manual via API
         inventory_item = serializer.save(added_by=self.request.user)
-        # Update Stock Level dan buat Transaction log
-        try:
-            with transaction.atomic():
-                stock, created = Stock.objects.select_for_update().get_or_create(variant=inventory_item.variant)
-                stock.total_quantity += inventory_item.quantity
-                stock.save()
-                Transaction.objects.create(
-                    variant=inventory_item.variant,
-                    inventory_item=inventory_item,
-                    quantity=inventory_item.quantity,
-                    transaction_type=Transaction.Type.IN,
-                    user=self.request.user,
-                    receipt=inventory_item.receipt, # Catat receipt jika ada
-                    notes=f"Penerimaan barang baru batch #{inventory_item.id} (Manual/API Create)"
-                )
-        except Exception as e:
-             print(f"Error updating stock for InventoryItem {inventory_item.id}: {e}")
-             # Pertimbangkan mekanisme notifikasi atau logging error yang lebih baik
+        # Update Stock Level dan buat Transaction log; error apa pun membatalkan batch juga
+        apply_stock_delta(inventory_item.variant_id, inventory_item.quantity)
+        Transaction.objects.create(
+            variant=inventory_item.variant,
+            inventory_item=inventory_item,
+            quantity=inventory_item.quantity,
+            transaction_type=Transaction.Type.IN,
+            user=self.request.user,
+            receipt=inventory_item.receipt, # Catat receipt jika ada
+            notes=f"Penerimaan barang baru batch #{inventory_item.id} (Manual/API Create)"
+        )
+        refresh_valuations([inventory_item.variant_id])
 
+    @transaction.atomic
     def perform_update(self, serializer):
         # Logika update batch inventaris (penyesuaian)
         original_item = self.get_object()
@@ -770,234 +689,153 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         quantity_diff = updated_item.quantity - original_quantity
         if quantity_diff != 0:
             try:
-                with transaction.atomic():
-                    stock = Stock.objects.select_for_update().get(variant=updated_item.variant)
-                    stock.total_quantity += quantity_diff
-                    stock.save()
-                    Transaction.objects.create(
-                        variant=updated_item.variant,
-                        inventory_item=updated_item,
-                        quantity=quantity_diff,
-                        transaction_type=Transaction.Type.ADJUSTMENT,
-                        user=self.request.user,
-                        receipt=updated_item.receipt,
-                        notes=f"Penyesuaian manual batch #{updated_item.id}"
-                    )
-            except Stock.DoesNotExist:
-                 print(f"Error: Stock level not found for variant {updated_item.variant.id} during InventoryItem update.")
-            except Exception as e:
-                 print(f"Error updating stock during InventoryItem update {updated_item.id}: {e}")
+                apply_stock_delta(updated_item.variant_id, quantity_diff)
+            except NegativeStockError as e:
+                 # Batch dikurangi melebihi stok sistem: batalkan perubahan batch juga
+                 raise serializers.ValidationError(str(e))
+            Transaction.objects.create(
+                variant=updated_item.variant,
+                inventory_item=updated_item,
+                quantity=quantity_diff,
+                transaction_type=Transaction.Type.ADJUSTMENT,
+                user=self.request.user,
+                receipt=updated_item.receipt,
+                notes=f"Penyesuaian manual batch #{updated_item.id}"
+            )
+        # Harga beli atau jumlah batch bisa berubah; nilai FIFO varian lama & baru dihitung ulang
+        refresh_valuations({original_item.variant_id, updated_item.variant_id})
 
+    @transaction.atomic
     def perform_destroy(self, instance):
-        # Logika saat menghapus batch inventaris
+        # Logika saat menghapus batch inventaris; error apa pun membatalkan penghapusan (tidak 204)
         variant = instance.variant
         receipt_ref = instance.receipt
         instance_id = instance.id
         quantity_to_deduct = instance.quantity
-        try:
-            with transaction.atomic():
-                instance.delete()
-                stock = Stock.objects.select_for_update().get(variant=variant)
-                stock.total_quantity -= quantity_to_deduct
-                if stock.total_quantity < 0:
-                    print(f"Warning: Stock became negative for {variant} after deleting InventoryItem {instance_id}. Setting to 0.")
-                    stock.total_quantity = 0
-                stock.save()
-                Transaction.objects.create(
-                   variant=variant,
-                   quantity=-quantity_to_deduct,
-                   transaction_type=Transaction.Type.ADJUSTMENT,
-                   user=self.request.user,
-                   receipt=receipt_ref,
-                   notes=f"Penghapusan manual batch #{instance_id}"
-                )
-        except Stock.DoesNotExist:
-             print(f"Error: Stock level not found for variant {variant.id} during InventoryItem delete.")
-        except Exception as e:
-             print(f"Error updating stock during InventoryItem delete {instance_id}: {e}")
+        instance.delete()
+        change = apply_stock_delta(variant.id, -quantity_to_deduct, clamp=True)
+        if change.applied != -quantity_to_deduct:
+            logger.warning(
+                "Stock would become negative for %s after deleting InventoryItem %s. Set to 0 (applied %s).",
+                variant, instance_id, change.applied
+            )
+        Transaction.objects.create(
+           variant=variant,
+           quantity=change.applied,
+           transaction_type=Transaction.Type.ADJUSTMENT,
+           user=self.request.user,
+           receipt=receipt_ref,
+           notes=f"Penghapusan manual batch #{instance_id}"
+        )
+        refresh_valuations([variant.id])
 
 
     # --- ACTION UPLOAD RESI (LOGIKA DISESUAIKAN DENGAN PENDEKATAN C) ---
     @action(detail=False, methods=['post'], permission_classes=[IsOperator], serializer_class=ReceiptUploadSerializer)
-    @transaction.atomic
     def upload_receipt(self, request):
         """
         Operator mengunggah file Excel/CSV berisi detail pembelian barang masuk.
         Mencari/Membuat ProductVariant, Membuat Receipt, InventoryItem, update Stock, Transaction log.
+        File dibaca streaming dua kali: validasi penuh dulu (tanpa menulis), lalu ingest set-based
+        per chunk di dalam satu transaksi (lihat receipt_import.ingest_receipt_rows); memori tidak
+        bergantung pada ukuran file.
         Format file: Kode_Barang_Dasar, Jenis_Barang, Nama_Spesifik, Satuan, Jumlah, Harga_Beli_Satuan, Nomor_Kuitansi, Tanggal_Kuitansi, Nama_Supplier?, Tanggal_Kadaluarsa?
+        Query parameter 'async=true': file disimpan sebagai job import dan langsung dikembalikan (202);
+        progres dipantau lewat endpoint receipt-import-jobs/{id}/.
         """
         upload_serializer = ReceiptUploadSerializer(data=request.data)
         if not upload_serializer.is_valid():
             return Response(upload_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         file = upload_serializer.validated_data['file']
-        processed_count = 0
-        created_variants = 0
-        error_rows = []
-        receipt_cache = {}
+
+        if request.query_params.get('async') == 'true':
+            job = create_receipt_import_job(file, request.user)
+            return Response(ReceiptImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
         try:
-            # Baca file Excel/CSV
-            try: df = pd.read_excel(file, engine='openpyxl')
-            except Exception:
-                try:
-                    file.seek(0)
-                    df = pd.read_csv(file, sep=';') # Sesuaikan separator jika perlu
-                except Exception as e_csv: raise serializers.ValidationError(f"Gagal membaca file. Pastikan format Excel (.xlsx) atau CSV (separator ';') valid. Detail: {e_csv}")
-
-            # Validasi Nama Kolom BARU
-            required_columns = ['Kode_Barang_Dasar', 'Jenis_Barang', 'Nama_Spesifik', 'Satuan', 'Jumlah', 'Harga_Beli_Satuan', 'Nomor_Kuitansi', 'Tanggal_Kuitansi']
-            missing_cols = [col for col in required_columns if col not in df.columns]
-            if missing_cols: raise serializers.ValidationError(f"Kolom berikut tidak ditemukan di file: {', '.join(missing_cols)}")
-
-            # Loop per baris
-            for index, row in df.iterrows():
-                row_num = index + 2
-                item_code_barang_obj = None # Reset per baris
-                variant_obj = None
-                receipt = None
-                inventory_item = None
-                stock = None
-                base_code = 'N/A' # Default jika parsing gagal
-
-                try:
-                    # Ambil data dasar (sesuaikan nama kolom dgn format baru)
-                    base_code = str(row['Kode_Barang_Dasar']).strip()
-                    item_type_name = str(row['Jenis_Barang']).strip()
-                    variant_spec_name = str(row['Nama_Spesifik']).strip()
-                    unit = str(row['Satuan']).strip()
-                    quantity = int(row['Jumlah'])
-                    price_str = str(row['Harga_Beli_Satuan']).strip()
-                    receipt_num = str(row['Nomor_Kuitansi']).strip()
-                    receipt_date = pd.to_datetime(row['Tanggal_Kuitansi']).date()
-                    supplier = str(row.get('Nama_Supplier', '') or '').strip()
-                    expiry_str = str(row.get('Tanggal_Kadaluarsa', '') or '').strip()
-
-                    # Validasi dasar
-                    if not all([base_code, item_type_name, variant_spec_name, unit, quantity, price_str, receipt_num, receipt_date]):
-                         raise ValueError("Kolom wajib (Kode Dasar, Jenis, Nama Spesifik, Satuan, Jumlah, Harga, No Kuitansi, Tgl Kuitansi) tidak boleh kosong.")
-                    if quantity <= 0: raise ValueError("Jumlah harus positif.")
-                    try: purchase_price = float(price_str.replace(',', '.'))
-                    except ValueError: raise ValueError(f"Format Harga_Beli_Satuan tidak valid: '{price_str}'")
-                    if purchase_price < 0: raise ValueError("Harga beli tidak boleh negatif.")
-
-                    expiry_date = None
-                    if expiry_str and expiry_str.lower() != 'nan': # Handle 'nan' dari pandas
-                        try: expiry_date = pd.to_datetime(expiry_str).date()
-                        except ValueError: print(f"Warning baris {row_num}: Format Tanggal_Kadaluarsa '{expiry_str}' tidak valid, akan diabaikan.")
-
-                    # 1. Cari ItemCodeBarang berdasarkan Kode Barang Dasar
-                    try:
-                        # Cari langsung menggunakan field full_base_code
-                        item_code_barang_obj = ItemCodeBarang.objects.get(full_base_code=base_code)
-                    except ItemCodeBarang.DoesNotExist:
-                         # Pesan error ini yang akan ditangkap oleh except Exception as e_row
-                         raise ValueError(f"Kode Barang Dasar '{base_code}' tidak ditemukan di database.")
-
-
-                    # 2. Cari atau Buat ProductVariant Spesifik (LOGIKA BARU)
-                    variant_obj, variant_created = ProductVariant.objects.get_or_create(
-                        base_item_code=item_code_barang_obj,
-                        type_name__iexact=item_type_name,    # Cari berdasarkan jenis (case-insensitive)
-                        name__iexact=variant_spec_name, # Cari berdasarkan nama spesifik (case-insensitive)
-                        defaults={ # Hanya diisi saat create varian baru
-                            'type_name': item_type_name,     # Simpan jenis
-                            'name': variant_spec_name,       # Simpan nama spesifik
-                            'unit_of_measure': unit
-                            # specific_code dan full_code akan di-generate oleh model save()
-                        }
-                    )
-                    if variant_created:
-                         created_variants += 1
-                         print(f"Info baris {row_num}: Membuat ProductVariant baru: {variant_obj.type_name} - {variant_obj.name} dengan kode {variant_obj.full_code}")
-                    elif variant_obj.unit_of_measure.lower() != unit.lower():
-                         print(f"Warning baris {row_num}: Satuan '{unit}' berbeda dgn Varian '{variant_obj.name}' ({variant_obj.unit_of_measure}). Menggunakan satuan yg sudah ada.")
-
-
-                    # 3. Cari atau Buat Receipt (sama seperti sebelumnya)
-                    receipt_key = (receipt_num, receipt_date)
-                    receipt = receipt_cache.get(receipt_key)
-                    if not receipt:
-                        try:
-                            receipt, receipt_created = Receipt.objects.get_or_create(
-                                receipt_number=receipt_num,
-                                receipt_date=receipt_date,
-                                defaults={'supplier_name': supplier, 'uploaded_by': request.user}
-                            )
-                            receipt_cache[receipt_key] = receipt
-                        except IntegrityError:
-                             raise ValueError(f"Nomor Kuitansi '{receipt_num}' sudah ada dengan tanggal atau data lain yang berbeda.")
-
-
-                    # 4. Buat InventoryItem (sama seperti sebelumnya)
-                    inventory_item = InventoryItem(
-                         variant=variant_obj, # Gunakan variant yg ditemukan/dibuat
-                         receipt=receipt,
-                         quantity=quantity,
-                         purchase_price=purchase_price,
-                         expiry_date=expiry_date,
-                         added_by=request.user,
-                         entry_date=timezone.now()
-                    )
-                    inventory_item.save() # Simpan item dulu
-
-                    # 5. Update Stock Level (sama seperti sebelumnya)
-                    stock, stock_created = Stock.objects.select_for_update().get_or_create(variant=variant_obj)
-                    stock.total_quantity += quantity
-                    stock.save()
-
-                    # 6. Buat Transaction Log (sama seperti sebelumnya)
-                    Transaction.objects.create(
-                        variant=variant_obj,
-                        inventory_item=inventory_item,
-                        quantity=quantity,
-                        transaction_type=Transaction.Type.IN,
-                        user=request.user,
-                        receipt=receipt, # Tambahkan referensi receipt
-                        notes=f"Penerimaan barang via upload kuitansi #{receipt_num}. Item Batch #{inventory_item.id}"
-                    )
-
-                    processed_count += 1
-
-                except Exception as e_row:
-                    # Catat error per baris
-                    error_rows.append({
-                        "row": row_num,
-                        "error": f"{type(e_row).__name__}: {str(e_row)}", # Sertakan tipe error
-                        "data": row.to_dict()
-                    })
-                    # Print traceback untuk debug di server jika diperlukan
-                    # print(f"Error processing row {row_num}:")
-                    # traceback.print_exc()
-
-
-            # Setelah loop selesai
-            if error_rows:
-                 # Jika ada error, batalkan transaksi (otomatis karena @transaction.atomic)
-                 # dan kembalikan pesan error
+            # Tahap 1: baca file Excel/CSV secara streaming per chunk dan validasi seluruhnya
+            # (pandas + pengecekan kode dasar/kuitansi) SEBELUM transaksi database dimulai
+            try:
+                scan = scan_receipt_file(file)
+            except ValueError as e_file: raise serializers.ValidationError(str(e_file))
+            if scan["error_count"]:
                  raise serializers.ValidationError({
-                     "message": f"Gagal memproses {len(error_rows)} baris dari file.",
-                     "errors": error_rows
+                     "message": f"Gagal memproses {scan['error_count']} baris dari file (ditampilkan maksimal {MAX_REPORTED_ERRORS}).",
+                     "errors": scan["errors"]
                  })
+            for warning in scan["warnings"]:
+                logger.warning("Receipt upload: %s", warning)
+
+            # Tahap 2: baca ulang per chunk dan ingest set-based dalam SATU transaksi,
+            # sehingga memori tetap sebesar satu chunk dan file tetap all-or-nothing
+            result = {"processed": 0, "created_variants": 0}
+            error_rows = []
+            with transaction.atomic():
+                for records, _, _ in iter_receipt_chunks(file):
+                    chunk_result = ingest_receipt_rows(records, request.user)
+                    error_rows = chunk_result["errors"]
+                    if error_rows:
+                         # Batalkan seluruh transaksi (termasuk chunk sebelumnya) dan kembalikan pesan error
+                         transaction.set_rollback(True)
+                         raise serializers.ValidationError({
+                             "message": f"Gagal memproses {len(error_rows)} baris dari file.",
+                             "errors": error_rows
+                         })
+                    result["processed"] += chunk_result["processed"]
+                    result["created_variants"] += chunk_result["created_variants"]
+                    for warning in chunk_result["warnings"]:
+                        logger.warning("Receipt upload: %s", warning)
 
         except serializers.ValidationError as e_val:
              # Tangkap validation error yg di-raise manual (misal kolom hilang)
              return Response({"error": "Validasi file gagal.", "details": e_val.detail}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e_file:
              # Tangkap error pembacaan file atau error tak terduga lainnya
-             print(f"Unexpected error during file processing:") # Log error ke server
-             traceback.print_exc()
+             logger.exception("Unexpected error during receipt file processing") # Log error + traceback ke server
              return Response({"error": f"Terjadi kesalahan internal saat memproses file. Hubungi administrator."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Respons sukses
         return Response({
-            "message": f"Berhasil memproses {processed_count} item barang dari file.",
-            "processed_items": processed_count,
-            "new_variants_created": created_variants,
+            "message": f"Berhasil memproses {result['processed']} item barang dari file.",
+            "processed_items": result["processed"],
+            "new_variants_created": result["created_variants"],
             "failed_rows": len(error_rows)
         }, status=status.HTTP_201_CREATED)
     # --- AKHIR ACTION UPLOAD RESI ---
 
+# --- Views Job Import Kuitansi (Asinkron) ---
+
+class ReceiptImportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Endpoint job import kuitansi. POST menyimpan file dan membuat job (202),
+    GET list/detail dipakai frontend untuk polling progres dan error per baris.
+    """
+    queryset = ReceiptImportJob.objects.select_related('created_by').all()
+    serializer_class = ReceiptImportJobSerializer
+    permission_classes = [IsOperator]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_admin: return queryset
+        return queryset.filter(created_by=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        upload_serializer = ReceiptUploadSerializer(data=request.data)
+        if not upload_serializer.is_valid():
+            return Response(upload_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        job = create_receipt_import_job(upload_serializer.validated_data['file'], request.user)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """Jalankan ulang job FAILED; baris yang sudah tersimpan (last_committed_row) dilewati."""
+        job = self.get_object()
+        if not retry_receipt_import_job(job.pk):
+            return Response({"error": "Hanya job berstatus FAILED yang bisa di-retry."}, status=status.HTTP_400_BAD_REQUEST)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 # --- Views Permintaan Barang (Workflow) ---
 
 # class RequestViewSet(viewsets.ModelViewSet):
@@ -1084,6 +922,7 @@ class RequestViewSet(viewsets.ModelViewSet):
         elif self.action in ['list', 'retrieve']: self.permission_classes = [permissions.IsAuthenticated]
         elif self.action in ['update', 'partial_update']: self.permission_classes = [permissions.IsAuthenticated]
         elif self.action == 'destroy': self.permission_classes = [IsOwnerOfRequest & permissions.SAFE_METHODS | IsAdminUser]
+        elif self.action == 'bulk_process': self.permission_classes = [IsOperator]
         # Permissions untuk custom actions diatur di decorator @action
         # Jika tidak diatur di decorator, permission default viewset akan berlaku
         # atau Anda bisa tambahkan kondisi elif untuk action spesifik di sini
@@ -1107,7 +946,6 @@ class RequestViewSet(viewsets.ModelViewSet):
     # --- Definisi _add_log (Tetap sama) ---
     def _add_log(self, request_obj, user, action, comment=None, status_from=None, status_to=None):
          """Helper untuk mencatat log."""
-         print(f"--- _add_log DIPANGGIL: action={action}, user={user} ---") # DEBUG PEMANGGILAN
          try:
              RequestLog.objects.create(
                  request=request_obj,
@@ -1117,10 +955,9 @@ class RequestViewSet(viewsets.ModelViewSet):
                  status_to=status_to or request_obj.status,
                  comment=comment
              )
-             print(f"--- _add_log SUKSES: action={action} ---") # DEBUG SUKSES
-         except Exception as e:
-             print(f"--- _add_log ERROR: Gagal membuat log untuk action={action} ---") # DEBUG ERROR
-             traceback.print_exc()
+             logger.debug("_add_log: action=%s request=%s user=%s", action, request_obj.pk, getattr(user, 'pk', None))
+         except Exception:
+             logger.exception("_add_log: Gagal membuat log untuk action=%s request=%s", action, request_obj.pk)
     # --- AKHIR DEFINISI _add_log ---
 
 
@@ -1129,7 +966,6 @@ class RequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsOwnerOfRequest])
     def submit(self, request, pk=None):
         """Aksi Peminta untuk mengajukan request dari DRAFT."""
-        print("--- Action 'submit' dimulai ---")
         req = self.get_object()
         if req.status != Request.Status.DRAFT:
             return Response({"error": "Hanya request DRAFT yang bisa diajukan."}, status=status.HTTP_400_BAD_REQUEST)
@@ -1141,20 +977,16 @@ class RequestViewSet(viewsets.ModelViewSet):
         if not req.request_number:
              req.status = Request.Status.SUBMITTED
              req.submitted_at = timezone.now()
-             print(f"--- Action 'submit': Memanggil req.save() ---")
              req.save()
         else:
              req.status = Request.Status.SUBMITTED
              req.submitted_at = timezone.now()
-             print(f"--- Action 'submit': Memanggil req.save(update_fields) ---")
              req.save(update_fields=['status', 'submitted_at'])
 
-        print(f"--- Action 'submit': Persiapan memanggil _add_log ---")
-        print(f"--- Argumen req: {req} (ID: {req.id}) ---")
-        print(f"--- Argumen request.user: {request.user} (ID: {request.user.id}) ---")
-        print(f"--- Argumen action: 'SUBMIT' ---")
-        print(f"--- Argumen status_from: {status_sebelum} ---")
-        print(f"--- Argumen status_to: {Request.Status.SUBMITTED} ---")
+        logger.debug(
+            "submit: request=%s user=%s status %s -> %s",
+            req.pk, request.user.pk, status_sebelum, Request.Status.SUBMITTED
+        )
 
         try:
             # --- PERUBAHAN: Panggil dengan argumen posisi ---
@@ -1168,14 +1000,11 @@ class RequestViewSet(viewsets.ModelViewSet):
             )
             # --- AKHIR PERUBAHAN ---
         except TypeError as te:
-             print(f"--- Action 'submit': TypeError saat memanggil _add_log! ---")
-             traceback.print_exc()
+             logger.exception("submit: TypeError saat memanggil _add_log (request=%s)", req.pk)
              return Response({"error": "Internal error saat logging (TypeError)."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e_log:
-             print(f"--- Action 'submit': Exception lain saat memanggil _add_log: {type(e_log).__name__} ---")
-             traceback.print_exc()
+             logger.exception("submit: %s saat memanggil _add_log (request=%s)", type(e_log).__name__, req.pk)
 
-        print("--- Action 'submit' selesai, menyiapkan response ---")
         serializer = self.get_serializer(req)
         return Response(serializer.data)
 
@@ -1241,33 +1070,72 @@ class RequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[CanProcessRequestOperator])
     @transaction.atomic
     def process(self, request, pk=None):
-        # ... (Kode FIFO sama seperti sebelumnya) ...
-        req = self.get_object();
-        if req.status != Request.Status.APPROVED_SPV2: return Response(...)
-        items_to_issue = req.items.filter(quantity_approved_spv2__gt=0);
-        if not items_to_issue.exists():
-             req.status = Request.Status.COMPLETED; req.operator_processor = request.user; req.operator_processed_at = timezone.now(); req.save(...); self._add_log(...); return Response(...)
-        transactions_to_create = []; spmb = None;
-        for item in items_to_issue:
-            variant=item.variant; qty_to_issue=item.quantity_approved_spv2; qty_issued_so_far=0;
-            inventory_batches = InventoryItem.objects.select_for_update().filter(variant=variant, quantity__gt=0).order_by('entry_date', 'id');
-            if not inventory_batches.exists(): raise serializers.ValidationError(f"Stok habis untuk barang '{variant.name}'. Proses dibatalkan.")
-            for batch in inventory_batches:
-                take_from_batch = min(qty_to_issue - qty_issued_so_far, batch.quantity);
-                if take_from_batch > 0:
-                    batch.quantity-=take_from_batch; batch.save(...);
-                    stock=Stock.objects.select_for_update().get(variant=variant); stock.total_quantity-=take_from_batch; stock.save(...);
-                    transactions_to_create.append(Transaction(variant=variant, inventory_item=batch, quantity=-take_from_batch, transaction_type=Transaction.Type.OUT, user=request.user, related_request=req, notes=f"Pengeluaran untuk Request #{req.id}"));
-                    qty_issued_so_far+=take_from_batch;
-                if qty_issued_so_far >= qty_to_issue: break
-            if qty_issued_so_far < qty_to_issue: raise serializers.ValidationError(f"Stok tidak mencukupi untuk '{variant.name}'. Diminta {qty_to_issue}, tersedia {qty_issued_so_far}. Proses dibatalkan.")
-            item.quantity_issued=qty_issued_so_far; item.save(...)
-        spmb = SPMB.objects.create(request=req, issued_by=request.user);
-        req.status=Request.Status.COMPLETED; req.operator_processor=request.user; req.operator_processed_at=timezone.now(); req.save(...)
-        for t in transactions_to_create: t.related_spmb = spmb
-        Transaction.objects.bulk_create(transactions_to_create)
-        self._add_log(...)
-        serializer = self.get_serializer(req); response_data = serializer.data; response_data['spmb_info'] = SPMBSerializer(spmb).data; return Response(response_data)
+        """Aksi Operator: keluarkan barang secara FIFO dan terbitkan SPMB."""
+        req = self.get_object()
+        if req.status != Request.Status.APPROVED_SPV2:
+            return Response({"error": "Hanya request APPROVED_SPV2 yang bisa diproses Operator."}, status=status.HTTP_400_BAD_REQUEST)
+        status_sebelum = req.status
+        try:
+            spmb = issue_request(req, request.user)
+        except Request.DoesNotExist:
+            # Sudah diproses oleh request lain yang berjalan bersamaan
+            return Response({"error": "Hanya request APPROVED_SPV2 yang bisa diproses Operator."}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStockError as e:
+            raise serializers.ValidationError(str(e))
+        req = self.get_object()  # muat ulang status dan item setelah diproses
+        self._add_log(req, request.user, "PROCESS", status_from=status_sebelum, status_to=req.status)
+        serializer = self.get_serializer(req); response_data = serializer.data
+        if spmb is not None: response_data['spmb_info'] = SPMBSerializer(spmb).data
+        return Response(response_data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-process', permission_classes=[IsOperator])
+    @transaction.atomic
+    def bulk_process(self, request):
+        """
+        Aksi Operator: proses banyak request APPROVED_SPV2 sekaligus.
+        Body: {"request_ids": [1, 2, ...]}. Stok dialokasikan FIFO berurutan waktu pengajuan;
+        request yang stoknya kurang dilewati dan dilaporkan per request.
+        """
+        request_ids = request.data.get('request_ids')
+        if not isinstance(request_ids, list) or not request_ids:
+            return Response({"error": "Field 'request_ids' wajib berupa list ID request."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            request_ids = list(dict.fromkeys(int(request_id) for request_id in request_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "Semua ID request harus berupa angka."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            outcomes = issue_requests(request_ids, request.user)
+        except InsufficientStockError as e:
+            raise serializers.ValidationError(str(e))
+        results = []
+        logs = []
+        for req, spmb, error in outcomes:
+            if error:
+                results.append({"request_id": req.id, "request_number": req.request_number, "status": "FAILED", "error": error})
+                continue
+            results.append({
+                "request_id": req.id, "request_number": req.request_number, "status": "COMPLETED",
+                "spmb_number": spmb.spmb_number if spmb else None
+            })
+            logs.append(RequestLog(
+                request=req, user=request.user, action="PROCESS",
+                status_from=Request.Status.APPROVED_SPV2, status_to=req.status
+            ))
+        RequestLog.objects.bulk_create(logs)
+
+        found_ids = {req.id for req, _, _ in outcomes}
+        for request_id in request_ids:
+            if request_id not in found_ids:
+                results.append({
+                    "request_id": request_id, "request_number": None, "status": "FAILED",
+                    "error": "Request tidak ditemukan atau bukan berstatus APPROVED_SPV2."
+                })
+        return Response({
+            "processed": len(logs),
+            "failed": len(results) - len(logs),
+            "results": results
+        })
 
     @action(detail=True, methods=['post'], permission_classes=[CanProcessRequestOperator])
     def reject_opr(self, request, pk=None):
@@ -1290,25 +1158,28 @@ class RequestViewSet(viewsets.ModelViewSet):
 
 
 # --- Views Lain (SPMB, Log, Transaksi) ---
-class SPMBViewSet(viewsets.ReadOnlyModelViewSet):
+class SPMBViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SPMB.objects.select_related('request__requester', 'issued_by').all()
     serializer_class = SPMBSerializer
     permission_classes = [permissions.IsAuthenticated]
     # get_queryset tetap sama
 
-class RequestLogViewSet(viewsets.ReadOnlyModelViewSet):
+class RequestLogViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
      queryset = RequestLog.objects.select_related('request', 'user').all()
      serializer_class = RequestLogSerializer
      permission_classes = [IsAdminUser]
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class TransactionViewSet(SparseFieldsViewMixin, CompactListMixin, viewsets.ReadOnlyModelViewSet):
     # Sesuaikan select_related untuk variant
     queryset = Transaction.objects.select_related(
-        'variant__base_item_code', 'user', 'inventory_item',
+        'variant__base_item_code', 'user', 'inventory_item__variant',
         'related_request', 'related_spmb', 'receipt' # Tambahkan receipt
         ).all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAdminUser | IsOperator]
+    pagination_class = TransactionLedgerPagination
+    compact_fields = TRANSACTION_COMPACT_FIELDS
+    compact_choices = {'transaction_type': Transaction.Type}
 
 # --- Views Stock Opname ---
 class StockOpnameSessionViewSet(viewsets.ModelViewSet):
@@ -1317,11 +1188,13 @@ class StockOpnameSessionViewSet(viewsets.ModelViewSet):
      permission_classes = [IsAdminUser]
      # Pastikan action upload_opname TIDAK ada di sini
 
-class StockOpnameItemViewSet(viewsets.ModelViewSet):
+class StockOpnameItemViewSet(SparseFieldsViewMixin, CompactListMixin, viewsets.ModelViewSet):
     # Sesuaikan select_related
     queryset = StockOpnameItem.objects.select_related(
         'opname_session', 'variant__base_item_code', 'confirmed_by').all()
     serializer_class = StockOpnameItemSerializer
+    compact_fields = STOCK_OPNAME_ITEM_COMPACT_FIELDS
+    compact_choices = {'confirmation_status': StockOpnameItem.ConfirmationStatus}
     # get_permissions, confirm action tetap sama
     def get_permissions(self):
          if self.action == 'confirm': self.permission_classes = [IsOperator]
@@ -1330,18 +1203,28 @@ class StockOpnameItemViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], serializer_class=StockOpnameConfirmSerializer)
     @transaction.atomic
     def confirm(self, request, pk=None):
-         # ... (Kode sama seperti sebelumnya) ...
-         item = self.get_object(); #...
-         if item.confirmation_status != StockOpnameItem.ConfirmationStatus.PENDING: return Response(...)
-         confirm_serializer = StockOpnameConfirmSerializer(data=request.data); #...
-         if not confirm_serializer.is_valid(): return Response(...)
-         validated_data = confirm_serializer.validated_data; new_status=validated_data[...]; notes=validated_data[...]; #...
-         item.confirmation_status = new_status; item.confirmation_notes = notes; item.confirmed_by = request.user; item.confirmed_at = timezone.now(); item.save(); #...
-         if new_status == StockOpnameItem.ConfirmationStatus.CONFIRMED_ADJUST and item.difference != 0: #...
-              stock, created = Stock.objects.select_for_update().get_or_create(...); #...
-              original_stock = stock.total_quantity; stock.total_quantity += item.difference; stock.save(); #...
-              Transaction.objects.create(...); #...
-         serializer = self.get_serializer(item); return Response(serializer.data) #...
+         """Aksi Operator: konfirmasi hasil hitung fisik. Status ADJUST menyesuaikan stok sistem."""
+         item = self.get_object()
+         if item.confirmation_status != StockOpnameItem.ConfirmationStatus.PENDING:
+              return Response({"error": "Item opname ini sudah dikonfirmasi."}, status=status.HTTP_400_BAD_REQUEST)
+         confirm_serializer = StockOpnameConfirmSerializer(data=request.data)
+         if not confirm_serializer.is_valid():
+              return Response(confirm_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+         validated_data = confirm_serializer.validated_data
+         new_status = validated_data['confirmation_status']; notes = validated_data.get('confirmation_notes')
+         item.confirmation_status = new_status; item.confirmation_notes = notes; item.confirmed_by = request.user; item.confirmed_at = timezone.now(); item.save()
+         if new_status == StockOpnameItem.ConfirmationStatus.CONFIRMED_ADJUST and item.difference != 0:
+              change = apply_stock_delta(item.variant_id, item.difference, clamp=True)
+              Transaction.objects.create(
+                  variant=item.variant,
+                  quantity=change.applied,
+                  transaction_type=Transaction.Type.ADJUSTMENT,
+                  user=request.user,
+                  notes=f"Penyesuaian stock opname #{item.opname_session_id} (stok sistem {change.total - change.applied} -> {change.total})"
+              )
+              refresh_valuations([item.variant_id])
+         serializer = StockOpnameItemSerializer(item, context=self.get_serializer_context())
+         return Response(serializer.data)
 
 
 # --- View Dashboard (Placeholder) ---
@@ -1362,7 +1245,7 @@ class DashboardDataView(APIView):
           return Response(data)
 
 # --- ReceiptViewSet (Untuk Input Manual) ---
-class ReceiptViewSet(viewsets.ModelViewSet):
+class ReceiptViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """API endpoint untuk mengelola data Kuitansi Pembelian."""
     queryset = Receipt.objects.select_related('uploaded_by').all()
     serializer_class = ReceiptSerializer
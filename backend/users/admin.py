@@ -1,9 +1,15 @@
 # backend/users/admin.py
+import logging
+
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django import forms
 from django.utils.translation import gettext_lazy as _
 
+from .authentication import invalidate_user_tokens
+
+logger = logging.getLogger(__name__)
+
 CustomUser = get_user_model()
 
 # --- Form Kustom (disederhanakan, bisa pakai ModelForm biasa) ---
@@ -84,16 +90,26 @@ class CustomUserAdmin(admin.ModelAdmin):
         if password:
             # Jika password diisi (user baru atau ganti password)
             obj.set_password(password) # Hash password menggunakan set_password()
-            print(f"--- Admin save_model: Password set for {obj.email} ---")
         elif not change:
              # Jika ini user baru tapi password tidak ada di cleaned_data (seharusnya tidak terjadi karena validasi form clean())
-             print(f"--- Admin save_model: ERROR - Password missing for new user {obj.email} ---")
+             logger.error("Admin save_model: password missing for new user %s", obj.email)
              raise ValueError("Password tidak boleh kosong untuk user baru.")
 
         # Simpan objek user ke database
-        print(f"--- Admin save_model: Saving object for {obj.email} ---")
         super().save_model(request, obj, form, change) # Panggil save_model asli dari ModelAdmin
-        print(f"--- Admin save_model: Object saved for {obj.email} ---")
+        logger.debug("Admin save_model: user %s saved (change=%s, password_set=%s)", obj.email, change, bool(password))
+        # Role/flag/password bisa berubah: buang snapshot user di cache autentikasi token
+        if change:
+            invalidate_user_tokens(obj.pk)
+
+    def delete_model(self, request, obj):
+        invalidate_user_tokens(obj.pk)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for user_id in queryset.values_list('pk', flat=True):
+            invalidate_user_tokens(user_id)
+        super().delete_queryset(request, queryset)
 
 
 # Daftarkan model dan admin kustom
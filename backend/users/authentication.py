@@ -0,0 +1,72 @@
+# backend/users/authentication.py
+"""
+Autentikasi token dengan cache snapshot user.
+
+TokenAuthentication bawaan menjalankan query Token JOIN CustomUser di setiap request.
+Di sini hasilnya (id, email, nama, role, department_code, flag) disimpan di cache
+selama AUTH_TOKEN_CACHE_TIMEOUT detik. User dibangun kembali dengan `from_db`, sehingga
+field lain (mis. password) tetap deferred dan dimuat dari database hanya bila diakses;
+save() pada user ini hanya menulis field yang dimuat.
+Cache dihapus saat logout, ganti password, dan perubahan user lewat admin.
+
+Invalidasi hanya berlaku lintas proses jika cache `default` bersama (Redis lewat REDIS_URL).
+Dengan LocMemCache (default tanpa REDIS_URL) penghapusan hanya terjadi di proses yang
+menangani perubahan; worker lain tetap memakai snapshot lama sampai AUTH_TOKEN_CACHE_TIMEOUT
+habis (default 5 detik tanpa Redis), termasuk untuk token yang sudah logout.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+CACHE_KEY = 'users:auth_token:{key}'
+
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'role', 'department_code',
+    'password_reset_required', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _cache_key(key):
+    return CACHE_KEY.format(key=key)
+
+
+def _snapshot_fields(model):
+    # from_db membutuhkan nilai dalam urutan concrete_fields model
+    return tuple(field.attname for field in model._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS)
+
+
+def invalidate_token_cache(key):
+    cache.delete(_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    """Hapus snapshot cache semua token milik user (dipanggil saat data user berubah)."""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication yang membaca token -> snapshot user dari cache terlebih dahulu."""
+
+    def authenticate_credentials(self, key):
+        user_model = get_user_model()
+        fields = _snapshot_fields(user_model)
+        snapshot = cache.get(_cache_key(key))
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            snapshot = tuple(getattr(user, field) for field in fields)
+            cache.set(_cache_key(key), snapshot, getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60))
+            return user, token
+
+        db = router.db_for_read(user_model)
+        user = user_model.from_db(db, fields, snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token = Token.from_db(db, ('key', 'user_id'), (key, user.pk))
+        token.user = user
+        return user, token
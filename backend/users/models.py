@@ -1,8 +1,12 @@
 # backend/users/models.py
+import logging
+
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+logger = logging.getLogger(__name__)
+
 # --- CUSTOM USER MANAGER ---
 class CustomUserManager(BaseUserManager):
     """
@@ -13,20 +17,16 @@ class CustomUserManager(BaseUserManager):
         """
         Create and save a User with the given email and password.
         """
-        print(f"--- Manager: create_user() called for: {email} ---") # DEBUG 5
         if not email: raise ValueError(_('The Email must be set'))
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         try:
-            print(f"--- Manager: Attempting user.save() for: {email} ---") # DEBUG 6
             user.save(using=self._db)
-            print(f"--- Manager: user.save() successful for: {email} ---") # DEBUG 7
-        except Exception as e:
-            print(f"--- Manager: EXCEPTION during user.save(): {type(e).__name__}: {e} ---") # DEBUG 8
-            import traceback
-            traceback.print_exc() # Cetak traceback lengkap ke konsol runserver
-            raise e # Lempar lagi errornya
+        except Exception:
+            logger.exception("create_user: gagal menyimpan user %s", email)
+            raise
+        logger.debug("create_user: user %s dibuat", email)
         return user
 
     def create_superuser(self, email, password, **extra_fields):
@@ -1,3 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .authentication import _cache_key, _snapshot_fields
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='operator@example.com', password='rahasia-123', role='OPERATOR',
+            department_code='WBC.051', password_reset_required=False
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def warm_snapshot(self):
+        """Request pertama mengisi snapshot; request berikutnya memakai user hasil from_db."""
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        self.assertIsNotNone(cache.get(_cache_key(self.token.key)))
+
+    def test_snapshot_skips_token_query(self):
+        self.warm_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.assertFalse([query for query in queries.captured_queries if 'authtoken_token' in query['sql']])
+
+    def test_logout_invalidates_snapshot(self):
+        self.warm_snapshot()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertIsNone(cache.get(_cache_key(self.token.key)))
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_change_password_saves_on_cached_user_and_invalidates_snapshot(self):
+        date_joined = self.user.date_joined
+        self.warm_snapshot()
+        response = self.client.put('/api/users/change-password/', {
+            'old_password': 'rahasia-123', 'new_password': 'Baru-rahasia-456', 'new_password_confirm': 'Baru-rahasia-456',
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(cache.get(_cache_key(self.token.key)))
+        # User dari snapshot hanya memuat sebagian field; save() tetap menulis password
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Baru-rahasia-456'))
+        self.assertEqual(self.user.date_joined, date_joined)
+        self.assertEqual(self.user.role, 'OPERATOR')
+
+    def test_inactive_cached_user_rejected(self):
+        self.warm_snapshot()
+        # Snapshot yang ditulis setelah user dinonaktifkan (mis. oleh worker lain)
+        fields = _snapshot_fields(get_user_model())
+        snapshot = list(cache.get(_cache_key(self.token.key)))
+        snapshot[fields.index('is_active')] = False
+        cache.set(_cache_key(self.token.key), tuple(snapshot))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 401)
@@ -7,10 +7,11 @@ router = DefaultRouter()
 router.register(r'users', views.UserViewSet, basename='user') # Hanya untuk admin lihat list user
 
 urlpatterns = [
-    path('', include(router.urls)),
     path('auth/login/', views.LoginView.as_view(), name='auth-login'),
     path('auth/logout/', views.LogoutView.as_view(), name='auth-logout'),
     path('auth/profile/', views.CurrentUserView.as_view(), name='user-me'),
     path('users/change-password/', views.ChangePasswordView.as_view(), name='change-password'),
     path('users/force-change-password/', views.ForceChangePasswordView.as_view(), name='force-change-password'),
+    # Router terakhir: pola users/<pk>/ akan menangkap users/change-password/ jika didaftarkan lebih dulu
+    path('', include(router.urls)),
 ]
\ No newline at end of file
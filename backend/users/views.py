@@ -1,4 +1,6 @@
 # backend/users/views.py
+import logging
+
 from django.contrib.auth import get_user_model
 from django.http import Http404 # Import Http404 untuk ForceChangePasswordView
 
@@ -16,6 +18,9 @@ from .serializers import (
     CustomAuthTokenSerializer
 )
 from inventory.permissions import IsAdminUser
+from .authentication import invalidate_token_cache, invalidate_user_tokens
+
+logger = logging.getLogger(__name__)
 
 CustomUser = get_user_model()
 
@@ -36,33 +41,16 @@ class CurrentUserView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated] # Cukup user sudah login
 
     def check_permissions(self, request):
-        """Override untuk inspeksi request.user sebelum permission check standar."""
-        print(f"\n--- CurrentUserView: check_permissions called ---")
-        # Cek apakah request.user ada dan siapa dia
-        user_repr = getattr(request, 'user', 'Not Set')
-        print(f"--- request.user: {user_repr} (Type: {type(user_repr).__name__}) ---")
-
-        # Cek status is_authenticated
-        is_auth_attr = getattr(request.user, 'is_authenticated', 'N/A (user not set or no attribute)')
-        is_auth_val = 'N/A'
-        if callable(is_auth_attr): # is_authenticated biasanya property, tapi cek jika callable
-             try: is_auth_val = is_auth_attr()
-             except Exception as e: is_auth_val = f'Error calling: {e}'
-        else:
-            is_auth_val = is_auth_attr
-        print(f"--- request.user.is_authenticated: {is_auth_val} ---")
-
-        # Cek hasil autentikasi (token apa yg ditemukan)
-        auth_token = getattr(request, 'auth', 'Not Set')
-        print(f"--- request.auth (Token found by Auth class): {auth_token} ---")
-        print(f"--- Running standard permission checks defined in permission_classes... ---")
-
+        """Override untuk inspeksi request.user sebelum permission check standar (logger level DEBUG)."""
         try:
             super().check_permissions(request)
-            print(f"--- CurrentUserView: super().check_permissions() PASSED ---")
         except Exception as e:
-             print(f"--- CurrentUserView: super().check_permissions() FAILED with {type(e).__name__} ---")
-             raise e
+            logger.debug(
+                "CurrentUserView: check_permissions FAILED with %s (user=%s, authenticated=%s, token=%s)",
+                type(e).__name__, request.user, request.user.is_authenticated, request.auth is not None
+            )
+            raise
+        logger.debug("CurrentUserView: check_permissions PASSED (user=%s)", request.user)
 
     def get_object(self):
         return self.request.user
@@ -110,8 +98,10 @@ class LogoutView(APIView):
 
     def post(self, request, *args, **kwargs):
         try:
-            # Hapus token milik user yang sedang login
-            request.user.auth_token.delete()
+            # Hapus token milik user yang sedang login (beserta snapshot di cache autentikasi)
+            token = request.user.auth_token
+            invalidate_token_cache(token.key)
+            token.delete()
             # Kirim response sukses tanpa konten
             return Response(status=status.HTTP_204_NO_CONTENT)
         except (AttributeError, Token.DoesNotExist):
@@ -137,14 +127,15 @@ class ChangePasswordView(generics.UpdateAPIView):
 
         if serializer.is_valid():
             # Cek apakah password lama benar
-            if not self.object.check_password(serializer.data.get("old_password")):
+            if not self.object.check_password(serializer.validated_data.get("old_password")):
                 return Response({"old_password": ["Password lama salah."]}, status=status.HTTP_400_BAD_REQUEST)
 
             # Set password baru (sudah divalidasi oleh serializer)
-            self.object.set_password(serializer.data.get("new_password"))
+            self.object.set_password(serializer.validated_data.get("new_password"))
             # Setelah berhasil ganti password, flag wajib ganti password jadi False
             self.object.password_reset_required = False
             self.object.save()
+            invalidate_user_tokens(self.object.pk)
             return Response({"message": "Password berhasil diubah."}, status=status.HTTP_200_OK)
 
         # Jika serializer tidak valid
@@ -175,6 +166,7 @@ class ForceChangePasswordView(generics.UpdateAPIView):
             self.object.set_password(serializer.validated_data.get("new_password"))
             self.object.password_reset_required = False
             self.object.save()
+            invalidate_user_tokens(self.object.pk)
             return Response({"message": "Password awal berhasil diatur."}, status=status.HTTP_200_OK)
 
         # Jika serializer tidak valid